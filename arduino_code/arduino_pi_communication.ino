@@ -6,26 +6,64 @@ const int txPin = 11; // TX de SoftwareSerial (Envía a Pi)
 
 SoftwareSerial mySerial(rxPin, txPin); // RX, TX
 
-const int ldr = A0;
+const int ldr = A0;          // Batería de la Raspberry Pi
+const int bateriaArduino = A1; // Batería del Arduino
 
 void setup(){
     pinMode(ldr, INPUT);             // Inicializar el sensor LDR como INPUT
+    pinMode(bateriaArduino, INPUT);
     mySerial.begin(9600);            // Iniciar comunicación SoftwareSerial a 9600 bps
     Serial.begin(9600);              // Iniciar comunicación USB para depuración
     Serial.println("Arduino listo para comunicación bidireccional.");
 }
 
 void loop(){
-    int rawValue = analogRead(ldr);  // Leer el valor analógico del LDR
-    float voltage = (rawValue / 1023.0) * 5.0; // Calcular la tensión
+    float voltage = (analogRead(ldr) / 1023.0) * 5.0; // Calcular la tensión
+    float voltageArduino = (analogRead(bateriaArduino) / 1023.0) * 5.0;
 
-    // Enviar la tensión a la Raspberry Pi
-    mySerial.print("Voltage:");
-    mySerial.println(voltage, 2);    // Enviar con 2 decimales
+    // Enviar las tensiones a la Raspberry Pi en tramas (nodo_comun/arduino.py): la Pi
+    // espera las dos antes de seguir
+    enviarVoltaje(0x10, voltageArduino); // bateria_arduino
+    enviarVoltaje(0x11, voltage);        // bateria_pi
 
     // Enviar la tensión al Monitor Serial para depuración
     Serial.print("Voltage:");
     Serial.println(voltage, 2);        // Enviar con 2 decimales
+    Serial.print("Voltage A1:");
+    Serial.println(voltageArduino, 2);
 
-    delay(10000); // Esperar 10 segundos antes de la siguiente lectura
+    delay(1000); // La Pi abre el puerto cuando arranca: cada segundo para que no espere
+}
+
+// --- Tramas para la Raspberry Pi (ver nodo_comun/arduino.py) ---
+// 0xA5 | tipo | longitud | carga (little-endian) | CRC-8 (polinomio 0x07) de tipo, longitud y carga
+
+byte crc8(const byte *data, byte length) {
+  byte crc = 0;
+  for (byte i = 0; i < length; i++) {
+    crc ^= data[i];
+    for (byte bit = 0; bit < 8; bit++) {
+      crc = (crc & 0x80) ? (crc << 1) ^ 0x07 : crc << 1;
+    }
+  }
+  return crc;
+}
+
+void enviarTrama(byte tipo, const byte *carga, byte longitud) {
+  byte cuerpo[2 + 4];
+  cuerpo[0] = tipo;
+  cuerpo[1] = longitud;
+  for (byte i = 0; i < longitud; i++) {
+    cuerpo[2 + i] = carga[i];
+  }
+  mySerial.write(0xA5);
+  mySerial.write(cuerpo, 2 + longitud);
+  mySerial.write(crc8(cuerpo, 2 + longitud));
+}
+
+void enviarVoltaje(byte tipo, float voltaje) {
+  // Tipos 0x10 y 0x11: milivoltios en uint16
+  unsigned int mV = (unsigned int)(voltaje * 1000 + 0.5);
+  byte carga[2] = {(byte)(mV & 0xFF), (byte)(mV >> 8)};
+  enviarTrama(tipo, carga, 2);
 }
@@ -4,28 +4,46 @@
 
 RTC_DS3231 rtc;
 
-const int wakeUpPin = 2; // Pin de interrupción para despertar
+const int wakeUpPin = 2; // Pin SQW del RTC: LOW cuando salta la alarma
 const int relayPin = 7; // Pin para controlar el relé
 const int rxPin = 10; // Pin RX para comunicación serial con la Raspberry Pi
 const int txPin = 11; // Pin TX para comunicación serial con la Raspberry Pi
 
 const int irSensorPin1 = 4; // Pin para el primer sensor infrarrojo
 const int irSensorPin2 = 5; // Pin para el segundo sensor infrarrojo
-volatile int objectCount1 = 0; // Contador de objetos detectados por el primer sensor
-volatile int objectCount2 = 0; // Contador de objetos detectados por el segundo sensor
-const byte interruptPin = 2; // Pin para controlar el interruptor de alimentación de los sensores
+unsigned long objectCount1 = 0; // Objetos detectados por el primer sensor desde el último envío
+unsigned long objectCount2 = 0; // Objetos detectados por el segundo sensor desde el último envío
+// Interruptor de alimentación de los sensores. No puede ser el pin de despertar (2): los
+// sensores siguen encendidos mientras el Arduino duerme
+const byte interruptPin = 3;
 
-
-
-unsigned long lastDebounceTime = 0; // Tiempo de la última interrupción
-const unsigned long debounceDelay = 200; // Retardo para evitar rebotes (200 ms)
+// Los sensores se leen cada 60 ms, también mientras el Arduino duerme (despierta con el
+// watchdog). No se usan interrupciones de cambio de pin en D4/D5: SoftwareSerial ya ocupa
+// ese vector
+int valorAnterior1 = HIGH; // Estado anterior del primer sensor
+int valorAnterior2 = HIGH; // Estado anterior del segundo sensor
+unsigned int pendientes1 = 0; // Detecciones aún sin repartir en intervalos
+unsigned int pendientes2 = 0;
 
 // Definir las horas y minutos de activación
 const byte NUM_ALARMAS = 10;
 byte horasActivacion[NUM_ALARMAS] = {7, 8, 9, 10, 11,13, 14, 15, 16, 17, 18};
 byte minutosActivacion[NUM_ALARMAS] = {00, 00, 00, 00,00, 00, 00, 00, 00, 00, 00};
 
-bool countingObjects = false; // Indicador de si el sensor infrarrojo está contando
+// Relé (Pi encendida): la Pi lee los datos al minuto de arrancar
+const unsigned long ESPERA_ARRANQUE_PI = 60000;
+const unsigned long RELE_CONTEO = 180000; // Despertar de las 11:00, 3 minutos
+const unsigned long RELE_NORMAL = 480000; // Resto de despertares, 8 minutos
+
+// Detecciones por minuto de cada sensor entre un despertar de la Pi y el siguiente
+// (histograma para la Pi). Si la Pi tarda más de MAX_INTERVALOS minutos en despertar,
+// se descartan los intervalos más antiguos; el total los sigue contando
+const unsigned int SEGUNDOS_INTERVALO = 60;
+const byte MAX_INTERVALOS = 120;
+byte intervalos1[MAX_INTERVALOS];
+byte intervalos2[MAX_INTERVALOS];
+byte numIntervalos = 0;
+unsigned long inicioHistograma = 0; // Segundos desde epoch (RTC) del primer intervalo
 SoftwareSerial raspberryPiSerial(rxPin, txPin); // Comunicación serial con la Raspberry Pi
 
 void setup() {
@@ -53,31 +71,33 @@ void setup() {
 
   pinMode(wakeUpPin, INPUT_PULLUP); // Configurar el pin de despertar como entrada con resistencia pull-up
   pinMode(relayPin, OUTPUT); // Configurar el pin del relé como salida
-  pinMode(irSensorPin, INPUT); // Configurar el pin del sensor infrarrojo como entrada
+  pinMode(irSensorPin1, INPUT); // Configurar los pines de los sensores infrarrojos como entrada
+  pinMode(irSensorPin2, INPUT);
   digitalWrite(relayPin, LOW); // Asegurarse de que el relé esté apagado inicialmente
   pinMode(interruptPin, OUTPUT); // Configurar el pin del interruptor como salida
-  digitalWrite(interruptPin, LOW); // Asegurarse de que el interruptor esté apagado inicialmente
+  digitalWrite(interruptPin, HIGH); // Los sensores quedan encendidos y cuentan también dormido
+  delay(100);
+  valorAnterior1 = digitalRead(irSensorPin1);
+  valorAnterior2 = digitalRead(irSensorPin2);
   configurarSiguienteAlarma();
 }
 
 void loop() {
-  delay(500); // Esperar antes de entrar en modo de bajo consumo para ver las salidas en serial
-  // Entrar en modo de bajo consumo hasta que la alarma se dispare
-  attachInterrupt(digitalPinToInterrupt(wakeUpPin), wakeUp, LOW);
-  LowPower.powerDown(SLEEP_FOREVER, ADC_OFF, BOD_OFF);
-  detachInterrupt(digitalPinToInterrupt(wakeUpPin));
+  // Bajo consumo entre dos lecturas de los sensores
+  LowPower.powerDown(SLEEP_60MS, ADC_OFF, BOD_OFF);
+  leerSensores();
+  acumularDetecciones();
+
+  // La alarma del RTC pone SQW (pin de despertar) a LOW hasta que se limpia
+  if (digitalRead(wakeUpPin) == HIGH || !rtc.alarmFired(1)) {
+    return;
+  }
 
-  // Determinar si es la alarma específica para realizar el conteo
+  // Encender la Pi si es una de las horas de activación
   DateTime now = rtc.now();
   for (int i = 0; i < NUM_ALARMAS; i++) {
     if (now.hour() == horasActivacion[i] && now.minute() == minutosActivacion[i]) {
-      if (now.hour() == 11) {
-        // Cuando se despierte a las 7:00, activar el sensor infrarrojo y empezar a contar
-        iniciarConteoInfrarrojo();
-      } else {
-        // Para todas las otras horas, activar el relé
-        activarRele1();
-      }
+      despertarPi(now.hour() == 11 ? RELE_CONTEO : RELE_NORMAL);
     }
   }
 
@@ -86,62 +106,103 @@ void loop() {
 
   // Configuramos la siguiente alarma
   configurarSiguienteAlarma();
+  delay(500); // Esperar antes de volver al modo de bajo consumo para ver las salidas en serial
 }
 
-void iniciarConteoInfrarrojo() {
-  digitalWrite(interruptPin, HIGH); // Activar el interruptor para encender los sensores
-
-  objectCount1 = 0; // Reiniciar el contador del primer sensor
-  objectCount2 = 0; // Reiniciar el contador del segundo sensor
-  int valorAnterior1 = HIGH;  // Estado anterior del primer sensor
-  int valorAnterior2 = HIGH;  // Estado anterior del segundo sensor
-  unsigned long tiempoInicio = millis();  // Guardar el tiempo de inicio
-  Serial.println("Iniciando conteo de objetos con ambos sensores infrarrojos...");
-
-  // Realizar el conteo durante 15 segundos
-  while (millis() - tiempoInicio < 15000) {
-    int valor1 = digitalRead(irSensorPin1);
-    int valor2 = digitalRead(irSensorPin2);
-
-    // Detecta la transición de HIGH a LOW para el primer sensor
-    if (valor1 == LOW && valorAnterior1 == HIGH) {
-      objectCount1++;  // Incrementa el contador del primer sensor
-      Serial.print("Detecciones Sensor 1: ");
-      Serial.println(objectCount1);
-    }
+void leerSensores() {
+  int valor1 = digitalRead(irSensorPin1);
+  int valor2 = digitalRead(irSensorPin2);
 
-    // Detecta la transición de HIGH a LOW para el segundo sensor
-    if (valor2 == LOW && valorAnterior2 == HIGH) {
-      objectCount2++;  // Incrementa el contador del segundo sensor
-      Serial.print("Detecciones Sensor 2: ");
-      Serial.println(objectCount2);
-    }
+  // Detecta la transición de HIGH a LOW de cada sensor
+  if (valor1 == LOW && valorAnterior1 == HIGH) {
+    pendientes1++;
+  }
+  if (valor2 == LOW && valorAnterior2 == HIGH) {
+    pendientes2++;
+  }
 
-    // Guarda los valores actuales para la siguiente iteración
-    valorAnterior1 = valor1;
-    valorAnterior2 = valor2;
-    delay(100);
+  // Guarda los valores actuales para la siguiente lectura
+  valorAnterior1 = valor1;
+  valorAnterior2 = valor2;
+}
+
+void acumularDetecciones() {
+  // Reparte las detecciones pendientes en el intervalo del minuto actual (hora del RTC;
+  // millis() no avanza mientras duerme)
+  unsigned int nuevas1 = pendientes1;
+  unsigned int nuevas2 = pendientes2;
+  pendientes1 = 0;
+  pendientes2 = 0;
+  if (nuevas1 == 0 && nuevas2 == 0) {
+    return;
   }
-  
-  int conteoTotal = objectCount1 + objectCount2; // Suma de ambos contadores
-  Serial.print("Conteo final de objetos total: ");
-  Serial.println(conteoTotal);
+  objectCount1 += nuevas1;
+  objectCount2 += nuevas2;
 
-  digitalWrite(interruptPin,LOW);
+  unsigned long ahora = rtc.now().unixtime();
+  if (numIntervalos == 0) {
+    inicioHistograma = ahora - ahora % SEGUNDOS_INTERVALO;
+  }
+  unsigned long intervalo = (ahora - inicioHistograma) / SEGUNDOS_INTERVALO;
+  if (intervalo >= MAX_INTERVALOS) {
+    // La ventana se llena: se desplaza descartando los intervalos más antiguos
+    unsigned long desplazar = intervalo - MAX_INTERVALOS + 1;
+    if (desplazar >= numIntervalos) {
+      memset(intervalos1, 0, sizeof(intervalos1));
+      memset(intervalos2, 0, sizeof(intervalos2));
+      numIntervalos = 0;
+      inicioHistograma = ahora - ahora % SEGUNDOS_INTERVALO;
+      intervalo = 0;
+    } else {
+      memmove(intervalos1, intervalos1 + desplazar, MAX_INTERVALOS - desplazar);
+      memmove(intervalos2, intervalos2 + desplazar, MAX_INTERVALOS - desplazar);
+      memset(intervalos1 + MAX_INTERVALOS - desplazar, 0, desplazar);
+      memset(intervalos2 + MAX_INTERVALOS - desplazar, 0, desplazar);
+      numIntervalos -= desplazar;
+      inicioHistograma += desplazar * SEGUNDOS_INTERVALO;
+      intervalo = MAX_INTERVALOS - 1;
+    }
+  }
+  intervalos1[intervalo] = min(255U, intervalos1[intervalo] + nuevas1);
+  intervalos2[intervalo] = min(255U, intervalos2[intervalo] + nuevas2);
+  numIntervalos = max(numIntervalos, (byte)(intervalo + 1));
+}
+
+void esperarContando(unsigned long ms) {
+  // Como delay(), pero sin dejar de leer los sensores
+  unsigned long inicio = millis();
+  while (millis() - inicio < ms) {
+    leerSensores();
+    acumularDetecciones();
+    delay(60);
+  }
+}
 
-  // Activar el relé y enviar datos
+void despertarPi(unsigned long duracion) {
+  // Activar el relé y enviar los datos acumulados desde el despertar anterior
   digitalWrite(relayPin, HIGH);
-  delay(60000); // Mantener el relé activado durante 1 min.
-  
-  // Enviar el recuento a la Pi usando comunicación serial
-  Serial.print("Enviando recuento de objetos a la Raspberry Pi: ");
-  Serial.println(objectCount);
-  raspberryPiSerial.println(objectCount);
-  
-  delay(120000); // Mantener el relé activado durante 2 min adicionales
+  esperarContando(ESPERA_ARRANQUE_PI);
+  acumularDetecciones();
+  enviarDatos();
+  esperarContando(duracion - ESPERA_ARRANQUE_PI);
   digitalWrite(relayPin, LOW); // Apagar el relé
 }
 
+void enviarDatos() {
+  unsigned long conteoTotal = objectCount1 + objectCount2; // Suma de ambos contadores
+  Serial.print("Enviando recuento de objetos a la Raspberry Pi: ");
+  Serial.println(conteoTotal);
+  enviarHistograma(); // Antes que el total: la Pi deja de leer al recibirlo
+  enviarConteo(conteoTotal); // Trama de nodo_comun/arduino.py (tipo 0x20)
+
+  // Lo enviado no se vuelve a mandar en el despertar siguiente
+  objectCount1 = 0;
+  objectCount2 = 0;
+  numIntervalos = 0;
+  memset(intervalos1, 0, sizeof(intervalos1));
+  memset(intervalos2, 0, sizeof(intervalos2));
+}
+
 void configurarSiguienteAlarma() {
   DateTime now = rtc.now();
   Serial.print(now.hour());
@@ -167,18 +228,56 @@ void configurarSiguienteAlarma() {
   Serial.println(minutosActivacion[0]);
 }
 
-void activarRele1() {
-  // Activar el relé durante 8 minutos
-  digitalWrite(relayPin, HIGH);
-  delay(480000); // Mantener el relé activado durante 8 minutos
-  digitalWrite(relayPin, LOW); // Apagar el relé
+// --- Tramas para la Raspberry Pi (ver nodo_comun/arduino.py) ---
+// 0xA5 | tipo | longitud | carga (little-endian) | CRC-8 (polinomio 0x07) de tipo, longitud y carga
+
+byte crc8(const byte *data, byte length) {
+  byte crc = 0;
+  for (byte i = 0; i < length; i++) {
+    crc ^= data[i];
+    for (byte bit = 0; bit < 8; bit++) {
+      crc = (crc & 0x80) ? (crc << 1) ^ 0x07 : crc << 1;
+    }
+  }
+  return crc;
+}
+
+void enviarTrama(byte tipo, const byte *carga, byte longitud) {
+  byte cuerpo[2 + 255];
+  cuerpo[0] = tipo;
+  cuerpo[1] = longitud;
+  for (byte i = 0; i < longitud; i++) {
+    cuerpo[2 + i] = carga[i];
+  }
+  raspberryPiSerial.write(0xA5);
+  raspberryPiSerial.write(cuerpo, 2 + longitud);
+  raspberryPiSerial.write(crc8(cuerpo, 2 + longitud));
 }
 
-void wakeUp() {
-  // Manejador de interrupción con debounce
-  unsigned long currentTime = millis();
-  if ((currentTime - lastDebounceTime) > debounceDelay) {
-    lastDebounceTime = currentTime;
-    // No hacer nada más aquí, solo actualizar el tiempo de debounce
+void enviarConteo(unsigned long conteo) {
+  byte carga[4];
+  for (byte i = 0; i < 4; i++) {
+    carga[i] = (conteo >> (8 * i)) & 0xFF;
+  }
+  enviarTrama(0x20, carga, 4);
+}
+
+void enviarHistograma() {
+  // Tipo 0x21: inicio (uint32), segundos por intervalo (uint16), sensores (uint8) y los
+  // conteos de cada sensor; como mucho 124 intervalos por trama
+  const byte maxPorTrama = (255 - 7) / 2;
+  byte carga[255];
+  for (byte primero = 0; primero < numIntervalos; primero += maxPorTrama) {
+    byte n = min(numIntervalos - primero, maxPorTrama);
+    unsigned long inicio = inicioHistograma + (unsigned long)primero * SEGUNDOS_INTERVALO;
+    for (byte i = 0; i < 4; i++) {
+      carga[i] = (inicio >> (8 * i)) & 0xFF;
+    }
+    carga[4] = SEGUNDOS_INTERVALO & 0xFF;
+    carga[5] = SEGUNDOS_INTERVALO >> 8;
+    carga[6] = 2;
+    memcpy(carga + 7, intervalos1 + primero, n);
+    memcpy(carga + 7 + n, intervalos2 + primero, n);
+    enviarTrama(0x21, carga, 7 + 2 * n);
   }
 }
@@ -0,0 +1,79 @@
+"""
+Benchmark de captura: fswebcam (un proceso por foto) frente a la captura en
+proceso por V4L2 de nodo_comun.camera.
+
+Mide la latencia hasta tener el JPEG en disco y el tiempo de CPU consumido
+(del propio proceso y de los hijos, para contar fswebcam). Con --fake usa la
+cámara simulada para comprobar el harness fuera de la Pi.
+
+Uso:
+    python benchmarks/bench_camera.py --shots 5
+    python benchmarks/bench_camera.py --fake
+"""
+import argparse
+import os
+import resource
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from nodo_comun.camera import FakeCamera, FswebcamCamera, V4L2Camera, save_frame
+
+
+def cpu_seconds():
+    own = resource.getrusage(resource.RUSAGE_SELF)
+    children = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return own.ru_utime + own.ru_stime + children.ru_utime + children.ru_stime
+
+
+def bench(make_camera, shots, workdir, reopen):
+    """
+    `reopen` abre la cámara en cada foto, como un nodo que despierta, hace una
+    foto y se apaga. Si es False, se abre una vez y se hacen `shots` fotos.
+    Devuelve (segundos por foto, CPU por foto, bytes por foto).
+    """
+    start_wall, start_cpu = time.monotonic(), cpu_seconds()
+    total_bytes = 0
+    camera = None
+    for shot in range(shots):
+        if camera is None or reopen:
+            if camera is not None:
+                camera.close()
+            camera = make_camera().open()
+        frame = camera.capture()
+        save_frame(frame, os.path.join(workdir, f"shot_{shot}.jpg"))
+        total_bytes += len(frame)
+    camera.close()
+    return (
+        (time.monotonic() - start_wall) / shots,
+        (cpu_seconds() - start_cpu) / shots,
+        total_bytes // shots,
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--shots", type=int, default=5)
+    parser.add_argument("--fake", action="store_true", help="usar la cámara simulada")
+    args = parser.parse_args()
+
+    if args.fake:
+        backends = {"fake": FakeCamera}
+    else:
+        backends = {"fswebcam": FswebcamCamera, "v4l2": V4L2Camera}
+
+    workdir = tempfile.mkdtemp(prefix="bench_camera_")
+    try:
+        print(f"{'backend':<10} {'modo':<12} {'s/foto':>8} {'CPU s/foto':>11} {'bytes':>9}")
+        for name, make_camera in backends.items():
+            for mode, reopen in (("arranque", True), ("abierta", False)):
+                seconds, cpu, size = bench(make_camera, args.shots, workdir, reopen)
+                print(f"{name:<10} {mode:<12} {seconds:>8.3f} {cpu:>11.3f} {size:>9}")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
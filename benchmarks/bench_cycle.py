@@ -0,0 +1,256 @@
+"""
+Benchmark de ciclo completo: ejecuta el main() de cada nodo como en un
+despertar real (un proceso nuevo por ciclo) contra sustitutos locales:
+
+- dispositivos simulados (DEVICE_BACKEND=sim): cámara, SHT20 y el Arduino
+  tras un pty;
+- ssh/scp de benchmarks/standin.py como servidor de fotos;
+- un servidor HTTP local en lugar de MONITORING_URL.
+
+La latencia y el ancho de banda del enlace (--latency, --bandwidth) se
+aplican tanto al servidor SSH como al HTTP. Los ficheros de cada nodo van a
+un directorio temporal que se mantiene entre sus ciclos, así que con
+--cycles > 1 también cuentan el almacén, el manifiesto o la política.
+
+Para cada nodo se informa del tiempo despierto (desde que arranca Python
+hasta que acaba main()), los bytes enviados por SSH y por HTTP y el desglose
+por etapas del log de tiempos del propio nodo, como medianas de los ciclos.
+Con --output los resultados se añaden a un JSONL junto con el commit, y con
+--compare se comparan con la última ejecución guardada con los mismos
+parámetros.
+
+Uso:
+    python benchmarks/bench_cycle.py --cycles 3
+    python benchmarks/bench_cycle.py --latency 0.3 --bandwidth 50000 \\
+        --output metrics/ciclos.jsonl --compare metrics/ciclos.jsonl
+"""
+import argparse
+import json
+import os
+import shutil
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import standin
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+NODES = ["nodo_banda", "nodo_amarillo", "nodo_verde_1", "nodo_verde_2"]
+
+# Se ejecuta en el proceso hijo: todas las rutas y el servidor del nodo se
+# redirigen al banco de pruebas y se lanza su ciclo como en el campo
+CHILD = """
+import importlib.util, os, sys
+script, workdir, url = sys.argv[1:4]
+spec = importlib.util.spec_from_file_location("nodo", script)
+module = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(module)
+node = module.NODE
+for name in list(vars(node)):
+    if name.endswith("_file") or name.endswith("_directory"):
+        setattr(node, name, os.path.join(workdir, name))
+        if name.endswith("_directory"):
+            os.makedirs(getattr(node, name), exist_ok=True)
+node.policy.state_path = node.policy_file
+node.server_user, node.server_ip, node.server_dir = "bench", "127.0.0.1", os.path.basename(workdir)
+node.monitoring_url = url
+node.main()
+"""
+
+
+class Link:
+    """Latencia y ancho de banda compartidos por los sustitutos."""
+
+    def __init__(self, latency=0.0, bandwidth=0.0):
+        self.latency = latency
+        self.bandwidth = bandwidth
+
+    def delay(self, size):
+        return self.latency + (size / self.bandwidth if self.bandwidth else 0)
+
+
+def start_http(link):
+    """Servidor de monitorización local. Devuelve (servidor, url, contador de bytes)."""
+    received = {"bytes": 0, "requests": 0}
+    lock = threading.Lock()
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+            time.sleep(link.delay(len(body)))
+            with lock:
+                received["bytes"] += len(body)
+                received["requests"] += 1
+            reply = b"{}"
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(reply)))
+            self.end_headers()
+            self.wfile.write(reply)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}/monitorizacion", received
+
+
+def start_ssh_listener():
+    """Puerto que acepta conexiones para que la espera de red del nodo vea el servidor."""
+    listener = socket.socket()
+    listener.bind(("127.0.0.1", 0))
+    listener.listen()
+
+    def accept():
+        while True:
+            try:
+                connection, _ = listener.accept()
+            except OSError:
+                return
+            connection.close()
+
+    threading.Thread(target=accept, daemon=True).start()
+    return listener
+
+
+def last_record(path):
+    if not os.path.exists(path):
+        return None
+    with open(path, "r") as f:
+        lines = f.read().splitlines()
+    return json.loads(lines[-1]) if lines else None
+
+
+def run_cycle(node, workdir, url, env, remote_root, http_received):
+    """Un despertar del nodo. Devuelve el resultado del ciclo o lanza RuntimeError."""
+    script = os.path.join(ROOT, node, "main.py")
+    ssh_before, http_before = standin.sent_bytes(remote_root), http_received["bytes"]
+    start = time.monotonic()
+    result = subprocess.run(
+        [sys.executable, "-c", CHILD, script, workdir, url], capture_output=True, text=True, env=env, cwd=workdir
+    )
+    awake = time.monotonic() - start
+    if result.returncode != 0:
+        raise RuntimeError((result.stderr.strip().splitlines() or ["sin salida"])[-1])
+    record = last_record(os.path.join(workdir, "timing_file")) or {"total": 0.0, "stages": {}}
+    return {
+        "despierto": awake,
+        "ciclo": record["total"],
+        "bytes_ssh": standin.sent_bytes(remote_root) - ssh_before,
+        "bytes_http": http_received["bytes"] - http_before,
+        "etapas": {name: stage["seconds"] for name, stage in record["stages"].items()},
+    }
+
+
+def summarize_cycles(cycles):
+    stages = sorted({name for c in cycles for name in c["etapas"]})
+    return {
+        "despierto": round(statistics.median(c["despierto"] for c in cycles), 3),
+        "ciclo": round(statistics.median(c["ciclo"] for c in cycles), 3),
+        "bytes_ssh": int(statistics.mean(c["bytes_ssh"] for c in cycles)),
+        "bytes_http": int(statistics.mean(c["bytes_http"] for c in cycles)),
+        "etapas": {
+            name: round(statistics.median(c["etapas"].get(name, 0.0) for c in cycles), 3) for name in stages
+        },
+    }
+
+
+def git_commit():
+    try:
+        result = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, cwd=ROOT)
+    except OSError:
+        return None
+    return result.stdout.strip() or None
+
+
+def load_previous(path, params):
+    """Última ejecución guardada de cada nodo con los mismos parámetros."""
+    previous = {}
+    if path and os.path.exists(path):
+        with open(path, "r") as f:
+            for line in f:
+                entry = json.loads(line)
+                if entry.get("parametros") == params:
+                    previous[entry["nodo"]] = entry
+    return previous
+
+
+def change(current, before):
+    if not before:
+        return ""
+    return f" ({(current - before) / before * 100:+.1f} %)"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--nodes", nargs="+", default=NODES)
+    parser.add_argument("--cycles", type=int, default=3)
+    parser.add_argument("--latency", type=float, default=0.05, help="segundos por petición o copia")
+    parser.add_argument("--bandwidth", type=float, default=0, help="bytes/s del enlace; 0 = sin límite")
+    parser.add_argument("--handshake", type=float, default=0.3, help="segundos por conexión SSH nueva")
+    parser.add_argument("--output", help="JSONL donde añadir los resultados")
+    parser.add_argument("--compare", help="JSONL con ejecuciones anteriores para comparar")
+    args = parser.parse_args()
+
+    params = {"ciclos": args.cycles, "latencia": args.latency, "ancho_banda": args.bandwidth, "handshake": args.handshake}
+    previous = load_previous(args.compare, params)
+    link = Link(args.latency, args.bandwidth)
+    workroot = tempfile.mkdtemp(prefix="bench_cycle_")
+    http, url, http_received = start_http(link)
+    listener = start_ssh_listener()
+    try:
+        ssh, _, remote_root = standin.install(
+            workroot, handshake=args.handshake, bandwidth=args.bandwidth, latency=args.latency
+        )
+        env = dict(
+            os.environ,
+            PATH=os.path.dirname(ssh) + os.pathsep + os.environ.get("PATH", ""),
+            DEVICE_BACKEND="sim",
+            SSH_PORT=str(listener.getsockname()[1]),
+            SSH_CONTROL_DIR=workroot,
+            READY_TIMEOUT="2",
+            # El proceso hijo cambia el servidor por el sustituto tras crear el nodo
+            SERVER_USER="bench",
+            SERVER_IP="127.0.0.1",
+            SERVER_DIR="bench",
+        )
+        commit = git_commit()
+        for node in args.nodes:
+            workdir = os.path.join(workroot, node)
+            os.makedirs(workdir, exist_ok=True)
+            try:
+                cycles = [run_cycle(node, workdir, url, env, remote_root, http_received) for _ in range(args.cycles)]
+            except RuntimeError as e:
+                print(f"{node}: error: {e}")
+                continue
+            summary = summarize_cycles(cycles)
+            before = previous.get(node, {}).get("despierto")
+            print(
+                f"{node}: despierto {summary['despierto']:.3f} s{change(summary['despierto'], before)}, "
+                f"ciclo {summary['ciclo']:.3f} s, SSH {summary['bytes_ssh']} B, HTTP {summary['bytes_http']} B"
+            )
+            print("    " + ", ".join(f"{name} {seconds:.3f} s" for name, seconds in summary["etapas"].items()))
+            if args.output:
+                with open(args.output, "a") as f:
+                    f.write(json.dumps({
+                        "fecha": datetime.now().isoformat(timespec="seconds"),
+                        "commit": commit,
+                        "nodo": node,
+                        "parametros": params,
+                        **summary,
+                    }) + "\n")
+    finally:
+        http.shutdown()
+        listener.close()
+        shutil.rmtree(workroot, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""
+Benchmark de la subida de datos_sensor.txt: fichero completo por scp en cada
+ciclo (comportamiento original) frente a incrementos con
+nodo_comun.delta_sync.sync_appended, contra el sustituto local de servidor SSH.
+
+Simula una campaña de CYCLES ciclos añadiendo una lectura por ciclo, comprueba
+que la copia del servidor es idéntica a la local y que se recupera si el
+servidor pierde su copia a mitad de campaña.
+
+Las comprobaciones de la sincronización están en tests/test_delta_sync.py;
+aquí sólo se mide, y el script termina con error si las copias difieren.
+
+Uso:
+    python benchmarks/bench_sensor_sync.py --cycles 2000
+"""
+import argparse
+import filecmp
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from nodo_comun.delta_sync import sync_appended
+from nodo_comun.upload import SSHSession
+import standin
+
+LINE = "2024-06-01 10:00:00, T: 21.3, H: 45.1\n"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--cycles", type=int, default=500)
+    parser.add_argument("--handshake", type=float, default=0.0)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="bench_sensor_sync_")
+    try:
+        ssh_cmd, scp_cmd, remote_root = standin.install(workdir, args.handshake)
+        local_path = os.path.join(workdir, "datos_sensor.txt")
+        offset_file = os.path.join(workdir, "datos_sensor.offset")
+        full_bytes = delta_bytes = 0
+        full_seconds = delta_seconds = 0.0
+
+        session = SSHSession("pi", "stand-in", ssh_cmd=ssh_cmd, scp_cmd=scp_cmd)
+        session.open()
+        for cycle in range(args.cycles):
+            with open(local_path, "a") as f:
+                f.write(LINE)
+
+            # Original: el fichero entero en cada ciclo
+            start = time.monotonic()
+            subprocess.run([scp_cmd, "-q", local_path, "pi@stand-in:completo/datos_sensor.txt"])
+            full_seconds += time.monotonic() - start
+            full_bytes += os.path.getsize(local_path)
+
+            if cycle == args.cycles // 2:
+                # El servidor pierde su copia: el cliente debe reenviar desde cero
+                os.remove(os.path.join(remote_root, "delta", "datos_sensor.txt"))
+
+            result = sync_appended(session, local_path, "delta/datos_sensor.txt", offset_file)
+            delta_seconds += result["seconds"]
+            delta_bytes += result["bytes"]
+        session.close()
+
+        identical = filecmp.cmp(local_path, os.path.join(remote_root, "delta", "datos_sensor.txt"), shallow=False)
+        print(f"{args.cycles} ciclos, fichero final de {os.path.getsize(local_path)} bytes")
+        print(f"  fichero completo : {full_bytes} bytes, {full_seconds:.2f} s")
+        print(f"  incrementos      : {delta_bytes} bytes, {delta_seconds:.2f} s")
+        print(f"  copia del servidor idéntica: {identical}")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+    return 0 if identical else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,121 @@
+"""
+Benchmark de arranque: cuánto tarda cada nodo, desde que se lanza Python,
+en importar su script y en tener la primera foto en disco.
+
+Cada medida es un proceso nuevo, como en el campo (la Pi arranca en frío en
+cada ciclo). La cámara es la simulada (CAMERA_BACKEND=fake) y todos los
+ficheros del nodo van a un directorio temporal, así que no hace falta
+hardware: lo que se mide es el coste de los imports y de la inicialización
+del script. Con --importtime se listan además los módulos más lentos de
+importar (python -X importtime).
+
+Con --output se añade una línea JSON por nodo a un fichero, para seguir la
+evolución del arranque entre versiones.
+
+Uso:
+    python benchmarks/bench_startup.py --runs 5
+    python benchmarks/bench_startup.py --importtime --output metrics/arranque.jsonl
+"""
+import argparse
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+NODES = ["nodo_banda", "nodo_amarillo", "nodo_verde_1", "nodo_verde_2"]
+
+# Se ejecuta en el proceso hijo: importa el script del nodo sin lanzar main()
+# y hace la primera captura con todas sus rutas dentro de `workdir`
+CHILD = """
+import importlib.util, json, os, sys, time
+script, workdir = sys.argv[1], sys.argv[2]
+spec = importlib.util.spec_from_file_location("nodo", script)
+module = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(module)
+imported = time.time()
+node = module.NODE
+for name in list(vars(node)):
+    if name.endswith("_file") or name.endswith("_directory"):
+        setattr(node, name, os.path.join(workdir, name))
+os.makedirs(node.metrics_directory, exist_ok=True)
+os.makedirs(node.local_directory, exist_ok=True)
+node.take_photo()
+print(json.dumps({"imported": imported, "captured": time.time()}))
+"""
+
+
+def run_once(script, workdir, importtime=False):
+    """Devuelve (segundos hasta importar, segundos hasta la primera foto, stderr)."""
+    env = dict(os.environ, CAMERA_BACKEND="fake", LOCAL_DIRECTORY=os.path.join(workdir, "fotos"),
+               METRICS_DIRECTORY=workdir, SERVER_USER="bench", SERVER_IP="127.0.0.1", SERVER_DIR="bench")
+    command = [sys.executable, *(["-X", "importtime"] if importtime else []), "-c", CHILD, script, workdir]
+    start = time.time()
+    result = subprocess.run(command, capture_output=True, text=True, env=env, cwd=workdir)
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1])
+    stamps = json.loads(result.stdout.strip().splitlines()[-1])
+    return stamps["imported"] - start, stamps["captured"] - start, result.stderr
+
+
+def slowest_imports(stderr, top):
+    """Módulos con más tiempo acumulado (incluye sus propios imports) según -X importtime."""
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        # Sólo los de primer nivel: el tiempo de los anidados ya está en su padre
+        if name.startswith(" ") and not name.startswith("  "):
+            rows.append((int(cumulative) / 1e6, name.strip()))
+    return sorted(rows, reverse=True)[:top]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--nodes", nargs="+", default=NODES)
+    parser.add_argument("--importtime", action="store_true", help="listar los imports más lentos")
+    parser.add_argument("--top", type=int, default=8)
+    parser.add_argument("--output", help="fichero JSONL donde añadir los resultados")
+    args = parser.parse_args()
+
+    print(f"{'nodo':<15} {'import s':>9} {'1ª foto s':>10} {'máx s':>7}")
+    for node in args.nodes:
+        script = os.path.join(ROOT, node, "main.py")
+        imports, captures, stderr = [], [], ""
+        for _ in range(args.runs):
+            workdir = tempfile.mkdtemp(prefix="bench_startup_")
+            try:
+                imported, captured, stderr = run_once(script, workdir, args.importtime)
+            except RuntimeError as e:
+                print(f"{node:<15} error: {e}")
+                break
+            finally:
+                shutil.rmtree(workdir, ignore_errors=True)
+            imports.append(imported)
+            captures.append(captured)
+        if not captures:
+            continue
+        print(f"{node:<15} {statistics.median(imports):>9.3f} {statistics.median(captures):>10.3f} {max(captures):>7.3f}")
+        if args.importtime:
+            for seconds, name in slowest_imports(stderr, args.top):
+                print(f"    {seconds:>7.3f} s  {name}")
+        if args.output:
+            with open(args.output, "a") as f:
+                f.write(json.dumps({
+                    "fecha": datetime.now().isoformat(timespec="seconds"),
+                    "nodo": node,
+                    "import": round(statistics.median(imports), 3),
+                    "primera_foto": round(statistics.median(captures), 3),
+                    "runs": len(captures),
+                }) + "\n")
+
+
+if __name__ == "__main__":
+    main()
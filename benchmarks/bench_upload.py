@@ -0,0 +1,97 @@
+"""
+Benchmark de subida: bucle clásico de un `scp` por foto frente a una única
+sesión SSH multiplexada (nodo_comun.upload.SSHSession), con una transferencia
+cada vez y con varias simultáneas por la misma sesión (--concurrency).
+
+Por defecto usa el sustituto local de ssh/scp de benchmarks/standin.py, que
+simula el coste del handshake y el ancho de banda del enlace. Con --host se
+mide contra un servidor SSH real.
+
+Uso:
+    python benchmarks/bench_upload.py --files 20 --size 150000
+    python benchmarks/bench_upload.py --files 40 --latency 0.3 --bandwidth 200000 --concurrency 4
+    python benchmarks/bench_upload.py --host 192.168.1.10 --user pi --remote-dir /tmp/bench
+"""
+import argparse
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from nodo_comun.upload import SSHSession, summarize
+import standin
+
+
+def make_images(directory, count, size):
+    os.makedirs(directory, exist_ok=True)
+    paths = []
+    for i in range(count):
+        path = os.path.join(directory, f"20240601_{i:06d}_bench.jpg")
+        with open(path, "wb") as f:
+            f.write(os.urandom(size))
+        paths.append(path)
+    return paths
+
+
+def bench_per_file_scp(paths, target, remote_dir, scp_cmd):
+    """Comportamiento original: un proceso scp (y un handshake) por fichero."""
+    start = time.monotonic()
+    for path in paths:
+        subprocess.run([scp_cmd, "-q", path, f"{target}:{remote_dir}"])
+    return time.monotonic() - start
+
+
+def bench_session(paths, user, host, remote_dir, ssh_cmd, scp_cmd, concurrency=1):
+    start = time.monotonic()
+    with SSHSession(user, host, ssh_cmd=ssh_cmd, scp_cmd=scp_cmd) as session:
+        results = session.put_all([(path, remote_dir) for path in paths], concurrency)
+    return time.monotonic() - start, results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--files", type=int, default=20)
+    parser.add_argument("--size", type=int, default=150_000, help="bytes por imagen")
+    parser.add_argument("--handshake", type=float, default=0.5, help="segundos por handshake (sustituto local)")
+    parser.add_argument("--bandwidth", type=float, default=0, help="bytes/s del enlace simulado (0 = sin límite)")
+    parser.add_argument("--latency", type=float, default=0, help="segundos de ida y vuelta por copia (sustituto local)")
+    parser.add_argument("--concurrency", type=int, default=3, help="transferencias simultáneas por la sesión")
+    parser.add_argument("--host", help="servidor SSH real; sin él se usa el sustituto local")
+    parser.add_argument("--user", default=os.getenv("USER", "pi"))
+    parser.add_argument("--remote-dir", default="/bench_upload/")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="bench_upload_")
+    try:
+        if args.host:
+            ssh_cmd, scp_cmd, host = "ssh", "scp", args.host
+        else:
+            ssh_cmd, scp_cmd, _ = standin.install(workdir, args.handshake, args.bandwidth, args.latency)
+            host = "stand-in"
+        paths = make_images(os.path.join(workdir, "fotos"), args.files, args.size)
+
+        legacy = bench_per_file_scp(paths, f"{args.user}@{host}", args.remote_dir, scp_cmd)
+        session, results = bench_session(paths, args.user, host, args.remote_dir, ssh_cmd, scp_cmd)
+        stats = summarize(results, session)
+        parallel, parallel_results = bench_session(
+            paths, args.user, host, args.remote_dir, ssh_cmd, scp_cmd, args.concurrency
+        )
+        parallel_stats = summarize(parallel_results, parallel)
+
+        print(f"{args.files} ficheros de {args.size} bytes")
+        print(f"  scp por fichero : {legacy:.2f} s")
+        print(f"  sesión única    : {session:.2f} s ({stats['throughput']} B/s, {stats['failed']} fallos)")
+        print(f"  {f'{args.concurrency} canales':<16}: {parallel:.2f} s "
+              f"({parallel_stats['throughput']} B/s, {parallel_stats['failed']} fallos)")
+        print(f"  aceleración     : x{legacy / session:.1f} sesión, x{legacy / parallel:.1f} con {args.concurrency} canales")
+        for r in results[:5]:
+            print(f"    {r['file']}: {r['bytes']} bytes en {r['seconds']} s")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+"""
+Sustituto local de un servidor SSH para los benchmarks.
+
+Instala dos ejecutables falsos, `ssh` y `scp`, que simulan el coste del
+handshake (HANDSHAKE segundos por conexión nueva, nada si existe el socket de
+control de una conexión maestra) y el ancho de banda del enlace. El "servidor"
+es un directorio temporal: scp copia ahí los ficheros y los comandos remotos de
+ssh se ejecutan con `sh -c` dentro de él, así que las rutas remotas deben ser
+relativas.
+
+Cada copia paga además LATENCY segundos de ida y vuelta (apertura del canal,
+confirmación) y todas comparten el mismo enlace: los bytes de copias
+simultáneas se transmiten de uno en uno, así que subir en paralelo sólo
+ahorra la latencia, como en un enlace real.
+
+Los bytes que reciben ssh y scp se anotan, uno por línea, en `.sent` dentro
+del directorio remoto (ver sent_bytes).
+"""
+import os
+import sys
+
+FAKE_SSH = '''#!{python}
+import os, subprocess, sys, time
+args = sys.argv[1:]
+control, operation, positional = None, None, []
+i = 0
+while i < len(args):
+    if args[i] == "-o":
+        if args[i + 1].startswith("ControlPath="):
+            control = args[i + 1].split("=", 1)[1]
+        i += 2
+    elif args[i] == "-O":
+        operation = args[i + 1]
+        i += 2
+    elif args[i].startswith("-"):
+        i += 1
+    else:
+        positional.append(args[i])
+        i += 1
+if operation == "exit":
+    if control and os.path.exists(control):
+        os.remove(control)
+    sys.exit(0)
+if not (control and os.path.exists(control)):
+    time.sleep(float(os.environ.get("FAKE_SSH_HANDSHAKE", "0.5")))
+if len(positional) < 2:
+    # Conexión maestra: deja el socket de control y termina
+    if control:
+        open(control, "w").close()
+    sys.exit(0)
+data = sys.stdin.buffer.read()
+bandwidth = float(os.environ.get("FAKE_SSH_BANDWIDTH", "0"))
+if bandwidth:
+    time.sleep(len(data) / bandwidth)
+root = os.environ["FAKE_SSH_ROOT"]
+os.makedirs(root, exist_ok=True)
+with open(os.path.join(root, ".sent"), "a") as sent:
+    sent.write(f"{{len(data)}}\\n")
+sys.exit(subprocess.run(["sh", "-c", positional[1]], input=data, cwd=root).returncode)
+'''
+
+FAKE_SCP = '''#!{python}
+import fcntl, os, shutil, sys, time
+args = sys.argv[1:]
+control = next((a.split("=", 1)[1] for a in args if a.startswith("ControlPath=")), None)
+if not (control and os.path.exists(control)):
+    time.sleep(float(os.environ.get("FAKE_SSH_HANDSHAKE", "0.5")))
+src, dest = args[-2], args[-1].split(":", 1)[1]
+time.sleep(float(os.environ.get("FAKE_SSH_LATENCY", "0")))
+bandwidth = float(os.environ.get("FAKE_SSH_BANDWIDTH", "0"))
+if bandwidth:
+    # Un solo enlace: las copias simultáneas se turnan para transmitir
+    with open(os.path.join(os.environ["FAKE_SSH_ROOT"], ".link"), "w") as link:
+        fcntl.flock(link, fcntl.LOCK_EX)
+        time.sleep(os.path.getsize(src) / bandwidth)
+dest = os.path.join(os.environ["FAKE_SSH_ROOT"], dest.lstrip("/"))
+if dest.endswith("/") or os.path.isdir(dest):
+    os.makedirs(dest, exist_ok=True)
+    dest = os.path.join(dest, os.path.basename(src))
+else:
+    os.makedirs(os.path.dirname(dest), exist_ok=True)
+shutil.copyfile(src, dest)
+with open(os.path.join(os.environ["FAKE_SSH_ROOT"], ".sent"), "a") as sent:
+    sent.write(f"{{os.path.getsize(src)}}\\n")
+'''
+
+
+def install(workdir, handshake=0.5, bandwidth=0, latency=0):
+    """
+    Instala el sustituto en `workdir` y devuelve (ssh, scp, raiz_remota).
+    `bandwidth` en bytes/s; 0 significa sin límite. `latency` en segundos por copia.
+    """
+    bindir = os.path.join(workdir, "bin")
+    os.makedirs(bindir, exist_ok=True)
+    paths = []
+    for name, source in (("ssh", FAKE_SSH), ("scp", FAKE_SCP)):
+        path = os.path.join(bindir, name)
+        with open(path, "w") as f:
+            f.write(source.format(python=sys.executable))
+        os.chmod(path, 0o755)
+        paths.append(path)
+    root = os.path.join(workdir, "remote")
+    os.makedirs(root, exist_ok=True)
+    os.environ["FAKE_SSH_ROOT"] = root
+    os.environ["FAKE_SSH_HANDSHAKE"] = str(handshake)
+    os.environ["FAKE_SSH_BANDWIDTH"] = str(bandwidth)
+    os.environ["FAKE_SSH_LATENCY"] = str(latency)
+    return paths[0], paths[1], root
+
+
+def sent_bytes(root):
+    """Bytes recibidos por el servidor sustituto desde que se instaló."""
+    path = os.path.join(root, ".sent")
+    if not os.path.exists(path):
+        return 0
+    with open(path, "r") as f:
+        return sum(int(line) for line in f if line.strip())
@@ -1,75 +1,60 @@
-import re
-from datetime import datetime
 import os
+from datetime import datetime
 
-# Definir el archivo de salida
-output_file = "output.txt"
-
-# Definir umbrales (si decides implementarlos en el futuro)
-MIN_THRESHOLD = 3500  # segundos
-MAX_THRESHOLD = 3900  # segundos
-
-# Paso 1: Cargar log_banda.txt
-with open("log_banda.txt", "r") as file:
-    lines = file.readlines()
-
-# Paso 2: Extraer las líneas relevantes (aquellas con "Photo")
-photo_lines = [line.strip() for line in lines if "Photo" in line]
-
-# Paso 3: Extraer la hora y el nombre de la foto
-time_format = "%Y-%m-%d %H:%M:%S.%f"
-photo_data = []
-
-for line in photo_lines:
-    # Extraer hora y nombre de la foto usando regex
-    match = re.match(
-        r"(\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2}\.\d{6}): Photo (\S+) taken.", line
-    )
-    if match:
-        try:
-            time_str = match.group(1)
-            photo_name = match.group(2)
-            # Convertir la marca de tiempo a un objeto datetime
-            photo_time = datetime.strptime(time_str, time_format)
-            photo_data.append((photo_time, photo_name))
-        except ValueError:
-            # Si la conversión falla, simplemente omite la línea
-            continue
-
-# Paso 4: Calcular la diferencia de tiempo en segundos
-differences = []
-for i in range(1, len(photo_data)):
-    time_diff = (photo_data[i][0] - photo_data[i - 1][0]).total_seconds()
-    differences.append(time_diff)
-
-# Paso 5: Escribir las diferencias en out.txt con las columnas especificadas
-# Verificar si el archivo existe y si está vacío para escribir el encabezado
-write_header = not os.path.isfile(output_file) or os.path.getsize(output_file) == 0
-
-with open(output_file, "a") as out_file:
-    if write_header:
-        header = "T1\tT2\tT3\tT4\tT5\tT1-T2\tT1-T3\n"
-        out_file.write(header)
-
-    for i, diff in enumerate(differences):
-        # Obtener la marca de tiempo de la foto anterior
-        T1 = differences[i]
-
-        # Como no tienes datos para T2, T3, T4, T5, se llenan con 'N/A'
-        T2 = "N/A"
-        T3 = "N/A"
-        T4 = "N/A"
-        T5 = "N/A"
-
-        # Asignar la diferencia a T1-T2 y dejar T1-T3 como 'N/A'
-        T1_T2 = "N/A"
-        T1_T3 = "N/A"
-
-        # Escribir la línea en el archivo de salida
-        line = f"{T1}\t{T2}\t{T3}\t{T4}\t{T5}\t{T1_T2}\t{T1_T3}\n"
-        out_file.write(line)
+from log_stream import load_checkpoint, photo_events, save_checkpoint
 
-        # Opcional: Imprimir en consola
-        print(
-            f"Time difference between {photo_data[i][1]} and {photo_data[i+1][1]}: {diff} seconds"
-        )
+# Definir el archivo de salida y el checkpoint con lo ya procesado
+output_file = "output.txt"
+checkpoint_file = "checkpoint_sincronizacion.json"
+
+# Logs de los nodos que se analizan en una misma pasada
+LOGS = {
+    "banda": "log_banda.txt",
+    "verde": "log_verde.txt",
+    "amarillo": "log_amarillo.txt",
+}
+
+HEADER = "nodo\tfoto_anterior\tfoto\tT1\n"
+
+
+def main():
+    checkpoint = load_checkpoint(checkpoint_file)
+    output_offset = checkpoint.get("output_offset", 0)
+
+    # Si output.txt falta o es más corto de lo esperado, se reconstruye desde cero
+    if not os.path.isfile(output_file) or os.path.getsize(output_file) < output_offset:
+        checkpoint, output_offset = {}, 0
+    # Descartar lo que una ejecución interrumpida escribiera después del último checkpoint:
+    # así volver a ejecutar el script nunca duplica intervalos
+    with open(output_file, "a"):
+        pass
+    os.truncate(output_file, output_offset)
+
+    logs_state = checkpoint.setdefault("logs", {})
+    with open(output_file, "a") as out_file:
+        if output_offset == 0:
+            out_file.write(HEADER)
+
+        for node, log_path in LOGS.items():
+            state = logs_state.setdefault(node, {})
+            for photo_time, photo_name in photo_events(log_path, state):
+                if "last_time" in state:
+                    # Diferencia de tiempo en segundos con la foto anterior del mismo nodo
+                    previous_time = datetime.fromisoformat(state["last_time"])
+                    diff = (photo_time - previous_time).total_seconds()
+                    out_file.write(f"{node}\t{state['last_photo']}\t{photo_name}\t{diff}\n")
+                    print(
+                        f"Time difference between {state['last_photo']} and {photo_name}: {diff} seconds"
+                    )
+                state["last_time"] = photo_time.isoformat()
+                state["last_photo"] = photo_name
+
+        out_file.flush()
+        os.fsync(out_file.fileno())
+
+    checkpoint["output_offset"] = os.path.getsize(output_file)
+    save_checkpoint(checkpoint_file, checkpoint)
+
+
+if __name__ == "__main__":
+    main()
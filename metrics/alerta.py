@@ -1,75 +1,158 @@
-import re
-from datetime import datetime
+"""
+Alertas de ciclos de captura perdidos o desplazados.
+
+Consume las líneas "Photo ... taken." de todos los logs log_*.txt según van
+llegando (sin reprocesar el histórico: el avance de cada log y el estado de
+cada nodo se guardan en un checkpoint) y compara el intervalo entre fotos de
+cada nodo con MIN_THRESHOLD y MAX_THRESHOLD:
+
+- missed: intervalo mayor que MAX_THRESHOLD, se ha perdido al menos un ciclo.
+- early:  intervalo menor que MIN_THRESHOLD, despertar duplicado o adelantado.
+- drift:  la media de los últimos WINDOW intervalos se aleja del periodo
+          nominal más de DRIFT_TOLERANCE, aunque cada intervalo por separado
+          siga dentro de los umbrales (p. ej. deriva del RTC).
+
+La memoria por nodo es constante: una ventana de WINDOW intervalos.
+
+Uso:
+    python alerta.py            # procesa lo nuevo y termina (para cron)
+    python alerta.py --follow   # se queda vigilando los logs
+"""
+import argparse
+import glob
 import os
+import time
+from collections import deque
+from datetime import datetime
 
-# Definir el archivo de salida
-output_file = "output.txt"
+from log_stream import load_checkpoint, photo_events, save_checkpoint
 
-# Definir umbrales (si decides implementarlos en el futuro)
+# Definir umbrales
 MIN_THRESHOLD = 3500  # segundos
 MAX_THRESHOLD = 3900  # segundos
+NOMINAL_PERIOD = int(os.getenv("NOMINAL_PERIOD", (MIN_THRESHOLD + MAX_THRESHOLD) // 2))
+DRIFT_TOLERANCE = int(os.getenv("DRIFT_TOLERANCE", "60"))  # segundos
+WINDOW = int(os.getenv("ALERT_WINDOW", "8"))  # intervalos por nodo
+# Huecos mayores que éste son la pausa nocturna, no ciclos perdidos
+NIGHT_GAP = int(os.getenv("NIGHT_GAP", str(8 * 3600)))  # segundos
+POLL_INTERVAL = 30  # segundos entre lecturas en modo --follow
+
+LOG_PATTERN = "log_*.txt"
+alerts_file = "alertas.txt"
+checkpoint_file = "checkpoint_alertas.json"
+
+
+class NodeMonitor:
+    """Ventana deslizante de intervalos de un nodo con su suma acumulada."""
+
+    def __init__(self, node, state=None):
+        state = state or {}
+        self.node = node
+        self.last_time = datetime.fromisoformat(state["last_time"]) if state.get("last_time") else None
+        self.last_photo = state.get("last_photo")
+        self.window = deque(state.get("window", []), maxlen=WINDOW)
+        self.window_sum = sum(self.window)
+        self.drifting = state.get("drifting", False)
+
+    def to_state(self):
+        return {
+            "last_time": self.last_time.isoformat() if self.last_time else None,
+            "last_photo": self.last_photo,
+            "window": list(self.window),
+            "drifting": self.drifting,
+        }
+
+    def _push(self, interval):
+        if len(self.window) == self.window.maxlen:
+            self.window_sum -= self.window[0]
+        self.window.append(interval)
+        self.window_sum += interval
+
+    def observe(self, photo_time, photo_name):
+        """Registra una foto y devuelve la lista de alertas (tipo, mensaje) que provoca."""
+        alerts = []
+        previous_time, previous_photo = self.last_time, self.last_photo
+        self.last_time, self.last_photo = photo_time, photo_name
+        if previous_time is None:
+            return alerts
+
+        interval = (photo_time - previous_time).total_seconds()
+        if interval > NIGHT_GAP:
+            # Primera foto del día: la ventana empieza de nuevo
+            self.window.clear()
+            self.window_sum = 0
+            return alerts
+        if interval > MAX_THRESHOLD:
+            missed = max(1, round(interval / NOMINAL_PERIOD) - 1)
+            alerts.append(("missed", f"{missed} ciclo(s) perdido(s) entre {previous_photo} y {photo_name} ({interval:.0f} s)"))
+            return alerts
+        if interval < MIN_THRESHOLD:
+            alerts.append(("early", f"intervalo corto entre {previous_photo} y {photo_name} ({interval:.0f} s)"))
+            return alerts
+
+        self._push(interval)
+        if len(self.window) == WINDOW:
+            mean = self.window_sum / WINDOW
+            drifting = abs(mean - NOMINAL_PERIOD) > DRIFT_TOLERANCE
+            # Avisar sólo al entrar en deriva, no en cada foto mientras dure
+            if drifting and not self.drifting:
+                alerts.append(("drift", f"media de {WINDOW} intervalos {mean:.0f} s frente a {NOMINAL_PERIOD} s nominales (hasta {photo_name})"))
+            self.drifting = drifting
+        return alerts
+
+
+def node_name(log_path):
+    # log_banda.txt -> banda
+    return os.path.basename(log_path)[len("log_"):-len(".txt")]
+
+
+def process_once(checkpoint):
+    """Lee lo nuevo de cada log y devuelve las alertas generadas."""
+    logs_state = checkpoint.setdefault("logs", {})
+    nodes_state = checkpoint.setdefault("nodes", {})
+    alerts = []
+    for log_path in sorted(glob.glob(LOG_PATTERN)):
+        node = node_name(log_path)
+        monitor = NodeMonitor(node, nodes_state.get(node))
+        for photo_time, photo_name in photo_events(log_path, logs_state.setdefault(node, {})):
+            for kind, message in monitor.observe(photo_time, photo_name):
+                alerts.append((photo_time, node, kind, message))
+        nodes_state[node] = monitor.to_state()
+    return alerts
+
+
+def write_alerts(alerts):
+    with open(alerts_file, "a") as out_file:
+        for photo_time, node, kind, message in alerts:
+            line = f"{photo_time}\t{node}\t{kind}\t{message}"
+            out_file.write(line + "\n")
+            print(line)
+        out_file.flush()
+        os.fsync(out_file.fileno())
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Alertas de ciclos de captura perdidos o desplazados.")
+    parser.add_argument("--follow", action="store_true", help="seguir vigilando los logs")
+    args = parser.parse_args()
+
+    checkpoint = load_checkpoint(checkpoint_file)
+    while True:
+        # Descartar alertas escritas por una ejecución interrumpida antes de su checkpoint
+        alerts_offset = checkpoint.get("alerts_offset", 0)
+        with open(alerts_file, "a"):
+            pass
+        if os.path.getsize(alerts_file) > alerts_offset:
+            os.truncate(alerts_file, alerts_offset)
+
+        write_alerts(process_once(checkpoint))
+        checkpoint["alerts_offset"] = os.path.getsize(alerts_file)
+        save_checkpoint(checkpoint_file, checkpoint)
+
+        if not args.follow:
+            break
+        time.sleep(POLL_INTERVAL)
+
 
-# Paso 1: Cargar log_banda.txt
-with open("log_banda.txt", "r") as file:
-    lines = file.readlines()
-
-# Paso 2: Extraer las líneas relevantes (aquellas con "Photo")
-photo_lines = [line.strip() for line in lines if "Photo" in line]
-
-# Paso 3: Extraer la hora y el nombre de la foto
-time_format = "%Y-%m-%d %H:%M:%S.%f"
-photo_data = []
-
-for line in photo_lines:
-    # Extraer hora y nombre de la foto usando regex
-    match = re.match(
-        r"(\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2}\.\d{6}): Photo (\S+) taken.", line
-    )
-    if match:
-        try:
-            time_str = match.group(1)
-            photo_name = match.group(2)
-            # Convertir la marca de tiempo a un objeto datetime
-            photo_time = datetime.strptime(time_str, time_format)
-            photo_data.append((photo_time, photo_name))
-        except ValueError:
-            # Si la conversión falla, simplemente omite la línea
-            continue
-
-# Paso 4: Calcular la diferencia de tiempo en segundos
-differences = []
-for i in range(1, len(photo_data)):
-    time_diff = (photo_data[i][0] - photo_data[i - 1][0]).total_seconds()
-    differences.append(time_diff)
-
-# Paso 5: Escribir las diferencias en out.txt con las columnas especificadas
-# Verificar si el archivo existe y si está vacío para escribir el encabezado
-write_header = not os.path.isfile(output_file) or os.path.getsize(output_file) == 0
-
-with open(output_file, "a") as out_file:
-    if write_header:
-        header = "T1\tT2\tT3\tT4\tT5\tT1-T2\tT1-T3\n"
-        out_file.write(header)
-
-    for i, diff in enumerate(differences):
-        # Obtener la marca de tiempo de la foto anterior
-        T1 = differences[i]
-
-        # Como no tienes datos para T2, T3, T4, T5, se llenan con 'N/A'
-        T2 = "N/A"
-        T3 = "N/A"
-        T4 = "N/A"
-        T5 = "N/A"
-
-        # Asignar la diferencia a T1-T2 y dejar T1-T3 como 'N/A'
-        T1_T2 = "N/A"
-        T1_T3 = "N/A"
-
-        # Escribir la línea en el archivo de salida
-        line = f"{T1}\t{T2}\t{T3}\t{T4}\t{T5}\t{T1_T2}\t{T1_T3}\n"
-        out_file.write(line)
-
-        # Opcional: Imprimir en consola
-        print(
-            f"Time difference between {photo_data[i][1]} and {photo_data[i+1][1]}: {diff} seconds"
-        )
+if __name__ == "__main__":
+    main()
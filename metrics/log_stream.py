@@ -0,0 +1,81 @@
+"""
+Lectura incremental de los logs de los nodos (log_banda.txt, log_verde.txt,
+log_amarillo.txt).
+
+En vez de cargar el log entero con readlines() en cada ejecución, se guarda
+para cada fichero el byte hasta el que ya se ha procesado y sólo se leen las
+líneas nuevas. Una línea a medio escribir (sin salto de línea final) se deja
+para la siguiente ejecución.
+"""
+import json
+import os
+import re
+from datetime import datetime
+
+# "2024-06-01 10:00:03.123456: Photo 20240601_100000_banda_RP06.jpg taken."
+# datetime.now() omite los microsegundos cuando valen 0, así que son opcionales
+PHOTO_RE = re.compile(
+    r"^(\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2}(?:\.\d{1,6})?): Photo (\S+) taken\."
+)
+
+
+def parse_time(time_str):
+    if "." in time_str:
+        return datetime.strptime(time_str, "%Y-%m-%d %H:%M:%S.%f")
+    return datetime.strptime(time_str, "%Y-%m-%d %H:%M:%S")
+
+
+def read_new_lines(path, state):
+    """
+    Devuelve las líneas completas añadidas a `path` desde state["offset"] y
+    avanza el offset. Si el fichero se ha rotado o truncado se empieza de cero.
+    """
+    if not os.path.exists(path):
+        return
+    stat = os.stat(path)
+    if stat.st_ino != state.get("inode") or stat.st_size < state.get("offset", 0):
+        state["offset"] = 0
+        state["inode"] = stat.st_ino
+
+    with open(path, "rb") as f:
+        f.seek(state["offset"])
+        for raw in f:
+            if not raw.endswith(b"\n"):
+                break
+            state["offset"] += len(raw)
+            yield raw.decode("utf-8", errors="replace").rstrip("\r\n")
+
+
+def photo_events(path, state):
+    """Genera (hora, nombre_foto) por cada línea "Photo ... taken." nueva."""
+    for line in read_new_lines(path, state):
+        if "Photo" not in line:
+            continue
+        match = PHOTO_RE.match(line)
+        if not match:
+            continue
+        try:
+            yield parse_time(match.group(1)), match.group(2)
+        except ValueError:
+            # Si la conversión falla, simplemente omite la línea
+            continue
+
+
+def load_checkpoint(path):
+    if not os.path.exists(path):
+        return {}
+    try:
+        with open(path, "r") as f:
+            return json.load(f)
+    except ValueError:
+        return {}
+
+
+def save_checkpoint(path, checkpoint):
+    """Escritura atómica: un corte a mitad nunca deja un checkpoint corrupto."""
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(checkpoint, f, indent=2)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
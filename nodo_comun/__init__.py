@@ -0,0 +1 @@
+"""Código compartido por los scripts de los nodos (banda, amarillo, verde)."""
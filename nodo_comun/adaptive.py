@@ -0,0 +1,70 @@
+"""
+Calidad y resolución de la foto según el enlace medido.
+
+Con el rendimiento del último ciclo con subida (B/s, lo guarda la política
+de subida en su estado) se calcula cuántos bytes caben por foto para que la
+subida de un lote del nodo dure UPLOAD_TARGET_SECONDS, acotado entre
+ADAPT_MIN_BYTES y ADAPT_MAX_BYTES. La foto se recodifica buscando la mayor calidad que cabe en
+ese tamaño (imaging.encode_to_target).
+
+La resolución de captura baja un escalón de ADAPT_RESOLUTIONS cuando, para
+caber, la calidad tiene que bajar de ADAPT_MIN_QUALITY, y sube un escalón
+cuando sobra espacio incluso con ADAPT_UPGRADE_QUALITY. Se activa por nodo
+con ADAPTIVE_QUALITY=1; sin medida del enlace se usa la configuración fija.
+"""
+import os
+
+from nodo_comun.camera import CAMERA_HEIGHT, CAMERA_WIDTH
+from nodo_comun.imaging import IMAGE_TARGET_BYTES
+from nodo_comun.policy import UPLOAD_MIN_FILES, _state_lock, load_state, save_state
+
+ADAPTIVE_QUALITY = os.getenv("ADAPTIVE_QUALITY", "0") == "1"
+UPLOAD_TARGET_SECONDS = float(os.getenv("UPLOAD_TARGET_SECONDS", "20"))
+ADAPT_MIN_BYTES = int(os.getenv("ADAPT_MIN_BYTES", "20000"))
+ADAPT_MAX_BYTES = int(os.getenv("ADAPT_MAX_BYTES", "400000"))
+ADAPT_MIN_QUALITY = int(os.getenv("ADAPT_MIN_QUALITY", "50"))
+ADAPT_UPGRADE_QUALITY = int(os.getenv("ADAPT_UPGRADE_QUALITY", "90"))
+# Resoluciones de captura, de mayor a menor; la primera es la de siempre
+ADAPT_RESOLUTIONS = os.getenv("ADAPT_RESOLUTIONS", f"{CAMERA_WIDTH}x{CAMERA_HEIGHT},960x540,640x360")
+
+
+def resolutions(spec=ADAPT_RESOLUTIONS):
+    return [tuple(int(v) for v in size.split("x")) for size in spec.split(",")]
+
+
+def capture_settings(state_path, batch_files=UPLOAD_MIN_FILES):
+    """
+    Resolución de captura y tamaño objetivo para la foto de este ciclo, que
+    se sube en lotes de `batch_files` fotos (el min_files del nodo):
+    {"width", "height", "target_bytes", "level"}.
+    """
+    settings = {"width": CAMERA_WIDTH, "height": CAMERA_HEIGHT, "target_bytes": IMAGE_TARGET_BYTES, "level": 0}
+    if not ADAPTIVE_QUALITY:
+        return settings
+    state = load_state(state_path)
+    ladder = resolutions()
+    level = min(state.get("adaptacion", {}).get("nivel", 0), len(ladder) - 1)
+    settings["width"], settings["height"] = ladder[level]
+    settings["level"] = level
+    throughput = state.get("rendimiento")
+    if throughput:
+        # Las fotos de un lote comparten el tiempo de subida del ciclo
+        target = throughput * UPLOAD_TARGET_SECONDS / max(1, batch_files)
+        settings["target_bytes"] = int(min(ADAPT_MAX_BYTES, max(ADAPT_MIN_BYTES, target)))
+    return settings
+
+
+def record_quality(state_path, settings, info):
+    """Tras recodificar, ajusta el escalón de resolución del siguiente ciclo."""
+    if not ADAPTIVE_QUALITY or info.get("quality") is None:
+        return settings["level"]
+    level = settings["level"]
+    if info["quality"] < ADAPT_MIN_QUALITY:
+        level = min(level + 1, len(resolutions()) - 1)
+    elif info["quality"] >= ADAPT_UPGRADE_QUALITY:
+        level = max(level - 1, 0)
+    with _state_lock:
+        state = load_state(state_path)
+        state["adaptacion"] = {"nivel": level, "calidad": info["quality"], "objetivo": settings["target_bytes"]}
+        save_state(state_path, state)
+    return level
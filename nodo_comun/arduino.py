@@ -0,0 +1,315 @@
+"""
+Protocolo serie con el Arduino: mensajes con trama en lugar de texto suelto.
+
+Cada mensaje es
+
+    0xA5 | tipo (1 B) | longitud (1 B) | carga (longitud B) | CRC-8 (1 B)
+
+con el CRC-8 (polinomio 0x07) de tipo, longitud y carga. El byte de
+sincronía nunca aparece en texto ASCII, así que las tramas pueden ir
+mezcladas con los mensajes de depuración del sketch, y tras un byte perdido
+o un CRC malo se descarta lo leído hasta la siguiente 0xA5. La longitud se
+comprueba contra la de su tipo antes de esperar la carga (un tipo desconocido
+o una longitud imposible resincronizan enseguida), y una trama a medias que
+deja de llegar durante ARDUINO_FRAME_GAP segundos también se descarta.
+
+Campos (carga little-endian):
+
+    0x10 bateria_arduino  uint16, mV
+    0x11 bateria_pi       uint16, mV
+    0x20 conteo_ir        uint32
+    0x21 histograma_ir    inicio uint32 (s desde epoch), segundos por intervalo
+                          uint16, sensores uint8 y un uint8 por intervalo y
+                          sensor (primero todos los del sensor 1)
+
+El histograma llega en tantas tramas como haga falta (HISTOGRAM_MAX_BINS
+intervalos por trama) y siempre antes que conteo_ir, así que esperar al
+total basta para tener también el histograma completo.
+
+read_fields() espera en ser.read() (sin pausas fijas) y vuelve en cuanto han
+llegado todos los campos pedidos, así que la etapa dura lo que tarda el
+Arduino en mandarlos. Mientras se actualiza el firmware se siguen entendiendo
+las líneas de texto de los sketches anteriores ("Voltage A1: 3.71V",
+"Voltage:5.02" de arduino_pi_communication.ino, que sólo medía A0, el conteo
+como un entero suelto).
+
+FakeArduino sirve las tramas por un pseudo-terminal (pty) que se abre como
+el puerto serie real, para pruebas y benchmarks fuera de la Pi.
+"""
+import os
+import struct
+import threading
+import time
+
+ARDUINO_TIMEOUT = float(os.getenv("ARDUINO_TIMEOUT", "10"))
+# Silencio en medio de una trama que se toma como trama perdida (255 B a 9600 baudios son 0.27 s)
+ARDUINO_FRAME_GAP = float(os.getenv("ARDUINO_FRAME_GAP", "0.2"))
+
+SYNC = 0xA5
+# tipo -> (campo, formato de la carga, escala a unidades del campo)
+FIELDS = {
+    0x10: ("bateria_arduino", "<H", 0.001),
+    0x11: ("bateria_pi", "<H", 0.001),
+    0x20: ("conteo_ir", "<I", 1),
+}
+FIELD_TYPES = {name: (msg_type, fmt, scale) for msg_type, (name, fmt, scale) in FIELDS.items()}
+
+HISTOGRAM_TYPE = 0x21
+HISTOGRAM_HEADER = struct.Struct("<IHB")
+HISTOGRAM_MAX_SENSORS = 2
+HISTOGRAM_MAX_BINS = (255 - HISTOGRAM_HEADER.size) // HISTOGRAM_MAX_SENSORS
+
+
+def crc8(data, poly=0x07):
+    crc = 0
+    for byte in data:
+        crc ^= byte
+        for _ in range(8):
+            crc = ((crc << 1) ^ poly) & 0xFF if crc & 0x80 else (crc << 1) & 0xFF
+    return crc
+
+
+def valid_length(msg_type, length):
+    """¿Puede una trama de `msg_type` tener esa longitud de carga?"""
+    if msg_type == HISTOGRAM_TYPE:
+        return length > HISTOGRAM_HEADER.size
+    field = FIELDS.get(msg_type)
+    return field is not None and length == struct.calcsize(field[1])
+
+
+def encode_frame(msg_type, payload):
+    body = bytes([msg_type, len(payload)]) + payload
+    return bytes([SYNC]) + body + bytes([crc8(body)])
+
+
+def encode_field(name, value):
+    msg_type, fmt, scale = FIELD_TYPES[name]
+    return encode_frame(msg_type, struct.pack(fmt, round(value / scale)))
+
+
+def encode_histogram(start, seconds, counts):
+    """
+    Tramas del histograma: `counts` es una lista por sensor con los conteos de
+    cada intervalo de `seconds` segundos a partir de `start` (saturan en 255).
+    """
+    frames = []
+    for first in range(0, len(counts[0]), HISTOGRAM_MAX_BINS):
+        payload = HISTOGRAM_HEADER.pack(start + first * seconds, seconds, len(counts))
+        for sensor in counts:
+            payload += bytes(min(c, 255) for c in sensor[first:first + HISTOGRAM_MAX_BINS])
+        frames.append(encode_frame(HISTOGRAM_TYPE, payload))
+    return b"".join(frames)
+
+
+def decode_histogram(chunks):
+    """
+    Une los trozos de histograma recibidos. Devuelve (inicio de cada
+    intervalo en s desde epoch, conteos con forma (sensores, intervalos)).
+    """
+    import numpy as np
+
+    times, counts = [], []
+    for chunk in chunks:
+        bins = np.frombuffer(chunk["conteos"], dtype=np.uint8).reshape(chunk["sensores"], -1)
+        times.append(chunk["inicio"] + chunk["segundos"] * np.arange(bins.shape[1], dtype=np.int64))
+        counts.append(bins)
+    return np.concatenate(times), np.concatenate(counts, axis=1)
+
+
+def histogram_batch(chunks):
+    """Los trozos de histograma en JSON, para reenviarlos al servidor tal cual llegaron."""
+    batch = []
+    for chunk in chunks:
+        size = len(chunk["conteos"]) // chunk["sensores"]
+        batch.append({
+            "inicio": chunk["inicio"],
+            "segundos": chunk["segundos"],
+            **{f"ir{i + 1}": list(chunk["conteos"][i * size:(i + 1) * size]) for i in range(chunk["sensores"])},
+        })
+    return batch
+
+
+def parse_legacy(line):
+    """Campos de una línea de texto de los sketches anteriores."""
+    try:
+        if "Voltage A1" in line:
+            return {"bateria_arduino": float(line.split(":")[1].strip().replace("V", ""))}
+        if "Voltage A0" in line or line.startswith("Voltage:"):
+            return {"bateria_pi": float(line.split(":")[1].strip().replace("V", ""))}
+        return {"conteo_ir": int(line)}
+    except (ValueError, IndexError):
+        return {}
+
+
+class FrameParser:
+    """Separa tramas y líneas de texto de un flujo de bytes que llega a trozos."""
+
+    def __init__(self):
+        self.buffer = bytearray()
+        self.text = bytearray()
+        self.errors = 0
+        self.histogram = []
+
+    @property
+    def partial(self):
+        """¿Hay una trama empezada esperando el resto?"""
+        return bool(self.buffer)
+
+    def feed(self, data):
+        """Añade bytes recibidos y devuelve los campos completos: {campo: valor}."""
+        fields = {}
+        self.buffer += data
+        while self.buffer:
+            if self.buffer[0] != SYNC:
+                byte = self.buffer.pop(0)
+                if byte == 0x0A:
+                    fields.update(parse_legacy(self.text.decode(errors="replace").strip()))
+                    self.text.clear()
+                elif byte != 0x0D:
+                    self.text.append(byte)
+                continue
+            if len(self.buffer) < 3:
+                break
+            length = self.buffer[2]
+            if not valid_length(self.buffer[1], length):
+                # Tipo desconocido o longitud corrupta: no se espera a una carga que no llegará
+                self.errors += 1
+                del self.buffer[0]
+                continue
+            if len(self.buffer) < length + 4:
+                break
+            body = bytes(self.buffer[1:length + 3])
+            if crc8(body) != self.buffer[length + 3]:
+                # Trama corrupta: se salta la sincronía y se busca la siguiente
+                self.errors += 1
+                del self.buffer[0]
+                continue
+            del self.buffer[:length + 4]
+            if body[0] == HISTOGRAM_TYPE:
+                start, seconds, sensors = HISTOGRAM_HEADER.unpack_from(body, 2)
+                counts = body[2 + HISTOGRAM_HEADER.size:]
+                if sensors and len(counts) % sensors == 0:
+                    self.histogram.append({"inicio": start, "segundos": seconds, "sensores": sensors, "conteos": counts})
+                else:
+                    self.errors += 1
+                continue
+            name, fmt, scale = FIELDS[body[0]]
+            value = struct.unpack(fmt, body[2:])[0]
+            fields[name] = round(value * scale, 3) if scale != 1 else value
+        return fields
+
+    def resync(self):
+        """Da por perdida la trama a medias y sigue desde el siguiente byte de sincronía."""
+        if not self.partial:
+            return {}
+        self.errors += 1
+        del self.buffer[0]
+        return self.feed(b"")
+
+
+def read_fields(ser, expected, timeout=ARDUINO_TIMEOUT):
+    """
+    Lee del puerto hasta tener todos los campos `expected` o pasar `timeout`
+    segundos. Devuelve (campos recibidos, tramas descartadas); los trozos de
+    histograma recibidos van en "histograma_ir".
+    """
+    parser = FrameParser()
+    fields = {}
+    deadline = time.monotonic() + timeout
+    while not set(expected) <= fields.keys():
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            break
+        # read() vuelve en cuanto hay algún byte; el timeout sólo acota la espera total,
+        # salvo a media trama, donde un silencio de ARDUINO_FRAME_GAP la da por perdida
+        ser.timeout = min(remaining, ARDUINO_FRAME_GAP) if parser.partial else remaining
+        data = ser.read(max(1, ser.in_waiting))
+        if data:
+            fields.update(parser.feed(data))
+        elif parser.partial:
+            fields.update(parser.resync())
+    if parser.histogram:
+        fields["histograma_ir"] = parser.histogram
+    return fields, parser.errors
+
+
+class FakeArduino:
+    """
+    Arduino simulado tras un pty. `port` es la ruta que abre el nodo; al
+    arrancar manda una línea de depuración y después `fields` (tramas, o el
+    texto de los sketches anteriores con legacy=True; "histograma_ir" es
+    (inicio, segundos, conteos por sensor) y sólo va en tramas), con `delay` segundos
+    antes de cada uno, y los repite cada `interval` segundos como el sketch
+    real (al abrir el puerto, pyserial descarta lo que llegó antes). Con
+    `baudrate`, cada mensaje tarda en salir lo que tardaría por el cable.
+    """
+
+    def __init__(self, fields, delay=0.0, legacy=False, interval=0.05, baudrate=None):
+        self.fields = fields
+        self.delay = delay
+        self.legacy = legacy
+        self.interval = interval
+        self.baudrate = baudrate
+        self.port = None
+        self._master = self._slave = None
+        self._thread = None
+        self._stopped = threading.Event()
+
+    def _messages(self):
+        for name, value in self.fields.items():
+            if name == "histograma_ir":
+                if not self.legacy:
+                    yield encode_histogram(*value)
+            elif not self.legacy:
+                yield encode_field(name, value)
+            elif name == "conteo_ir":
+                yield f"{value}\r\n".encode()
+            else:
+                pin = "A1" if name == "bateria_arduino" else "A0"
+                yield f"Voltage {pin}: {value:.2f}V\r\n".encode()
+
+    def _write(self, message):
+        try:
+            os.write(self._master, message)
+        except BlockingIOError:
+            # Nadie lee y el pty está lleno: como en el cable, el mensaje se pierde
+            pass
+
+    def _serve(self):
+        self._write(b"Arduino listo para comunicacion.\r\n")
+        while True:
+            for message in self._messages():
+                # 10 bits por byte en el cable: 8 de datos, arranque y parada
+                wire = len(message) * 10 / self.baudrate if self.baudrate else 0
+                if self._stopped.wait(self.delay + wire):
+                    return
+                self._write(message)
+            if self._stopped.wait(self.interval):
+                return
+
+    def start(self):
+        import pty
+        import tty
+
+        self._master, self._slave = pty.openpty()
+        tty.setraw(self._slave)
+        os.set_blocking(self._master, False)
+        self.port = os.ttyname(self._slave)
+        self._thread = threading.Thread(target=self._serve, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join()
+        for fd in (self._master, self._slave):
+            if fd is not None:
+                os.close(fd)
+        self._master = self._slave = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
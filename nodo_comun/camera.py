@@ -0,0 +1,426 @@
+"""
+Captura de fotos sin lanzar fswebcam.
+
+V4L2Camera abre la webcam una vez, la configura en MJPEG (la cámara entrega
+cada fotograma ya comprimido en JPEG), descarta unos fotogramas de
+calentamiento mientras se estabiliza la exposición automática y devuelve los
+fotogramas como bytes, listos para escribirse en disco o subirse.
+
+    with open_camera() as camera:
+        frame = camera.capture()
+    save_frame(frame, filepath)
+
+CAMERA_BACKEND elige la implementación: "v4l2" (por defecto, con vuelta a
+fswebcam si el dispositivo no se puede abrir o falla al capturar), "fswebcam"
+o "fake" (cámara simulada para pruebas y benchmarks fuera de la Pi).
+"""
+import ctypes
+import fcntl
+import mmap
+import os
+import select
+import subprocess
+import tempfile
+import time
+
+from nodo_comun.readiness import wait_for_device
+
+CAMERA_BACKEND = os.getenv("CAMERA_BACKEND", "v4l2")
+CAMERA_DEVICE = os.getenv("CAMERA_DEVICE", "/dev/video0")
+CAMERA_WIDTH = int(os.getenv("CAMERA_WIDTH", "1280"))
+CAMERA_HEIGHT = int(os.getenv("CAMERA_HEIGHT", "720"))
+# Fotogramas descartados tras abrir la cámara para que se ajuste la exposición
+CAMERA_WARMUP_FRAMES = int(os.getenv("CAMERA_WARMUP_FRAMES", "5"))
+CAMERA_TIMEOUT = float(os.getenv("CAMERA_TIMEOUT", "5"))
+
+
+# --- Estructuras e ioctls de linux/videodev2.h ---
+
+V4L2_BUF_TYPE_VIDEO_CAPTURE = 1
+V4L2_MEMORY_MMAP = 1
+V4L2_FIELD_ANY = 0
+
+
+def _fourcc(code):
+    return ord(code[0]) | (ord(code[1]) << 8) | (ord(code[2]) << 16) | (ord(code[3]) << 24)
+
+
+V4L2_PIX_FMT_MJPEG = _fourcc("MJPG")
+
+
+class _PixFormat(ctypes.Structure):
+    _fields_ = [
+        ("width", ctypes.c_uint32),
+        ("height", ctypes.c_uint32),
+        ("pixelformat", ctypes.c_uint32),
+        ("field", ctypes.c_uint32),
+        ("bytesperline", ctypes.c_uint32),
+        ("sizeimage", ctypes.c_uint32),
+        ("colorspace", ctypes.c_uint32),
+        ("priv", ctypes.c_uint32),
+        ("flags", ctypes.c_uint32),
+        ("ycbcr_enc", ctypes.c_uint32),
+        ("quantization", ctypes.c_uint32),
+        ("xfer_func", ctypes.c_uint32),
+    ]
+
+
+class _FormatUnion(ctypes.Union):
+    # El puntero fuerza la misma alineación que en el kernel (la unión contiene v4l2_window)
+    _fields_ = [("pix", _PixFormat), ("raw_data", ctypes.c_uint8 * 200), ("_align", ctypes.c_void_p)]
+
+
+class _Format(ctypes.Structure):
+    _fields_ = [("type", ctypes.c_uint32), ("fmt", _FormatUnion)]
+
+
+class _RequestBuffers(ctypes.Structure):
+    _fields_ = [
+        ("count", ctypes.c_uint32),
+        ("type", ctypes.c_uint32),
+        ("memory", ctypes.c_uint32),
+        ("reserved", ctypes.c_uint32 * 2),
+    ]
+
+
+class _Timeval(ctypes.Structure):
+    # `long` del C de la plataforma: el tamaño de _Buffer entra en el número de ioctl, así que
+    # en un Raspberry Pi OS de 32 bits se pide la variante de time_t de 32 bits del kernel.
+    # Si aun así la estructura no coincidiera, _check_buffer lo detecta y se usa fswebcam
+    _fields_ = [("tv_sec", ctypes.c_long), ("tv_usec", ctypes.c_long)]
+
+
+class _Timecode(ctypes.Structure):
+    _fields_ = [
+        ("type", ctypes.c_uint32),
+        ("flags", ctypes.c_uint32),
+        ("frames", ctypes.c_uint8),
+        ("seconds", ctypes.c_uint8),
+        ("minutes", ctypes.c_uint8),
+        ("hours", ctypes.c_uint8),
+        ("userbits", ctypes.c_uint8 * 4),
+    ]
+
+
+class _BufferM(ctypes.Union):
+    _fields_ = [("offset", ctypes.c_uint32), ("userptr", ctypes.c_ulong), ("planes", ctypes.c_void_p), ("fd", ctypes.c_int32)]
+
+
+class _Buffer(ctypes.Structure):
+    _fields_ = [
+        ("index", ctypes.c_uint32),
+        ("type", ctypes.c_uint32),
+        ("bytesused", ctypes.c_uint32),
+        ("flags", ctypes.c_uint32),
+        ("field", ctypes.c_uint32),
+        ("timestamp", _Timeval),
+        ("timecode", _Timecode),
+        ("sequence", ctypes.c_uint32),
+        ("memory", ctypes.c_uint32),
+        ("m", _BufferM),
+        ("length", ctypes.c_uint32),
+        ("reserved2", ctypes.c_uint32),
+        ("request_fd", ctypes.c_int32),
+    ]
+
+
+def _ioc(direction, number, struct_type):
+    return (direction << 30) | (ctypes.sizeof(struct_type) << 16) | (ord("V") << 8) | number
+
+
+_IOW, _IOWR = 1, 3
+VIDIOC_S_FMT = _ioc(_IOWR, 5, _Format)
+VIDIOC_REQBUFS = _ioc(_IOWR, 8, _RequestBuffers)
+VIDIOC_QUERYBUF = _ioc(_IOWR, 9, _Buffer)
+VIDIOC_QBUF = _ioc(_IOWR, 15, _Buffer)
+VIDIOC_DQBUF = _ioc(_IOWR, 17, _Buffer)
+VIDIOC_STREAMON = _ioc(_IOW, 18, ctypes.c_int)
+VIDIOC_STREAMOFF = _ioc(_IOW, 19, ctypes.c_int)
+
+
+# --- Tablas Huffman estándar (JPEG, anexo K) ---
+# Muchas webcams UVC envían fotogramas MJPEG sin segmento DHT; los decodificadores
+# de imágenes sueltas lo necesitan, así que se inserta como hace fswebcam.
+
+_DHT_TABLES = [
+    (0x00, [0, 1, 5, 1, 1, 1, 1, 1, 1, 0, 0, 0, 0, 0, 0, 0], list(range(12))),
+    (0x01, [0, 3, 1, 1, 1, 1, 1, 1, 1, 1, 1, 0, 0, 0, 0, 0], list(range(12))),
+    (0x10, [0, 2, 1, 3, 3, 2, 4, 3, 5, 5, 4, 4, 0, 0, 1, 0x7D], bytes.fromhex(
+        "01020300041105122131410613516107227114328191a1082342b1c11552d1f0"
+        "2433627282090a161718191a25262728292a3435363738393a43444546474849"
+        "4a535455565758595a636465666768696a737475767778797a83848586878889"
+        "8a92939495969798999aa2a3a4a5a6a7a8a9aab2b3b4b5b6b7b8b9bac2c3c4c5"
+        "c6c7c8c9cad2d3d4d5d6d7d8d9dae1e2e3e4e5e6e7e8e9eaf1f2f3f4f5f6f7f8"
+        "f9fa"
+    )),
+    (0x11, [0, 2, 1, 2, 4, 4, 3, 4, 7, 5, 4, 4, 0, 1, 2, 0x77], bytes.fromhex(
+        "000102031104052131061241510761711322328108144291a1b1c109233352f0"
+        "156272d10a162434e125f11718191a262728292a35363738393a434445464748"
+        "494a535455565758595a636465666768696a737475767778797a828384858687"
+        "88898a92939495969798999aa2a3a4a5a6a7a8a9aab2b3b4b5b6b7b8b9bac2c3"
+        "c4c5c6c7c8c9cad2d3d4d5d6d7d8d9dae2e3e4e5e6e7e8e9eaf2f3f4f5f6f7f8"
+        "f9fa"
+    )),
+]
+
+
+def _build_dht():
+    body = b"".join(bytes([table_class]) + bytes(bits) + bytes(values) for table_class, bits, values in _DHT_TABLES)
+    return b"\xff\xc4" + (len(body) + 2).to_bytes(2, "big") + body
+
+
+DHT_SEGMENT = _build_dht()
+
+
+def ensure_huffman(frame):
+    """Inserta las tablas Huffman estándar si el fotograma MJPEG no las trae."""
+    sos = frame.find(b"\xff\xda")
+    if sos < 0 or frame.find(b"\xff\xc4", 0, sos) >= 0:
+        return frame
+    return frame[:sos] + DHT_SEGMENT + frame[sos:]
+
+
+def save_frame(frame, filepath):
+    """Escribe el fotograma de una vez (una sola escritura en la SD)."""
+    tmp_path = f"{filepath}.part"
+    with open(tmp_path, "wb") as f:
+        f.write(frame)
+    os.replace(tmp_path, filepath)
+
+
+class V4L2Camera:
+    def __init__(self, device=CAMERA_DEVICE, width=CAMERA_WIDTH, height=CAMERA_HEIGHT,
+                 warmup_frames=CAMERA_WARMUP_FRAMES, buffer_count=4, timeout=CAMERA_TIMEOUT):
+        self.device = device
+        self.width = width
+        self.height = height
+        self.warmup_frames = warmup_frames
+        self.buffer_count = buffer_count
+        self.timeout = timeout
+        self.fd = None
+        self.buffers = []
+        self.warmed_up = False
+        # fswebcam, si V4L2 falla a mitad de captura
+        self.fallback = None
+
+    def open(self):
+        self.fd = os.open(self.device, os.O_RDWR | os.O_NONBLOCK)
+        try:
+            fmt = _Format()
+            fmt.type = V4L2_BUF_TYPE_VIDEO_CAPTURE
+            fmt.fmt.pix.width = self.width
+            fmt.fmt.pix.height = self.height
+            fmt.fmt.pix.pixelformat = V4L2_PIX_FMT_MJPEG
+            fmt.fmt.pix.field = V4L2_FIELD_ANY
+            fcntl.ioctl(self.fd, VIDIOC_S_FMT, fmt)
+            if fmt.fmt.pix.pixelformat != V4L2_PIX_FMT_MJPEG:
+                raise OSError(f"{self.device} no admite MJPEG")
+            # El driver puede ajustar la resolución a la más cercana que soporte
+            self.width, self.height = fmt.fmt.pix.width, fmt.fmt.pix.height
+
+            request = _RequestBuffers()
+            request.count = self.buffer_count
+            request.type = V4L2_BUF_TYPE_VIDEO_CAPTURE
+            request.memory = V4L2_MEMORY_MMAP
+            fcntl.ioctl(self.fd, VIDIOC_REQBUFS, request)
+
+            for index in range(request.count):
+                buf = self._new_buffer(index)
+                fcntl.ioctl(self.fd, VIDIOC_QUERYBUF, buf)
+                self._check_buffer(buf, index)
+                self.buffers.append(
+                    mmap.mmap(self.fd, buf.length, mmap.MAP_SHARED, mmap.PROT_READ | mmap.PROT_WRITE, offset=buf.m.offset)
+                )
+                fcntl.ioctl(self.fd, VIDIOC_QBUF, buf)
+
+            fcntl.ioctl(self.fd, VIDIOC_STREAMON, ctypes.c_int(V4L2_BUF_TYPE_VIDEO_CAPTURE))
+        except Exception:
+            self.close()
+            raise
+        return self
+
+    @staticmethod
+    def _new_buffer(index=0):
+        buf = _Buffer()
+        buf.index = index
+        buf.type = V4L2_BUF_TYPE_VIDEO_CAPTURE
+        buf.memory = V4L2_MEMORY_MMAP
+        return buf
+
+    def _check_buffer(self, buf, index):
+        """Lo que devuelve el driver tiene que cuadrar con nuestra v4l2_buffer."""
+        if (buf.index, buf.type, buf.memory) != (index, V4L2_BUF_TYPE_VIDEO_CAPTURE, V4L2_MEMORY_MMAP) or not buf.length:
+            raise OSError(f"{self.device}: v4l2_buffer no coincide con la del kernel (¿time_t de otro tamaño?)")
+
+    def _read_frame(self):
+        ready, _, _ = select.select([self.fd], [], [], self.timeout)
+        if not ready:
+            raise TimeoutError(f"{self.device} no entregó ningún fotograma en {self.timeout} s")
+        buf = self._new_buffer()
+        fcntl.ioctl(self.fd, VIDIOC_DQBUF, buf)
+        if buf.index >= len(self.buffers) or not 0 < buf.bytesused <= len(self.buffers[buf.index]):
+            raise OSError(f"{self.device}: fotograma con índice {buf.index} y {buf.bytesused} bytes")
+        try:
+            return bytes(self.buffers[buf.index][: buf.bytesused])
+        finally:
+            fcntl.ioctl(self.fd, VIDIOC_QBUF, buf)
+
+    def warm_up(self):
+        for _ in range(self.warmup_frames):
+            self._read_frame()
+        self.warmed_up = True
+
+    def capture(self):
+        """Devuelve un fotograma JPEG como bytes."""
+        if self.fallback is None:
+            try:
+                if not self.warmed_up:
+                    self.warm_up()
+                return ensure_huffman(self._read_frame())
+            except OSError as e:
+                # Timeout o ioctl fallido: se suelta el dispositivo para que lo abra fswebcam
+                print(f"V4L2 falló al capturar ({e}), se usa fswebcam.")
+                self.close()
+                self.fallback = FswebcamCamera(self.device, self.width, self.height)
+        return self.fallback.capture()
+
+    def burst(self, count):
+        """Varios fotogramas seguidos, sin volver a pagar el calentamiento."""
+        return [self.capture() for _ in range(count)]
+
+    def close(self):
+        if self.fd is None:
+            return
+        try:
+            fcntl.ioctl(self.fd, VIDIOC_STREAMOFF, ctypes.c_int(V4L2_BUF_TYPE_VIDEO_CAPTURE))
+        except OSError:
+            pass
+        for buffer in self.buffers:
+            buffer.close()
+        self.buffers = []
+        os.close(self.fd)
+        self.fd = None
+
+    def __enter__(self):
+        return self if self.fd is not None else self.open()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+class FswebcamCamera:
+    """El comportamiento de siempre: un proceso fswebcam por foto."""
+
+    def __init__(self, device=CAMERA_DEVICE, width=CAMERA_WIDTH, height=CAMERA_HEIGHT):
+        self.device = device
+        self.width = width
+        self.height = height
+
+    def open(self):
+        return self
+
+    def capture(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, "frame.jpg")
+            subprocess.run(
+                ["fswebcam", "-d", self.device, "-r", f"{self.width}x{self.height}", "--no-banner", path]
+            )
+            with open(path, "rb") as f:
+                return f.read()
+
+    def burst(self, count):
+        return [self.capture() for _ in range(count)]
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+class FakeCamera:
+    """
+    Cámara simulada. Devuelve los JPEG de FAKE_CAMERA_DIR en bucle o, si no hay,
+    una imagen sintética; simula la latencia de apertura y de cada fotograma.
+    """
+
+    def __init__(self, width=CAMERA_WIDTH, height=CAMERA_HEIGHT, frames=None,
+                 open_latency=float(os.getenv("FAKE_CAMERA_OPEN_LATENCY", "0.3")),
+                 frame_latency=float(os.getenv("FAKE_CAMERA_FRAME_LATENCY", "0.033")),
+                 warmup_frames=CAMERA_WARMUP_FRAMES):
+        self.width = width
+        self.height = height
+        self.frames = frames if frames is not None else self._load_frames(os.getenv("FAKE_CAMERA_DIR"))
+        self.open_latency = open_latency
+        self.frame_latency = frame_latency
+        self.warmup_frames = warmup_frames
+        self.warmed_up = False
+        self.is_open = False
+        self.captured = 0
+
+    @staticmethod
+    def _load_frames(directory):
+        if not directory or not os.path.isdir(directory):
+            return []
+        frames = []
+        for filename in sorted(os.listdir(directory)):
+            if filename.endswith(".jpg"):
+                with open(os.path.join(directory, filename), "rb") as f:
+                    frames.append(f.read())
+        return frames
+
+    def _synthetic_frame(self):
+        try:
+            from PIL import Image
+        except ImportError:
+            # Sin Pillow: un JPEG de mentira con los marcadores SOI/EOI
+            return b"\xff\xd8" + os.urandom(self.width * self.height // 20) + b"\xff\xd9"
+        import io
+
+        image = Image.effect_noise((self.width, self.height), 20).convert("RGB")
+        out = io.BytesIO()
+        image.save(out, "JPEG", quality=85)
+        return out.getvalue()
+
+    def open(self):
+        time.sleep(self.open_latency)
+        self.is_open = True
+        return self
+
+    def capture(self):
+        if not self.warmed_up:
+            time.sleep(self.frame_latency * self.warmup_frames)
+            self.warmed_up = True
+        time.sleep(self.frame_latency)
+        frame = self.frames[self.captured % len(self.frames)] if self.frames else self._synthetic_frame()
+        self.captured += 1
+        return frame
+
+    def burst(self, count):
+        return [self.capture() for _ in range(count)]
+
+    def close(self):
+        self.is_open = False
+
+    def __enter__(self):
+        return self if self.is_open else self.open()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+def open_camera(backend=CAMERA_BACKEND, width=CAMERA_WIDTH, height=CAMERA_HEIGHT):
+    """Abre la cámara del backend pedido; si V4L2 falla, vuelve a fswebcam."""
+    if backend == "fake":
+        return FakeCamera(width, height).open()
+    # Tras el arranque el dispositivo tarda en aparecer: se sondea en vez de dormir
+    wait_for_device(CAMERA_DEVICE)
+    if backend == "v4l2":
+        try:
+            return V4L2Camera(width=width, height=height).open()
+        except OSError as e:
+            print(f"V4L2 no disponible ({e}), se usa fswebcam.")
+    return FswebcamCamera(width=width, height=height).open()
@@ -0,0 +1,164 @@
+"""
+Detección de cambios entre la foto recién tomada y la última que se subió.
+
+La foto se decodifica a tamaño reducido (el decodificador JPEG escala en el
+propio DCT, así que es barato incluso en una Pi Zero) y se compara con la
+referencia guardada del nodo por dos vías:
+
+- hash perceptual (dHash de 64 bits): distancia de Hamming;
+- diferencia media de píxeles en escala de grises, de 0 a 1.
+
+Si ninguna supera su umbral la foto no se sube; el nodo sólo manda el latido
+de metadatos en el JSON de monitorización. Cada KEYFRAME_EVERY ciclos se fuerza
+la subida aunque no haya cambios.
+
+Una foto que se sube no pasa a ser la referencia hasta que el servidor
+confirma su subida (acknowledge_change, como la clave de tiles.py): si la
+subida falla, se aplaza o el almacén la descarta, las fotos siguientes se
+siguen comparando con lo último que el servidor tiene de verdad.
+
+Se activa por nodo con CHANGE_DETECTION=1 en el .env.
+"""
+import io
+import os
+import threading
+
+CHANGE_DETECTION = os.getenv("CHANGE_DETECTION", "0") == "1"
+CHANGE_HASH_THRESHOLD = int(os.getenv("CHANGE_HASH_THRESHOLD", "6"))  # bits distintos
+CHANGE_PIXEL_THRESHOLD = float(os.getenv("CHANGE_PIXEL_THRESHOLD", "0.02"))  # diferencia media 0-1
+KEYFRAME_EVERY = int(os.getenv("KEYFRAME_EVERY", "12"))  # ciclos
+
+THUMB_SIZE = (64, 36)
+
+# La foto comprueba y la subida confirma desde etapas que corren en paralelo
+_state_lock = threading.Lock()
+
+
+def thumbnail(frame):
+    """Fotograma JPEG -> array uint8 en escala de grises de THUMB_SIZE."""
+    import numpy as np
+    from PIL import Image
+
+    image = Image.open(io.BytesIO(frame))
+    # draft() pide al decodificador JPEG que escale a 1/2, 1/4 u 1/8 al decodificar
+    image.draft("L", (THUMB_SIZE[0] * 2, THUMB_SIZE[1] * 2))
+    image = image.convert("L").resize(THUMB_SIZE)
+    return np.asarray(image, dtype=np.uint8)
+
+
+def dhash(thumb):
+    """Hash de diferencias de 64 bits: compara cada píxel con su vecino derecho en 9x8."""
+    import numpy as np
+    from PIL import Image
+
+    small = np.asarray(Image.fromarray(thumb).resize((9, 8)), dtype=np.int16)
+    bits = (small[:, 1:] > small[:, :-1]).flatten()
+    return int.from_bytes(np.packbits(bits).tobytes(), "big")
+
+
+class ChangeGate:
+    def __init__(self, state_path, hash_threshold=CHANGE_HASH_THRESHOLD,
+                 pixel_threshold=CHANGE_PIXEL_THRESHOLD, keyframe_every=KEYFRAME_EVERY):
+        self.state_path = state_path
+        self.hash_threshold = hash_threshold
+        self.pixel_threshold = pixel_threshold
+        self.keyframe_every = keyframe_every
+        self.reference = None
+        self.reference_hash = None
+        self.pending = self.pending_hash = self.pending_name = None
+        self.cycles = 0
+        self._load()
+
+    def _load(self):
+        import numpy as np
+
+        if not os.path.exists(self.state_path):
+            return
+        try:
+            with np.load(self.state_path) as state:
+                self.cycles = int(state["cycles"])
+                if "thumb" in state:
+                    self.reference = state["thumb"]
+                    self.reference_hash = int(state["hash"])
+                if "pending" in state:
+                    self.pending = state["pending"]
+                    self.pending_hash = int(state["pending_hash"])
+                    self.pending_name = str(state["pending_name"])
+        except (OSError, ValueError, KeyError):
+            # Referencia corrupta: la próxima foto se sube y pasa a ser la referencia
+            self.reference = self.pending = None
+
+    def _save(self):
+        import numpy as np
+
+        arrays = {"cycles": self.cycles}
+        if self.reference is not None:
+            arrays.update(thumb=self.reference, hash=np.uint64(self.reference_hash))
+        if self.pending is not None:
+            arrays.update(pending=self.pending, pending_hash=np.uint64(self.pending_hash), pending_name=self.pending_name)
+        tmp_path = f"{self.state_path}.tmp.npz"
+        np.savez(tmp_path, **arrays)
+        os.replace(tmp_path, self.state_path)
+
+    def check(self, frame, name=None):
+        """
+        Decide si hay que subir la foto `name` (nombre sin extensión). Devuelve
+        el latido de metadatos: {"subida", "clave", "hash", "distancia", "diferencia"}.
+        """
+        import numpy as np
+
+        thumb = thumbnail(frame)
+        frame_hash = dhash(thumb)
+        keyframe = self.reference is None or self.cycles + 1 >= self.keyframe_every
+
+        if self.reference is None or self.reference.shape != thumb.shape:
+            distance, difference = 64, 1.0
+        else:
+            distance = bin(frame_hash ^ self.reference_hash).count("1")
+            difference = float(np.abs(thumb.astype(np.int16) - self.reference).mean()) / 255
+
+        upload = keyframe or distance > self.hash_threshold or difference > self.pixel_threshold
+        if upload:
+            # Pasa a ser la referencia cuando se confirme su subida
+            self.pending, self.pending_hash, self.pending_name = thumb, frame_hash, name
+            self.cycles = 0
+        else:
+            self.cycles += 1
+        self._save()
+
+        return {
+            "subida": upload,
+            "clave": keyframe,
+            "hash": f"{frame_hash:016x}",
+            "distancia": distance,
+            "diferencia": round(difference, 4),
+        }
+
+    def acknowledge(self, results):
+        """
+        Promueve la foto pendiente a referencia si está entre las subidas
+        correctas: ella misma, su .tiles o su miniatura.
+        """
+        if self.pending is None or not self.pending_name:
+            return False
+        if not any(r["ok"] and r["file"].startswith(self.pending_name) for r in results):
+            return False
+        self.reference, self.reference_hash = self.pending, self.pending_hash
+        self.pending = self.pending_hash = self.pending_name = None
+        self._save()
+        return True
+
+
+def check_frame(frame, state_path, name=None):
+    """Latido de cambio de la foto, o None si la detección no está activada en el nodo."""
+    if not CHANGE_DETECTION:
+        return None
+    with _state_lock:
+        return ChangeGate(state_path).check(frame, name)
+
+
+def acknowledge_change(results, state_path):
+    """Tras una tanda de subidas, la foto pendiente pasa a referencia si se subió bien."""
+    if CHANGE_DETECTION:
+        with _state_lock:
+            ChangeGate(state_path).acknowledge(results)
@@ -0,0 +1,150 @@
+"""
+Conteo de insectos en la foto de la trampa, en el propio nodo.
+
+Sólo NumPy y Pillow (sin OpenCV), todo vectorizado y con un presupuesto de
+tiempo fijo (COUNT_BUDGET) para que quepa en el ciclo de una Pi:
+
+1. La foto se decodifica a COUNT_WIDTH píxeles de ancho (escalado en el DCT).
+2. Umbral de color en HSV: la trampa es el tono COUNT_HUE con saturación y
+   brillo altos; la zona de la trampa son las filas y columnas mayoritariamente
+   de ese color.
+3. Dentro de esa zona, los píxeles oscuros que no son de la trampa son candidatos.
+4. Componentes conexas (8-vecindad) por propagación del mínimo con saltos de
+   puntero, y filtro por área (COUNT_MIN_AREA, COUNT_MAX_AREA).
+
+El resultado va en el JSON de monitorización como "conteo": número de
+insectos, cajas en píxeles de la foto guardada y si el análisis terminó
+dentro del presupuesto. Se activa por nodo con INSECT_COUNTING=1.
+"""
+import io
+import os
+import time
+
+INSECT_COUNTING = os.getenv("INSECT_COUNTING", "0") == "1"
+COUNT_WIDTH = int(os.getenv("COUNT_WIDTH", "640"))
+COUNT_HUE = os.getenv("COUNT_HUE", "25,60")  # tono de la trampa en 0-255 (amarillo)
+COUNT_MIN_SATURATION = int(os.getenv("COUNT_MIN_SATURATION", "80"))
+COUNT_DARK_VALUE = int(os.getenv("COUNT_DARK_VALUE", "110"))  # brillo máximo de un insecto
+COUNT_MIN_AREA = int(os.getenv("COUNT_MIN_AREA", "6"))  # píxeles a COUNT_WIDTH
+COUNT_MAX_AREA = int(os.getenv("COUNT_MAX_AREA", "2500"))
+COUNT_BUDGET = float(os.getenv("COUNT_BUDGET", "5"))  # segundos
+COUNT_MAX_BOXES = int(os.getenv("COUNT_MAX_BOXES", "100"))
+
+
+def decode_hsv(frame, width=COUNT_WIDTH):
+    """Fotograma JPEG -> (array HSV uint8 de ~width de ancho, escala respecto al original)."""
+    import numpy as np
+    from PIL import Image
+
+    image = Image.open(io.BytesIO(frame))
+    original_width = image.size[0]
+    image.draft("RGB", (width, width * image.size[1] // max(1, original_width)))
+    image = image.convert("RGB")
+    if image.size[0] > width:
+        image = image.resize((width, width * image.size[1] // image.size[0]))
+    return np.asarray(image.convert("HSV"), dtype=np.uint8), original_width / image.size[0]
+
+
+def trap_region(trap):
+    """Caja (y0, y1, x0, x1) de las filas y columnas con mayoría de color de trampa."""
+    import numpy as np
+
+    rows = np.flatnonzero(trap.mean(axis=1) >= 0.5)
+    cols = np.flatnonzero(trap.mean(axis=0) >= 0.5)
+    if not len(rows) or not len(cols):
+        return None
+    return rows[0], rows[-1] + 1, cols[0], cols[-1] + 1
+
+
+def label(mask, deadline=None):
+    """
+    Etiqueta las componentes 8-conexas de una máscara booleana. Cada píxel
+    acaba con el índice plano del menor píxel de su componente; el fondo con
+    mask.size. Devuelve (etiquetas, completo).
+    """
+    import numpy as np
+
+    h, w = mask.shape
+    background = mask.size
+    labels = np.where(mask, np.arange(mask.size).reshape(h, w), background)
+    padded = np.full((h + 2, w + 2), background, dtype=labels.dtype)
+
+    while True:
+        padded[1:-1, 1:-1] = labels
+        smallest = labels.copy()
+        for dy in (0, 1, 2):
+            for dx in (0, 1, 2):
+                np.minimum(smallest, padded[dy:dy + h, dx:dx + w], out=smallest)
+        smallest[~mask] = background
+        # Salto de puntero: cada píxel adopta la etiqueta de su etiqueta
+        flat = smallest.ravel()
+        inside = flat < background
+        flat[inside] = flat[flat[inside]]
+        if np.array_equal(smallest, labels):
+            return labels, True
+        labels = smallest
+        if deadline is not None and time.monotonic() > deadline:
+            return labels, False
+
+
+def components(labels, background):
+    """Áreas y cajas (x0, y0, x1, y1) de cada componente etiquetada."""
+    import numpy as np
+
+    ys, xs = np.nonzero(labels < background)
+    if not len(ys):
+        return np.zeros(0, dtype=np.int64), np.zeros((0, 4), dtype=np.int64)
+    ids = labels[ys, xs]
+    order = np.argsort(ids, kind="stable")
+    ids, ys, xs = ids[order], ys[order], xs[order]
+    starts = np.flatnonzero(np.r_[True, ids[1:] != ids[:-1]])
+    areas = np.diff(np.r_[starts, len(ids)])
+    boxes = np.stack([
+        np.minimum.reduceat(xs, starts),
+        np.minimum.reduceat(ys, starts),
+        np.maximum.reduceat(xs, starts) + 1,
+        np.maximum.reduceat(ys, starts) + 1,
+    ], axis=1)
+    return areas, boxes
+
+
+def count_insects(frame, hue=COUNT_HUE, budget=COUNT_BUDGET):
+    """
+    Devuelve {"insectos", "cajas", "area_trampa", "ms", "completo"}. Las cajas
+    están en píxeles de la foto y son como mucho COUNT_MAX_BOXES, las mayores.
+    """
+    import numpy as np
+
+    start = time.monotonic()
+    deadline = start + budget
+    hsv, scale = decode_hsv(frame)
+    hue_low, hue_high = (int(v) for v in hue.split(","))
+    h, s, v = hsv[..., 0], hsv[..., 1], hsv[..., 2]
+    trap = (h >= hue_low) & (h <= hue_high) & (s >= COUNT_MIN_SATURATION) & (v > COUNT_DARK_VALUE)
+
+    result = {"insectos": 0, "cajas": [], "area_trampa": 0.0, "ms": 0, "completo": True}
+    region = trap_region(trap)
+    if region is not None:
+        y0, y1, x0, x1 = region
+        candidates = np.zeros_like(trap)
+        candidates[y0:y1, x0:x1] = ~trap[y0:y1, x0:x1] & (v[y0:y1, x0:x1] <= COUNT_DARK_VALUE)
+        labels, complete = label(candidates, deadline)
+        areas, boxes = components(labels, candidates.size)
+        keep = (areas >= COUNT_MIN_AREA) & (areas <= COUNT_MAX_AREA)
+        areas, boxes = areas[keep], boxes[keep]
+        largest = np.argsort(areas)[::-1][:COUNT_MAX_BOXES]
+        result.update(
+            insectos=int(keep.sum()),
+            cajas=np.rint(boxes[largest] * scale).astype(int).tolist(),
+            area_trampa=round(float(trap.mean()), 3),
+            completo=complete,
+        )
+    result["ms"] = int((time.monotonic() - start) * 1000)
+    return result
+
+
+def count_frame(frame):
+    """Conteo de la foto, o None si el conteo no está activado en el nodo."""
+    if not INSECT_COUNTING:
+        return None
+    return count_insects(frame)
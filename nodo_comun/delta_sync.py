@@ -0,0 +1,99 @@
+"""
+Sincronización por incrementos de ficheros que sólo crecen (datos_sensor.txt,
+series binarias de nodo_comun.timeseries).
+
+En vez de subir el fichero completo cada ciclo, se envían únicamente las
+líneas añadidas desde el último offset confirmado por el servidor. El servidor
+recompone el fichero escribiendo el incremento exactamente en ese offset, así
+que reenviar un incremento ya recibido no duplica líneas. Si la copia del
+servidor es más corta de lo esperado (se perdió o se borró), el servidor
+devuelve su tamaño y el cliente reenvía desde ahí.
+"""
+import os
+import shlex
+import time
+
+# Código de salida con el que el servidor indica que su copia es más corta que el offset
+SERVER_BEHIND = 3
+
+# Recompone el fichero en el servidor: conserva los primeros OFFSET bytes, añade el
+# incremento recibido por stdin y responde con el tamaño final como confirmación
+APPEND_COMMAND = (
+    'f={path}; mkdir -p "$(dirname "$f")"; '
+    'size=$(stat -c %s "$f" 2>/dev/null || echo 0); '
+    'if [ "$size" -lt {offset} ]; then echo "$size"; exit {behind}; fi; '
+    'truncate -s {offset} "$f" && cat >> "$f" && stat -c %s "$f"'
+)
+
+
+def read_offset(offset_file):
+    if os.path.exists(offset_file):
+        with open(offset_file, "r") as f:
+            data = f.read().strip()
+            if data.isdigit():
+                return int(data)
+    return 0
+
+
+def write_offset(offset_file, offset):
+    tmp_path = f"{offset_file}.tmp"
+    with open(tmp_path, "w") as f:
+        f.write(str(offset))
+    os.replace(tmp_path, offset_file)
+
+
+def read_delta(local_path, offset, record_size=None, header_size=0):
+    """
+    Bytes añadidos desde `offset` hasta la última línea completa o, en ficheros
+    binarios de registros de tamaño fijo, hasta el último registro completo.
+    """
+    with open(local_path, "rb") as f:
+        f.seek(offset)
+        chunk = f.read()
+    end = offset + len(chunk)
+    if record_size:
+        if end < header_size:
+            return b""
+        end = header_size + (end - header_size) // record_size * record_size
+    else:
+        end = offset + chunk.rfind(b"\n") + 1
+    return chunk[: max(0, end - offset)]
+
+
+def sync_appended(session, local_path, remote_path, offset_file, record_size=None, header_size=0):
+    """
+    Envía a `remote_path` las líneas (o registros, con `record_size`) de
+    `local_path` que el servidor aún no ha confirmado. Devuelve un resultado
+    con el mismo formato que SSHSession.put.
+    """
+    result = {"file": os.path.basename(local_path), "bytes": 0, "seconds": 0.0, "ok": False}
+    if not os.path.exists(local_path) or not session.is_open:
+        return result
+
+    start = time.monotonic()
+    offset = read_offset(offset_file)
+    if os.path.getsize(local_path) < offset:
+        # El fichero local se ha rotado: empezar de nuevo
+        offset = 0
+
+    # Como mucho dos intentos: el segundo sólo si el servidor estaba por detrás
+    for _ in range(2):
+        chunk = read_delta(local_path, offset, record_size, header_size)
+        if not chunk:
+            result["ok"] = True
+            break
+        command = APPEND_COMMAND.format(path=shlex.quote(remote_path), offset=offset, behind=SERVER_BEHIND)
+        reply = session.run(command, input=chunk)
+        answer = reply.stdout.decode().strip()
+        if reply.returncode == SERVER_BEHIND and answer.isdigit():
+            offset = int(answer)
+            continue
+        if reply.returncode == 0 and answer == str(offset + len(chunk)):
+            offset += len(chunk)
+            result["bytes"] += len(chunk)
+            result["ok"] = True
+        break
+
+    write_offset(offset_file, offset)
+    result["seconds"] = round(time.monotonic() - start, 3)
+    return result
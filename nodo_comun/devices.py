@@ -0,0 +1,121 @@
+"""
+Dispositivos del nodo: cámara, sensor SHT20, enlace serie con el Arduino y
+apagado.
+
+Nada se abre al importar: cada dispositivo se crea la primera vez que una
+etapa lo pide, así que las etapas que no lo usan no pagan su inicialización.
+
+    DEVICES = Devices()
+    with DEVICES.camera() as camera:
+        frame = camera.capture()
+    temp, humid = DEVICES.climate().read_all()
+
+Con DEVICE_BACKEND=sim se usan simuladores con latencias realistas: la
+cámara simulada de camera.py, un SHT20 con los tiempos de conversión del
+datasheet, el Arduino simulado de arduino.py tras un pty a SERIAL_BAUDRATE
+baudios y un apagado que sólo se anuncia. Así el ciclo completo corre, y se
+puede medir, en cualquier Linux.
+"""
+import math
+import os
+import random
+import subprocess
+import time
+
+from nodo_comun.arduino import FakeArduino
+from nodo_comun.camera import CAMERA_BACKEND, CAMERA_HEIGHT, CAMERA_WIDTH, open_camera
+from nodo_comun.readiness import SERIAL_BAUDRATE, open_serial
+
+DEVICE_BACKEND = os.getenv("DEVICE_BACKEND", "real")
+# Conversión a máxima resolución según el datasheet: 14 bits de temperatura y 12 de humedad
+SHT20_TEMP_SECONDS = 0.085
+SHT20_HUMID_SECONDS = 0.029
+# Lo que tarda el Arduino simulado en empezar a mandar cada mensaje
+SIM_ARDUINO_DELAY = float(os.getenv("SIM_ARDUINO_DELAY", "0.05"))
+SIM_IR_MINUTES = int(os.getenv("SIM_IR_MINUTES", "15"))
+
+
+class SimulatedSHT20:
+    """SHT20 simulado: ciclo diario de temperatura y humedad con algo de ruido."""
+
+    def __init__(self, temp_seconds=SHT20_TEMP_SECONDS, humid_seconds=SHT20_HUMID_SECONDS):
+        self.temp_seconds = temp_seconds
+        self.humid_seconds = humid_seconds
+
+    @staticmethod
+    def _temperature():
+        hour = time.localtime().tm_hour + time.localtime().tm_min / 60
+        # Mínima al amanecer, máxima a media tarde
+        return 18 + 8 * math.sin(2 * math.pi * (hour - 9) / 24) + random.gauss(0, 0.2)
+
+    def read_temp(self):
+        time.sleep(self.temp_seconds)
+        return self._temperature()
+
+    def read_humid(self):
+        time.sleep(self.humid_seconds)
+        return min(100.0, max(0.0, 95 - 2 * self._temperature() + random.gauss(0, 1)))
+
+    def read_all(self):
+        return self.read_temp(), self.read_humid()
+
+
+def simulated_arduino_fields(minutes=SIM_IR_MINUTES):
+    """Lo que manda el Arduino en un despertar: baterías, histograma por minutos y total."""
+    start = int(time.time()) // 60 * 60 - minutes * 60
+    ir1 = [random.choice((0, 0, 0, 1, 2)) for _ in range(minutes)]
+    ir2 = [random.choice((0, 0, 0, 1, 2)) for _ in range(minutes)]
+    return {
+        "bateria_arduino": round(random.uniform(3.6, 4.1), 3),
+        "bateria_pi": round(random.uniform(3.7, 4.2), 3),
+        "histograma_ir": (start, 60, [ir1, ir2]),
+        "conteo_ir": sum(ir1) + sum(ir2),
+    }
+
+
+class Devices:
+    def __init__(self, backend=DEVICE_BACKEND):
+        self.backend = backend
+        self._climate = None
+        self._arduino = None
+
+    @property
+    def simulated(self):
+        return self.backend == "sim"
+
+    def camera(self, width=CAMERA_WIDTH, height=CAMERA_HEIGHT):
+        """Abre la cámara; se usa con `with` para cerrarla."""
+        return open_camera("fake" if self.simulated else CAMERA_BACKEND, width, height)
+
+    def climate(self):
+        """Sensor de temperatura y humedad (SHT20 por I2C), abierto la primera vez."""
+        if self._climate is None:
+            if self.simulated:
+                self._climate = SimulatedSHT20()
+            else:
+                from sht20 import SHT20
+
+                self._climate = SHT20(1, resolution=SHT20.TEMP_RES_14bit)
+        return self._climate
+
+    def serial(self):
+        """Abre el puerto serie del Arduino; quien lo pide lo cierra."""
+        if not self.simulated:
+            return open_serial()
+        if self._arduino is None:
+            self._arduino = FakeArduino(
+                simulated_arduino_fields(), delay=SIM_ARDUINO_DELAY, baudrate=SERIAL_BAUDRATE
+            ).start()
+        return open_serial(self._arduino.port)
+
+    def shutdown(self):
+        if self.simulated:
+            print("Apagado simulado.")
+            return
+        subprocess.run(["sudo", "shutdown", "-h", "now"])
+
+    def close(self):
+        """Para los simuladores que sigan en marcha."""
+        if self._arduino is not None:
+            self._arduino.stop()
+            self._arduino = None
@@ -0,0 +1,86 @@
+"""
+Procesado de la foto antes de guardarla y subirla.
+
+Recorta la imagen a la región de la trampa (IMAGE_ROI), la recodifica con una
+calidad fija (IMAGE_QUALITY) o buscando un tamaño objetivo
+(IMAGE_TARGET_BYTES), opcionalmente en WebP (IMAGE_FORMAT=webp), y devuelve la
+relación entre el tamaño original y el procesado. Todo se configura en el .env
+de cada nodo; sin ninguna de estas variables la foto pasa tal cual, sin
+decodificarla.
+
+IMAGE_ROI admite píxeles ("200,0,1080,720") o fracciones de la imagen
+("0.15,0,0.85,1").
+"""
+import io
+import os
+
+IMAGE_ROI = os.getenv("IMAGE_ROI")
+IMAGE_QUALITY = os.getenv("IMAGE_QUALITY")
+IMAGE_TARGET_BYTES = os.getenv("IMAGE_TARGET_BYTES")
+IMAGE_FORMAT = os.getenv("IMAGE_FORMAT", "jpeg").lower()
+
+EXTENSIONS = {"jpeg": ".jpg", "webp": ".webp"}
+MIN_QUALITY, MAX_QUALITY = 20, 95
+
+
+def parse_roi(roi, width, height):
+    """Convierte "x0,y0,x1,y1" (píxeles o fracciones) en una caja en píxeles."""
+    values = [float(v) for v in roi.split(",")]
+    if len(values) != 4:
+        raise ValueError(f"IMAGE_ROI debe tener 4 valores: {roi}")
+    if all(v <= 1 for v in values):
+        values = [values[0] * width, values[1] * height, values[2] * width, values[3] * height]
+    x0, y0, x1, y1 = (int(round(v)) for v in values)
+    return max(0, x0), max(0, y0), min(width, x1), min(height, y1)
+
+
+def _encode(image, image_format, quality):
+    out = io.BytesIO()
+    image.save(out, "WEBP" if image_format == "webp" else "JPEG", quality=quality)
+    return out.getvalue()
+
+
+def encode_to_target(image, image_format, target_bytes):
+    """Mayor calidad cuyo resultado cabe en target_bytes (búsqueda binaria). Devuelve (datos, calidad)."""
+    low, high = MIN_QUALITY, MAX_QUALITY
+    best, best_quality = _encode(image, image_format, MIN_QUALITY), MIN_QUALITY
+    while low <= high:
+        quality = (low + high) // 2
+        data = _encode(image, image_format, quality)
+        if len(data) <= target_bytes:
+            best, best_quality, low = data, quality, quality + 1
+        else:
+            high = quality - 1
+    return best, best_quality
+
+
+def process_image(frame, roi=IMAGE_ROI, quality=IMAGE_QUALITY, target_bytes=IMAGE_TARGET_BYTES,
+                  image_format=IMAGE_FORMAT):
+    """
+    Devuelve (bytes_procesados, info) con info = {"original", "processed",
+    "ratio", "ext", "quality"}. Si no hay nada que hacer, o no está Pillow,
+    devuelve el fotograma original (con "quality" None).
+    """
+    info = {"original": len(frame), "processed": len(frame), "ratio": 1.0, "ext": ".jpg", "quality": None}
+    if not (roi or quality or target_bytes or image_format != "jpeg"):
+        return frame, info
+    try:
+        from PIL import Image
+    except ImportError:
+        print("Pillow no está instalado: la foto se guarda sin procesar.")
+        return frame, info
+
+    image = Image.open(io.BytesIO(frame))
+    if roi:
+        image = image.crop(parse_roi(roi, *image.size))
+    image = image.convert("RGB")
+
+    if target_bytes:
+        data, quality = encode_to_target(image, image_format, int(target_bytes))
+    else:
+        quality = int(quality or 85)
+        data = _encode(image, image_format, quality)
+
+    info.update(processed=len(data), ratio=round(len(frame) / max(1, len(data)), 2), ext=EXTENSIONS[image_format],
+                quality=quality)
+    return data, info
@@ -0,0 +1,132 @@
+"""
+Manifiesto de subidas verificadas.
+
+Para cada foto del almacén se guarda su huella (sha256), su tamaño, su estado
+("pendiente" o "confirmada") y los intentos de subida. Una foto sólo cuenta
+como subida cuando el servidor devuelve la misma huella (un único
+`sha256sum` remoto por tanda, por la conexión SSH ya abierta), así que:
+
+- se borran únicamente las fotos que el servidor tiene de verdad;
+- si una subida anterior llegó pero no se llegó a confirmar (se cortó la
+  conexión tras la copia, se apagó el nodo), no se vuelve a enviar;
+- sólo se reintentan las fotos que no coinciden.
+
+El manifiesto es un JSON que se reescribe de forma atómica; las entradas de
+fotos que ya no están en el directorio se descartan al cargarlo.
+"""
+import hashlib
+import json
+import os
+import posixpath
+import shlex
+
+CHUNK_SIZE = 1024 * 1024
+
+
+def file_digest(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def remote_digests(session, remote_paths):
+    """Huellas de los ficheros remotos que existen: {ruta_remota: sha256}."""
+    if not remote_paths:
+        return {}
+    command = "sha256sum -- " + " ".join(shlex.quote(p) for p in remote_paths) + " 2>/dev/null"
+    reply = session.run(command)
+    digests = {}
+    for line in reply.stdout.decode(errors="replace").splitlines():
+        digest, _, path = line.partition(" ")
+        digests[path.lstrip(" *")] = digest
+    return digests
+
+
+class Manifest:
+    def __init__(self, path, directory):
+        self.path = path
+        self.directory = directory
+        self.entries = {}
+        self._load()
+
+    def _load(self):
+        if os.path.exists(self.path):
+            try:
+                with open(self.path, "r") as f:
+                    self.entries = json.load(f)
+            except (OSError, ValueError):
+                self.entries = {}
+        self.entries = {
+            name: entry for name, entry in self.entries.items()
+            if os.path.exists(os.path.join(self.directory, name))
+        }
+
+    def save(self):
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self.entries, f)
+        os.replace(tmp_path, self.path)
+
+    def entry(self, local_path):
+        """Entrada de la foto; se rehace si el fichero cambió (p. ej. lo redujo el almacén)."""
+        name = os.path.basename(local_path)
+        digest = file_digest(local_path)
+        entry = self.entries.get(name)
+        if entry is None or entry["sha256"] != digest:
+            entry = {"sha256": digest, "bytes": os.path.getsize(local_path), "estado": "pendiente", "intentos": 0}
+            self.entries[name] = entry
+        return entry
+
+
+def put_verified(session, transfers, manifest_path, directory, concurrency=1, deadline=None):
+    """
+    Como SSHSession.put_all, con pares (ruta_local, directorio_remoto), pero
+    una foto sólo es "ok" si el servidor confirma su huella. Las ya
+    confirmadas, o que el servidor ya tenía, no se envían otra vez; las
+    aplazadas por `deadline` no cuentan como intento.
+    """
+    if not session.is_open:
+        return session.put_all(transfers)
+
+    manifest = Manifest(manifest_path, directory)
+    files = []
+    for local_path, remote_dir in transfers:
+        if os.path.exists(local_path):
+            files.append((local_path, posixpath.join(remote_dir, os.path.basename(local_path))))
+    entries = {local: manifest.entry(local) for local, _ in files}
+
+    # ¿Llegó ya alguna de las que se intentaron en ciclos anteriores?
+    retried = [remote for local, remote in files if entries[local]["intentos"] and entries[local]["estado"] != "confirmada"]
+    present = remote_digests(session, retried)
+    for local, remote in files:
+        if present.get(remote) == entries[local]["sha256"]:
+            entries[local]["estado"] = "confirmada"
+
+    results, to_send, sent = {}, [], []
+    for local, remote in files:
+        entry = entries[local]
+        if entry["estado"] == "confirmada":
+            results[local] = {"file": os.path.basename(local), "bytes": 0, "size": entry["bytes"], "seconds": 0.0, "ok": True}
+        else:
+            to_send.append((local, remote))
+    for (local, remote), result in zip(to_send, session.put_all(to_send, concurrency, deadline)):
+        results[local] = result
+        if not result.get("deferred"):
+            entries[local]["intentos"] += 1
+            sent.append((local, remote))
+
+    # Confirmación de todo lo enviado en esta tanda con una sola consulta
+    confirmed = remote_digests(session, [remote for _, remote in sent])
+    for local, remote in sent:
+        ok = confirmed.get(remote) == entries[local]["sha256"]
+        entries[local]["estado"] = "confirmada" if ok else "pendiente"
+        results[local]["ok"] = ok
+    manifest.save()
+
+    missing = [
+        {"file": os.path.basename(local), "bytes": 0, "size": 0, "seconds": 0.0, "ok": False}
+        for local, _ in transfers if not os.path.exists(local)
+    ]
+    return [results[local] for local, _ in files] + missing
@@ -0,0 +1,153 @@
+"""
+Cola persistente (SQLite en modo WAL) para los datos de monitorización.
+
+Cada lectura se guarda antes de intentar enviarla, así que un fallo de red o
+un código distinto de 200 ya no la pierde: se reenvía en el siguiente ciclo.
+Las lecturas se identifican por (device_id, hora de captura de la foto, la
+del nombre del fichero), de modo que encolar dos veces la lectura de una misma
+captura no la duplica aunque se haya preparado en otro momento.
+"""
+import json
+import os
+import sqlite3
+
+MONITORING_BATCH_URL = os.getenv("MONITORING_BATCH_URL")
+OUTBOX_BATCH_SIZE = int(os.getenv("OUTBOX_BATCH_SIZE", "50"))
+OUTBOX_TIMEOUT = float(os.getenv("OUTBOX_TIMEOUT", "10"))
+# Lecturas que se guardan como mucho sin conexión (más de dos años a una por hora)
+OUTBOX_MAX_ROWS = int(os.getenv("OUTBOX_MAX_ROWS", "20000"))
+
+
+class Outbox:
+    def __init__(self, path):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.conn = sqlite3.connect(path, timeout=30)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS outbox (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                device_id TEXT NOT NULL,
+                captured_at TEXT NOT NULL,
+                payload TEXT NOT NULL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                UNIQUE (device_id, captured_at)
+            )
+            """
+        )
+        self.conn.commit()
+
+    def enqueue(self, payload, captured_at=None):
+        """
+        Guarda una lectura de la captura `captured_at` (por defecto, su
+        "timestamp"). Devuelve False si ya estaba en la cola.
+        """
+        cursor = self.conn.execute(
+            "INSERT OR IGNORE INTO outbox (device_id, captured_at, payload) VALUES (?, ?, ?)",
+            (str(payload.get("device_id")), captured_at or payload["timestamp"], json.dumps(payload)),
+        )
+        self.conn.commit()
+        return cursor.rowcount == 1
+
+    def pending(self):
+        return self.conn.execute("SELECT COUNT(*) FROM outbox").fetchone()[0]
+
+    def trim(self, max_rows=OUTBOX_MAX_ROWS):
+        """Descarta las lecturas más antiguas por encima de max_rows. Devuelve cuántas."""
+        cursor = self.conn.execute(
+            "DELETE FROM outbox WHERE id NOT IN (SELECT id FROM outbox ORDER BY id DESC LIMIT ?)",
+            (max_rows,),
+        )
+        self.conn.commit()
+        return cursor.rowcount
+
+    def drain(self, send, batch_size=OUTBOX_BATCH_SIZE):
+        """
+        Envía la cola por lotes, de la lectura más antigua a la más reciente.
+        `send(readings)` recibe una lista de payloads y devuelve True si el
+        servidor los aceptó. Se para en el primer lote rechazado.
+        Devuelve (enviadas, pendientes).
+        """
+        sent = 0
+        while True:
+            rows = self.conn.execute(
+                "SELECT id, payload FROM outbox ORDER BY id LIMIT ?", (batch_size,)
+            ).fetchall()
+            if not rows:
+                break
+            ids = [(row[0],) for row in rows]
+            if not send([json.loads(row[1]) for row in rows]):
+                self.conn.executemany("UPDATE outbox SET attempts = attempts + 1 WHERE id = ?", ids)
+                self.conn.commit()
+                break
+            self.conn.executemany("DELETE FROM outbox WHERE id = ?", ids)
+            self.conn.commit()
+            sent += len(rows)
+        return sent, self.pending()
+
+    def close(self):
+        self.conn.close()
+
+
+class HttpSender:
+    """
+    Envía lotes de lecturas por HTTP. Con MONITORING_BATCH_URL configurada se
+    manda un único POST {"readings": [...]} por lote; si no, cada lectura va en
+    su propio POST a la URL de monitorización de siempre. Si el servidor
+    responde {"solicitadas": [...]} (fotos completas que quiere, ver
+    progressive.py), los nombres se acumulan en `requested`.
+    """
+
+    def __init__(self, url, batch_url=MONITORING_BATCH_URL, timeout=OUTBOX_TIMEOUT):
+        self.url = url
+        self.batch_url = batch_url
+        self.timeout = timeout
+        self.last_status = None
+        self.last_error = None
+        self.bytes_sent = 0
+        self.requested = []
+
+    @property
+    def batch_size(self):
+        return OUTBOX_BATCH_SIZE if self.batch_url else 1
+
+    def _post(self, url, body):
+        import requests
+
+        self.bytes_sent += len(json.dumps(body))
+        try:
+            response = requests.post(
+                url, json=body, headers={"Content-Type": "application/json"}, timeout=self.timeout
+            )
+        except requests.exceptions.RequestException as e:
+            self.last_status, self.last_error = None, e
+            return False
+        self.last_status, self.last_error = response.status_code, None
+        if response.status_code != 200:
+            return False
+        try:
+            reply = response.json()
+        except ValueError:
+            reply = None
+        if isinstance(reply, dict):
+            self.requested.extend(reply.get("solicitadas") or [])
+        return True
+
+    def __call__(self, readings):
+        if self.batch_url:
+            return self._post(self.batch_url, {"readings": readings})
+        return all(self._post(self.url, reading) for reading in readings)
+
+
+def enqueue_and_drain(path, url, payload, captured_at=None):
+    """Encola una lectura y vacía la cola. Devuelve (enviadas, pendientes, sender)."""
+    outbox = Outbox(path)
+    try:
+        outbox.enqueue(payload, captured_at)
+        outbox.trim()
+        sender = HttpSender(url)
+        sent, pending = outbox.drain(sender, sender.batch_size)
+    finally:
+        outbox.close()
+    return sent, pending, sender
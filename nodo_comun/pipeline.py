@@ -0,0 +1,106 @@
+"""
+Ejecución concurrente de las etapas de un ciclo del nodo.
+
+Cada etapa declara de qué etapas depende y arranca en cuanto éstas terminan,
+de modo que las independientes (lectura serie, SHT20, foto, conexión SSH...)
+se solapan en lugar de ir una detrás de otra mientras la Pi está encendida.
+Una etapa recibe los resultados de sus dependencias como argumentos con el
+nombre de cada una:
+
+    cycle = Cycle()
+    cycle.stage("photo", take_photo)
+    cycle.stage("monitoring", lambda photo: send_monitoring_data(photo[1]), after=["photo"])
+    results, errors = cycle.run()
+
+Si una dependencia falla, la etapa no se ejecuta y queda como omitida
+(`cycle.skipped`, con la etapa que falló), salvo que la dependencia sea
+opcional: entonces recibe None en su lugar. Así una foto fallida no deja el
+ciclo sin los datos de los sensores:
+
+    cycle.stage("monitoring", send, after=["photo", "sensor"], optional=["photo"])
+
+Cada etapa se mide con un span de nodo_comun.timing; el registro del ciclo
+queda en `cycle.record`.
+"""
+from concurrent.futures import ThreadPoolExecutor
+
+from nodo_comun.timing import CycleRecord
+
+
+class StageSkipped(Exception):
+    """La etapa no se ejecutó porque falló `stage`, una de sus dependencias obligatorias."""
+
+    def __init__(self, stage):
+        super().__init__(f"falló {stage}")
+        self.stage = stage
+
+
+class Cycle:
+    def __init__(self, record=None):
+        self.stages = []
+        self.record = record if record is not None else CycleRecord(None)
+        self.skipped = {}
+
+    @property
+    def durations(self):
+        return {name: span.seconds for name, span in self.record.spans.items()}
+
+    @property
+    def elapsed(self):
+        return self.record.elapsed
+
+    def stage(self, name, func, after=(), optional=()):
+        names = [stage[0] for stage in self.stages]
+        if name in names:
+            raise ValueError(f"Etapa duplicada: {name}")
+        missing = [dep for dep in after if dep not in names]
+        if missing:
+            raise ValueError(f"La etapa {name} depende de etapas no declaradas antes: {missing}")
+        if not set(optional) <= set(after):
+            raise ValueError(f"Las dependencias opcionales de {name} deben estar en `after`")
+        self.stages.append((name, func, tuple(after), frozenset(optional)))
+        return self
+
+    def _run_stage(self, name, func, deps, optional):
+        kwargs = {}
+        for dep, future in deps:
+            error = future.exception()
+            if error is None:
+                kwargs[dep] = future.result()
+            elif dep in optional:
+                kwargs[dep] = None
+            else:
+                # El error se informa una vez, en la etapa que falló de verdad
+                raise StageSkipped(error.stage if isinstance(error, StageSkipped) else dep)
+        with self.record.span(name):
+            return func(**kwargs)
+
+    def run(self):
+        """
+        Ejecuta todas las etapas. Devuelve (resultados, errores) por nombre de
+        etapa; las omitidas por el fallo de otra quedan en `self.skipped`.
+        """
+        futures = {}
+        # Un hilo por etapa: las que esperan a sus dependencias nunca bloquean a las demás
+        with ThreadPoolExecutor(max_workers=max(1, len(self.stages))) as pool:
+            for name, func, after, optional in self.stages:
+                deps = [(dep, futures[dep]) for dep in after]
+                futures[name] = pool.submit(self._run_stage, name, func, deps, optional)
+        self.record.finish()
+
+        results, errors = {}, {}
+        for name, future in futures.items():
+            error = future.exception()
+            if error is None:
+                results[name] = future.result()
+            elif isinstance(error, StageSkipped):
+                self.skipped[name] = error.stage
+            else:
+                errors[name] = error
+        return results, errors
+
+    def summary(self):
+        """Línea de log con la duración del ciclo frente a la suma secuencial de etapas."""
+        sequential = sum(self.durations.values())
+        stages = ", ".join(f"{name} {seconds:.2f} s" for name, seconds in self.durations.items())
+        return f"Cycle: {self.elapsed:.2f} s (sequential {sequential:.2f} s; {stages})"
@@ -0,0 +1,141 @@
+"""
+Política de subida: ¿se enciende la radio este ciclo o se acumula para un
+lote mayor?
+
+La decisión se toma antes del ciclo con lo que hay en el almacén (más la foto
+que se va a tomar) y con lo que se midió en ciclos anteriores:
+
+1. Sin nada pendiente no se sube.
+2. Si la foto pendiente más antigua supera UPLOAD_MAX_AGE, se sube siempre.
+3. Con la batería por debajo de UPLOAD_MIN_BATTERY, se espera.
+4. Con el enlace por debajo de UPLOAD_MIN_THROUGHPUT (B/s) en la última
+   subida, o tras UPLOAD_MAX_FAILURES subidas fallidas seguidas, se espera;
+   pasados UPLOAD_LINK_BACKOFF ciclos se vuelve a probar el enlace.
+5. Se sube si hay al menos UPLOAD_MIN_FILES fotos o UPLOAD_MIN_BYTES bytes.
+
+Con los valores por defecto (1 foto, sin más límites) se sube cada ciclo,
+como hasta ahora. Cada nodo lo ajusta en su .env; nodo_verde_2 usa lotes de
+4 fotos.
+
+La última batería leída, el rendimiento del enlace y los fallos seguidos se
+guardan en un JSON de estado entre ciclos.
+"""
+import json
+import os
+import threading
+import time
+
+UPLOAD_MIN_FILES = int(os.getenv("UPLOAD_MIN_FILES", "1"))
+UPLOAD_MIN_BYTES = int(os.getenv("UPLOAD_MIN_BYTES", "0"))  # 0 = no cuenta
+UPLOAD_MAX_AGE = float(os.getenv("UPLOAD_MAX_AGE", "0"))  # segundos; 0 = no cuenta
+UPLOAD_MIN_BATTERY = float(os.getenv("UPLOAD_MIN_BATTERY", "0"))  # voltios; 0 = no cuenta
+UPLOAD_MIN_THROUGHPUT = float(os.getenv("UPLOAD_MIN_THROUGHPUT", "0"))  # B/s; 0 = no cuenta
+UPLOAD_MAX_FAILURES = int(os.getenv("UPLOAD_MAX_FAILURES", "0"))  # 0 = no cuenta
+UPLOAD_LINK_BACKOFF = int(os.getenv("UPLOAD_LINK_BACKOFF", "3"))  # ciclos de espera con mal enlace
+
+
+# La batería y las subidas se registran desde etapas que corren en paralelo
+_state_lock = threading.Lock()
+
+
+def load_state(path):
+    if os.path.exists(path):
+        try:
+            with open(path, "r") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            pass
+    return {}
+
+
+def save_state(path, state):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(state, f)
+    os.replace(tmp_path, path)
+
+
+class UploadPolicy:
+    def __init__(self, state_path, min_files=UPLOAD_MIN_FILES, min_bytes=UPLOAD_MIN_BYTES,
+                 max_age=UPLOAD_MAX_AGE, min_battery=UPLOAD_MIN_BATTERY,
+                 min_throughput=UPLOAD_MIN_THROUGHPUT, max_failures=UPLOAD_MAX_FAILURES,
+                 link_backoff=UPLOAD_LINK_BACKOFF):
+        self.state_path = state_path
+        self.min_files = min_files
+        self.min_bytes = min_bytes
+        self.max_age = max_age
+        self.min_battery = min_battery
+        self.min_throughput = min_throughput
+        self.max_failures = max_failures
+        self.link_backoff = link_backoff
+        # Mejor rendimiento y tiempo total de las tandas de este ciclo (atrasadas y foto nueva)
+        self._cycle_throughput = 0
+        self._cycle_seconds = 0.0
+
+    def decide(self, pending, expected=1):
+        """
+        Devuelve (subir, motivo) para las rutas `pending` del almacén más
+        `expected` fotos que se tomarán en este ciclo.
+        """
+        self._cycle_throughput, self._cycle_seconds = 0, 0.0
+        state = load_state(self.state_path)
+        files = len(pending) + expected
+        if not files:
+            return False, "nada pendiente"
+        sizes = [os.path.getsize(p) for p in pending if os.path.exists(p)]
+        # Las fotos aún no tomadas se estiman con la media de las pendientes
+        size = sum(sizes) + (expected * sum(sizes) // len(sizes) if sizes else 0)
+        oldest = min((os.path.getmtime(p) for p in pending if os.path.exists(p)), default=None)
+
+        if self.max_age and oldest is not None and time.time() - oldest >= self.max_age:
+            return True, f"foto pendiente de hace {int(time.time() - oldest)} s"
+        battery = state.get("bateria")
+        if self.min_battery and battery is not None and battery < self.min_battery:
+            return False, f"batería baja ({battery} V)"
+        throughput = state.get("rendimiento")
+        failures = state.get("fallos", 0)
+        link = None
+        if self.min_throughput and throughput is not None and throughput < self.min_throughput:
+            link = f"enlace lento ({throughput} B/s)"
+        elif self.max_failures and failures >= self.max_failures:
+            link = f"{failures} subidas fallidas seguidas"
+        if link and state.get("esperas", 0) < self.link_backoff:
+            state["esperas"] = state.get("esperas", 0) + 1
+            save_state(self.state_path, state)
+            return False, link
+        if files >= self.min_files or (self.min_bytes and size >= self.min_bytes):
+            return True, f"lote de {files} fotos, {size} bytes"
+        return False, f"lote incompleto ({files}/{self.min_files} fotos, {size} bytes)"
+
+    def record_battery(self, voltage):
+        """Guarda la batería leída en este ciclo para la decisión del siguiente."""
+        with _state_lock:
+            state = load_state(self.state_path)
+            state["bateria"] = voltage
+            save_state(self.state_path, state)
+
+    def record_upload(self, stats):
+        """
+        Guarda el rendimiento de una tanda de subidas (resultado de
+        upload.summarize). De las tandas de un mismo ciclo se queda con la más
+        rápida: una tanda de una sola foto pequeña infravalora el enlace.
+        También suma el tiempo de subida del ciclo ("segundos_subida").
+        """
+        with _state_lock:
+            state = load_state(self.state_path)
+            self._cycle_seconds += stats["seconds"]
+            state["segundos_subida"] = round(self._cycle_seconds, 3)
+            if stats["files"] == stats["deferred"]:
+                save_state(self.state_path, state)
+                return
+            state["esperas"] = 0
+            if stats["failed"] and not stats["bytes"]:
+                state["fallos"] = state.get("fallos", 0) + 1
+                # Un enlace caído no dice nada de su velocidad: se vuelve a medir al reintentar
+                state.pop("rendimiento", None)
+            else:
+                state["fallos"] = 0
+                if stats["bytes"]:
+                    self._cycle_throughput = max(self._cycle_throughput, stats["throughput"])
+                    state["rendimiento"] = self._cycle_throughput
+            save_state(self.state_path, state)
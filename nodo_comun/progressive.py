@@ -0,0 +1,147 @@
+"""
+Subida progresiva: miniatura enseguida, foto completa cuando haga falta.
+
+Con PROGRESSIVE_UPLOAD=1, cada foto se sube primero como miniatura
+(`<nombre>_mini.jpg`, PROGRESSIVE_THUMB_WIDTH píxeles de ancho), suficiente
+para el vistazo diario a la trampa. La foto completa (o su fichero .tiles)
+queda retenida en el subdirectorio `completas` del almacén y vuelve a la cola
+de subida:
+
+- cuando el servidor la pide en la respuesta de monitorización
+  ({"solicitadas": ["<nombre de la foto>", ...]}), en el ciclo siguiente;
+- en un ciclo ocioso, hasta PROGRESSIVE_IDLE_FILES fotos, las más antiguas
+  primero. Ocioso es que no quede nada más pendiente y que, con el
+  rendimiento medido del enlace, las fotos quepan en lo que la última subida
+  dejó libre de UPLOAD_BUDGET. En los nodos con etapa battery hace falta
+  además una lectura de al menos PROGRESSIVE_MIN_BATTERY; en los demás
+  basta con el ciclo ocioso (verde_2, sin monitorización, nunca recibe
+  peticiones del servidor).
+"""
+import io
+import json
+import os
+
+from nodo_comun.policy import load_state
+from nodo_comun.upload import UPLOAD_BUDGET, pending_images
+
+PROGRESSIVE_UPLOAD = os.getenv("PROGRESSIVE_UPLOAD", "0") == "1"
+PROGRESSIVE_THUMB_WIDTH = int(os.getenv("PROGRESSIVE_THUMB_WIDTH", "320"))
+PROGRESSIVE_THUMB_QUALITY = int(os.getenv("PROGRESSIVE_THUMB_QUALITY", "70"))
+PROGRESSIVE_MIN_BATTERY = float(os.getenv("PROGRESSIVE_MIN_BATTERY", "0"))  # voltios; 0 = basta con la lectura
+PROGRESSIVE_IDLE_FILES = int(os.getenv("PROGRESSIVE_IDLE_FILES", "2"))
+
+HOLD_SUBDIRECTORY = "completas"
+THUMB_SUFFIX = "_mini.jpg"
+
+
+def hold_directory(directory):
+    return os.path.join(directory, HOLD_SUBDIRECTORY)
+
+
+def make_thumbnail(frame, width=PROGRESSIVE_THUMB_WIDTH, quality=PROGRESSIVE_THUMB_QUALITY):
+    from PIL import Image
+
+    image = Image.open(io.BytesIO(frame))
+    image.draft("RGB", (width, width * image.size[1] // image.size[0]))
+    image = image.convert("RGB")
+    image.thumbnail((width, width * image.size[1] // image.size[0]))
+    out = io.BytesIO()
+    image.save(out, "JPEG", quality=quality)
+    return out.getvalue()
+
+
+def hold_full_image(frame, upload_path):
+    """
+    Retiene `upload_path` (foto o .tiles) y deja en su lugar la miniatura de
+    `frame`. Devuelve la ruta a subir ahora: la miniatura, o la propia foto
+    si el modo progresivo no está activado.
+    """
+    if not PROGRESSIVE_UPLOAD or upload_path is None:
+        return upload_path
+    directory = os.path.dirname(upload_path)
+    held = hold_directory(directory)
+    os.makedirs(held, exist_ok=True)
+    thumb_path = os.path.splitext(upload_path)[0] + THUMB_SUFFIX
+    tmp_path = f"{thumb_path}.part"
+    with open(tmp_path, "wb") as f:
+        f.write(make_thumbnail(frame))
+    os.replace(tmp_path, thumb_path)
+    os.replace(upload_path, os.path.join(held, os.path.basename(upload_path)))
+    return thumb_path
+
+
+def load_requests(requests_file):
+    if os.path.exists(requests_file):
+        try:
+            with open(requests_file, "r") as f:
+                return set(json.load(f))
+        except (OSError, ValueError):
+            pass
+    return set()
+
+
+def request_full_images(requests_file, names):
+    """Apunta las fotos completas que ha pedido el servidor."""
+    if not names:
+        return
+    requested = load_requests(requests_file) | set(names)
+    tmp_path = f"{requests_file}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(sorted(requested), f)
+    os.replace(tmp_path, requests_file)
+
+
+def idle_images(candidates, state, budget=UPLOAD_BUDGET):
+    """
+    Las primeras de `candidates` que caben en el presupuesto de subida que
+    dejó libre el último ciclo, al rendimiento medido (estado de la política).
+    """
+    throughput = state.get("rendimiento")
+    if not throughput:
+        # Sin medida del enlace no se sabe si caben
+        return []
+    free = budget - state.get("segundos_subida", 0) if budget > 0 else None
+    chosen, seconds = [], 0.0
+    for path in candidates[:PROGRESSIVE_IDLE_FILES]:
+        seconds += os.path.getsize(path) / throughput
+        if free is not None and seconds > free:
+            break
+        chosen.append(path)
+    return chosen
+
+
+def release_full_images(directory, requests_file, state_path, battery_stage=True):
+    """
+    Devuelve a la cola de subida las fotos completas pedidas por el servidor
+    y, en un ciclo ocioso, las más antiguas; con `battery_stage`, sólo si la
+    última batería medida llega a PROGRESSIVE_MIN_BATTERY. Devuelve sus nombres.
+    """
+    held = hold_directory(directory)
+    if not os.path.isdir(held):
+        return []
+    requested = load_requests(requests_file)
+    # El servidor pide por nombre de foto; la retenida puede ser su .tiles
+    stems = {os.path.splitext(name)[0] for name in requested}
+    held_images = pending_images(held)
+    chosen = [p for p in held_images if os.path.splitext(os.path.basename(p))[0] in stems]
+
+    state = load_state(state_path)
+    battery = state.get("bateria")
+    # Un nodo que mide la batería no gasta en fotos no pedidas sin una lectura que lo permita
+    charged = not battery_stage or (battery is not None and battery >= PROGRESSIVE_MIN_BATTERY)
+    if charged and not pending_images(directory):
+        chosen += idle_images([p for p in held_images if p not in chosen], state)
+
+    released = []
+    for path in chosen:
+        os.replace(path, os.path.join(directory, os.path.basename(path)))
+        released.append(os.path.basename(path))
+    if requested:
+        # Las pedidas que ya no están retenidas (subidas o eliminadas) se olvidan
+        remaining = {os.path.splitext(os.path.basename(p))[0] for p in pending_images(held)}
+        pending = sorted(name for name in requested if os.path.splitext(name)[0] in remaining)
+        tmp_path = f"{requests_file}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(pending, f)
+        os.replace(tmp_path, requests_file)
+    return released
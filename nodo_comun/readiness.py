@@ -0,0 +1,59 @@
+"""
+Esperas de arranque por sondeo en lugar de pausas fijas.
+
+Tras arrancar la Pi, la cámara (/dev/video0), el puerto serie y la red
+aparecen cuando aparecen. En vez de dormir siempre lo mismo (15 s en
+nodo_verde_2, 2 s tras abrir el puerto serie en nodo_banda) se comprueba cada
+READY_INTERVAL segundos si ya están listos, hasta READY_TIMEOUT: si ya lo
+están, no se espera nada.
+"""
+import os
+import socket
+import time
+
+READY_TIMEOUT = float(os.getenv("READY_TIMEOUT", "20"))
+READY_INTERVAL = float(os.getenv("READY_INTERVAL", "0.2"))
+SERIAL_PORT = os.getenv("SERIAL_PORT", "/dev/serial0")
+SERIAL_BAUDRATE = int(os.getenv("SERIAL_BAUDRATE", "9600"))
+
+
+def wait_until(check, timeout=READY_TIMEOUT, interval=READY_INTERVAL):
+    """Repite check() hasta que devuelva algo verdadero o pase `timeout`. Devuelve lo último que devolvió."""
+    deadline = time.monotonic() + timeout
+    while True:
+        value = check()
+        if value or time.monotonic() >= deadline:
+            return value
+        time.sleep(interval)
+
+
+def device_ready(path):
+    return os.path.exists(path) and os.access(path, os.R_OK | os.W_OK)
+
+
+def network_ready(host, port, timeout=1):
+    try:
+        with socket.create_connection((host, port), timeout=timeout):
+            return True
+    except OSError:
+        return False
+
+
+def wait_for_device(path, timeout=READY_TIMEOUT):
+    return wait_until(lambda: device_ready(path), timeout)
+
+
+def wait_for_network(host, port=22, timeout=READY_TIMEOUT):
+    """Espera a que el servidor acepte conexiones en `port` (la red y el DNS ya están)."""
+    if not host:
+        return False
+    return wait_until(lambda: network_ready(host, port), timeout)
+
+
+def open_serial(port=SERIAL_PORT, baudrate=SERIAL_BAUDRATE, timeout=1, ready_timeout=READY_TIMEOUT):
+    """Abre el puerto serie en cuanto existe. Lanza OSError si no aparece."""
+    if not wait_for_device(port, ready_timeout):
+        raise OSError(f"{port} no disponible tras {ready_timeout} s")
+    import serial
+
+    return serial.Serial(port, baudrate, timeout=timeout)
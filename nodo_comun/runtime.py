@@ -0,0 +1,555 @@
+"""
+Ciclo de un nodo, común a banda, amarillo y verde.
+
+Lo que distingue a cada nodo está en NODES: el sufijo de sus fotos, las
+etapas que tiene además de la foto y la subida, dónde escribe su log y sus
+tiempos y si se apaga al terminar. El resto (servidor, rutas, política de
+subida) sale del .env como siempre, con las rutas de cada nodo como valor
+por defecto. El main.py de cada nodo sólo elige su entrada:
+
+    NODE = Node("banda")
+    NODE.main()
+
+Etapas opcionales (NODE_STAGES en el .env, separadas por comas, sustituye a
+las de la tabla):
+
+    sensor      temperatura y humedad del SHT20, en datos_sensor.txt
+    battery     voltajes de las baterías que manda el Arduino
+    infrared    conteo e histograma infrarrojos del Arduino
+    count       conteo de insectos sobre la foto (con INSECT_COUNTING=1)
+    monitoring  envío de los datos del ciclo a MONITORING_URL
+
+Con sensor, battery o infrared los datos van además a una serie binaria
+(nodo_comun/timeseries.py) que se sube por su offset junto con las fotos.
+"""
+import os
+import time
+from datetime import datetime
+
+from nodo_comun import timeseries
+from nodo_comun.adaptive import capture_settings, record_quality
+from nodo_comun.arduino import decode_histogram, histogram_batch, read_fields
+from nodo_comun.camera import save_frame
+from nodo_comun.change import CHANGE_DETECTION, acknowledge_change, check_frame
+from nodo_comun.counting import count_frame
+from nodo_comun.delta_sync import sync_appended
+from nodo_comun.devices import Devices
+from nodo_comun.imaging import process_image
+from nodo_comun.manifest import put_verified
+from nodo_comun.outbox import enqueue_and_drain
+from nodo_comun.pipeline import Cycle
+from nodo_comun.policy import UPLOAD_MIN_FILES, UploadPolicy
+from nodo_comun.progressive import hold_directory, hold_full_image, release_full_images, request_full_images
+from nodo_comun.readiness import READY_TIMEOUT
+from nodo_comun.spool import Spool
+from nodo_comun.tiles import acknowledge_uploads, prepare_upload
+from nodo_comun.timing import CycleRecord, current_span, load_last
+from nodo_comun.upload import UPLOAD_CONCURRENCY, SSHSession, summarize, upload_deadline
+
+BASE_DIRECTORY = "/home/pi/pruebas_campo/olivar"
+STAGES = ("sensor", "battery", "infrared", "count", "monitoring")
+
+# nombre -> configuración propia del nodo; en "log" y "timing", {metrics} es
+# METRICS_DIRECTORY y {local} LOCAL_DIRECTORY
+NODES = {
+    "banda": {
+        "directory": "nodo_banda",
+        "suffix": "_banda_RP06",
+        "stages": ["sensor", "battery", "count", "monitoring"],
+        "series": "datos_sensor.bin",
+        "log": "{metrics}/log_banda.txt",
+        "timing": "{metrics}/timing_banda.jsonl",
+        "shutdown": False,
+    },
+    "amarillo": {
+        "directory": "nodo_amarillo",
+        "suffix": "_amarillo_RP04",
+        "stages": ["count", "monitoring"],
+        "log": "{metrics}/log_amarillo.txt",
+        "timing": "{metrics}/timing_amarillo.jsonl",
+        "shutdown": True,
+    },
+    "verde_1": {
+        "directory": "nodo_verde_1",
+        "suffix": "_verde_RP07",
+        "stages": ["infrared", "count", "monitoring"],
+        "series": "datos_infrarrojo.bin",
+        "log": "{metrics}/log_verde.txt",
+        "timing": "{metrics}/timing_verde.jsonl",
+        "record": "verde",
+        "shutdown": False,
+    },
+    "verde_2": {
+        "directory": "nodo_verde",
+        "suffix": "_verde_RP07",
+        "stages": [],
+        "log": "{local}/log.txt",
+        "timing": "{local}/timing.jsonl",
+        "shutdown": True,
+        # Sube en lotes de 4 fotos
+        "min_files": 4,
+    },
+}
+
+
+class Node:
+    def __init__(self, name):
+        spec = NODES[name]
+        self.name = name
+        self.record_name = spec.get("record", name)
+        self.suffix = os.getenv("PHOTO_SUFFIX", spec["suffix"])
+        stages = os.getenv("NODE_STAGES")
+        self.stages = set(stages.split(",") if stages is not None else spec["stages"]) - {""}
+        unknown = self.stages - set(STAGES)
+        if unknown:
+            raise ValueError(f"Etapas desconocidas en NODE_STAGES: {', '.join(sorted(unknown))}")
+        self.shutdown = os.getenv("NODE_SHUTDOWN", "1" if spec["shutdown"] else "0") == "1"
+
+        # Configuración del servidor desde el .env del nodo: sin valores por defecto, para no
+        # subir las fotos de un nodo a la carpeta de otro
+        missing = [var for var in ("SERVER_USER", "SERVER_IP", "SERVER_DIR") if not os.getenv(var)]
+        if missing:
+            raise ValueError(f"Faltan {', '.join(missing)} en el .env del nodo {name}")
+        self.server_user = os.getenv("SERVER_USER")
+        self.server_ip = os.getenv("SERVER_IP")
+        self.server_dir = os.getenv("SERVER_DIR")
+        node_directory = os.getenv("NODE_DIRECTORY", f"{BASE_DIRECTORY}/{spec['directory']}")
+        self.local_directory = os.getenv("LOCAL_DIRECTORY", f"{node_directory}/fotos")
+        self.metrics_directory = os.getenv("METRICS_DIRECTORY", f"{BASE_DIRECTORY}/metrics")
+        state_directory = os.path.dirname(self.local_directory)
+        self.outbox_file = os.getenv("OUTBOX_FILE", f"{node_directory}/outbox.db")
+        # Referencia de la última foto subida para la detección de cambios
+        self.change_reference_file = os.getenv("CHANGE_REFERENCE_FILE", f"{state_directory}/referencia.npz")
+        # Última foto completa confirmada por el servidor, para la subida por teselas
+        self.tile_state_file = os.getenv("TILE_STATE_FILE", f"{state_directory}/teselas.npz")
+        # Huella y estado de cada foto subida, para borrar sólo lo que el servidor confirma
+        self.manifest_file = os.getenv("MANIFEST_FILE", f"{state_directory}/manifest.json")
+        # Estado de la política de subida (batería, rendimiento del enlace, fallos seguidos)
+        self.policy_file = os.getenv("POLICY_FILE", f"{state_directory}/politica.json")
+        self.requests_file = os.getenv("REQUESTS_FILE", f"{state_directory}/solicitudes.json")
+        directories = {"metrics": self.metrics_directory, "local": self.local_directory}
+        self.timing_file = os.getenv("TIMING_FILE", spec["timing"].format(**directories))
+        self.log_file = os.getenv("LOG_FILE", spec["log"].format(**directories))
+        self.sensor_data_file = os.getenv("SENSOR_DATA_FILE", f"{node_directory}/datos_sensor.txt")
+        # Último byte de SENSOR_DATA_FILE confirmado por el servidor
+        self.sensor_offset_file = os.getenv("SENSOR_OFFSET_FILE", f"{node_directory}/datos_sensor.offset")
+        # Con SENSOR_TEXT_LOG=0 ya no se escribe ni se sube datos_sensor.txt, sólo la serie binaria
+        self.sensor_text_log = os.getenv("SENSOR_TEXT_LOG", "1") == "1"
+        self.infrared_file = os.getenv("INFRARED_FILE", f"{node_directory}/infrared_count.txt")
+        # Serie binaria con lo que leen los sensores del nodo (ver nodo_comun/timeseries.py)
+        series = spec.get("series", "datos.bin")
+        self.timeseries_file = os.getenv("TIMESERIES_FILE", f"{node_directory}/{series}")
+        self.timeseries_offset_file = os.getenv("TIMESERIES_OFFSET_FILE", f"{self.timeseries_file}.offset")
+
+        # Configuración de la URL de monitorización y otros datos sensibles
+        self.monitoring_url = os.getenv("MONITORING_URL")
+        self.device_id = os.getenv("DEVICE_ID")
+        self.api_password = os.getenv("API_PASSWORD")
+
+        # Cuándo se sube: UPLOAD_MIN_FILES, UPLOAD_MAX_AGE, UPLOAD_MIN_BATTERY... en el .env
+        min_files = int(os.getenv("UPLOAD_MIN_FILES", spec.get("min_files", UPLOAD_MIN_FILES)))
+        self.policy = UploadPolicy(self.policy_file, min_files=min_files)
+
+        # Cámara, SHT20, Arduino y apagado se abren cuando una etapa los pide (DEVICE_BACKEND=sim fuera de la Pi)
+        self.devices = Devices()
+
+    def log_action(self, message):
+        with open(self.log_file, "a") as log_file:
+            log_file.write(f"{datetime.now()}: {message}\n")
+
+    def take_photo(self, timestamp=None):
+        os.makedirs(self.local_directory, exist_ok=True)
+        timestamp = timestamp or datetime.now().strftime("%Y%m%d_%H%M%S")
+        # Resolución y tamaño objetivo según el enlace medido (sólo con ADAPTIVE_QUALITY=1)
+        settings = capture_settings(self.policy_file, self.policy.min_files)
+        # Captura en proceso (V4L2) en lugar de lanzar fswebcam; con DEVICE_BACKEND=sim, cámara simulada
+        with self.devices.camera(width=settings["width"], height=settings["height"]) as camera:
+            frame = camera.capture()
+        # ¿Ha cambiado algo respecto a la última foto subida? (sólo con CHANGE_DETECTION=1)
+        change = check_frame(frame, self.change_reference_file, timestamp + self.suffix)
+        # Recorte a la zona de la trampa y recodificación según el .env del nodo
+        frame, info = process_image(frame, target_bytes=settings["target_bytes"])
+        record_quality(self.policy_file, settings, info)
+        filename = timestamp + self.suffix + info["ext"]
+        if change is not None and not change["subida"]:
+            self.log_action(
+                f"Image {filename} unchanged, not uploaded (distance {change['distancia']}, diff {change['diferencia']})."
+            )
+            return None, filename, change, frame
+        filepath = f"{self.local_directory}/{filename}"
+        save_frame(frame, filepath)
+        # Con TILE_DIFF=1 se sube sólo lo que cambió respecto a la última foto completa
+        upload_path = prepare_upload(frame, filepath, self.tile_state_file)
+        # Con PROGRESSIVE_UPLOAD=1 se sube ya una miniatura y la completa queda retenida
+        upload_path = hold_full_image(frame, upload_path)
+        if info["processed"] != info["original"]:
+            self.log_action(f"Image {filename} processed: {info['original']} -> {info['processed']} bytes (x{info['ratio']}).")
+        return upload_path, filename, change, frame
+
+    def capture(self, timestamp=None):
+        filepath, filename, change, frame = self.take_photo(timestamp)
+        self.log_action(f"Photo {filename} taken.")
+        if filepath and os.path.exists(filepath):
+            current_span().add_bytes(os.path.getsize(filepath))
+        return filepath, filename, change, frame
+
+    def count(self, photo):
+        # Conteo de insectos sobre la foto ya recortada (sólo con INSECT_COUNTING=1)
+        try:
+            result = count_frame(photo[3])
+        except Exception as e:
+            # Un fallo del conteo no debe dejar el ciclo sin monitorización
+            self.log_action(f"Count failed: {e}")
+            return None
+        if result is not None:
+            self.log_action(f"Count: {result['insectos']} insects in {result['ms']} ms.")
+        return result
+
+    def sense(self):
+        # El sensor I2C se abre en su etapa, no al importar el script
+        data = self.devices.climate().read_all()
+        temp = round(data[0], 2)
+        humid = round(data[1], 2)
+        if self.sensor_text_log:
+            with open(self.sensor_data_file, "a") as file:
+                file.write(f"{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}, T: {temp}, H: {humid}\n")
+        return temp, humid
+
+    def read_battery(self):
+        """Captura una sola vez el dato de voltaje desde el Arduino."""
+        # Vuelve en cuanto llegan los dos voltajes (tramas de nodo_comun/arduino.py), máximo 10 segundos
+        ser = self.devices.serial()
+        try:
+            fields, errors = read_fields(ser, ["bateria_arduino", "bateria_pi"], timeout=10)
+        finally:
+            ser.close()
+        # Cada trama descartada por CRC cuenta como reintento
+        for _ in range(errors):
+            current_span().retry()
+        bateriaArduino, bateriaPi = fields.get("bateria_arduino"), fields.get("bateria_pi")
+        if bateriaPi is not None:
+            # La batería de la Pi decide si el siguiente ciclo enciende la radio
+            self.policy.record_battery(bateriaPi)
+        return bateriaArduino, bateriaPi
+
+    def log_record(self, sensor=None, battery=None):
+        # Un registro de tamaño fijo por ciclo; A0 es la batería de la Pi y A1 la del Arduino.
+        # Si falló una de las dos lecturas se guarda la otra; si fallaron las dos, nada
+        if sensor is None and battery is None:
+            return
+        temp, humid = sensor or (None, None)
+        bateriaArduino, bateriaPi = battery or (None, None)
+        timeseries.append_record(
+            self.timeseries_file, datetime.now(), self.name,
+            temp=temp, humid=humid, battery_a0=bateriaPi, battery_a1=bateriaArduino,
+        )
+
+    def read_arduino_data(self):
+        """
+        Lee datos del Arduino durante 10 segundos como máximo.
+        Retorna el valor leído (o None si no se recibe nada) y los trozos del
+        histograma por minutos desde el último despertar (lista vacía si no llegan).
+        """
+        try:
+            # Abrir el puerto serie en cuanto exista y esperar sólo hasta que llegue el conteo
+            ser = self.devices.serial()
+            try:
+                fields, errors = read_fields(ser, ["conteo_ir"], timeout=10)
+            finally:
+                ser.close()
+        except OSError as e:
+            self.log_action(f"Error al conectar con Arduino: {str(e)}")
+            return None, []
+        for _ in range(errors):
+            current_span().retry()
+
+        valor = fields.get("conteo_ir")
+        histogram = fields.get("histograma_ir", [])
+        if valor is None:
+            self.log_action("No se recibieron datos del Arduino en 10 segundos")
+            return None, histogram
+        self.log_action(f"Dato recibido del Arduino: {valor}")
+        # Guardar el valor en el archivo .txt (sobrescribir para mantener solo un dato)
+        with open(self.infrared_file, "w") as f:
+            f.write(str(valor))
+        return valor, histogram
+
+    def check_infrared_file(self):
+        """
+        Verificar si hay un valor almacenado en el archivo .txt y devolverlo.
+        Si el archivo está vacío, devolver None.
+        """
+        if os.path.exists(self.infrared_file):
+            with open(self.infrared_file, "r") as f:
+                data = f.read().strip()
+                if data:
+                    try:
+                        return int(data)
+                    except ValueError:
+                        self.log_action("Error: Valor inválido en el archivo de infrarrojo.")
+                        return None
+        return None
+
+    def read_infrared(self):
+        # Verificar si hay un dato pendiente de infrarrojo; si no, leer del Arduino
+        infrared_count = self.check_infrared_file()
+        if infrared_count is not None:
+            return infrared_count, None
+        infrared_count, chunks = self.read_arduino_data()
+        if chunks:
+            # Un registro por minuto y sensor en la serie, empaquetados de una vez
+            times, counts = decode_histogram(chunks)
+            sensors = {f"ir{i + 1}": counts[i] for i in range(min(len(counts), 2))}
+            timeseries.append_records(self.timeseries_file, [timeseries.pack_array(times, self.name, **sensors)])
+            self.log_action(f"Histograma infrarrojo: {len(times)} intervalos, {int(counts.sum())} detecciones.")
+            return infrared_count, histogram_batch(chunks)
+        if infrared_count is not None:
+            # Firmware sin histograma: sólo la suma de los dos sensores, que se guarda en ir1
+            timeseries.append_record(self.timeseries_file, datetime.now(), self.name, ir1=infrared_count)
+        return infrared_count, None
+
+    def upload_to_server(self, session, filepaths, include_sensor_data=False, deadline=None):
+        # Las fotos descartadas por no tener cambios llegan como None
+        transfers = [(filepath, self.server_dir) for filepath in filepaths if filepath]
+        # Todas las transferencias del ciclo comparten la misma sesión SSH (varias a la vez
+        # si hay atrasadas), y sólo cuenta como subida lo que el servidor confirma con la
+        # misma huella
+        start = time.monotonic()
+        results = put_verified(
+            session, transfers, self.manifest_file, self.local_directory, UPLOAD_CONCURRENCY, deadline
+        )
+        acknowledge_uploads(results, self.tile_state_file)
+        acknowledge_change(results, self.change_reference_file)
+        if include_sensor_data and self.sensor_text_log:
+            # Sólo las lecturas nuevas desde el último offset confirmado, no el fichero entero
+            results.append(
+                sync_appended(
+                    session, self.sensor_data_file, f"{self.server_dir}/datos_sensor.txt", self.sensor_offset_file
+                )
+            )
+        for r in results:
+            if r["ok"]:
+                print(f"{r['file']} uploaded to the server ({r['bytes']} bytes, {r['seconds']} s).")
+            elif r.get("deferred"):
+                print(f"{r['file']} deferred to the next cycle.")
+            else:
+                print(f"Error uploading {r['file']} to the server.")
+        stats = summarize(results, time.monotonic() - start)
+        self.policy.record_upload(stats)
+        current_span().add_bytes(stats["bytes"])
+        current_span().retry(stats["failed"])
+        self.log_action(
+            f"Upload: {stats['files']} files, {stats['bytes']} bytes in {stats['seconds']} s "
+            f"({stats['throughput']} B/s), {stats['failed']} failed, {stats['deferred']} deferred."
+        )
+        return results
+
+    def connect(self, session, photo=None):
+        # Con la foto de por medio, sólo se conecta si hay foto que subir (no si no cambió)
+        if photo is not None and photo[0] is None:
+            self.log_action("Nothing to upload: SSH connection not opened.")
+            return False
+        return session.open(wait=READY_TIMEOUT)
+
+    def upload_series(self, session):
+        # Sólo los registros binarios nuevos desde el último offset confirmado
+        result = sync_appended(
+            session,
+            self.timeseries_file,
+            f"{self.server_dir}/{os.path.basename(self.timeseries_file)}",
+            self.timeseries_offset_file,
+            record_size=timeseries.RECORD_SIZE,
+            header_size=timeseries.HEADER_SIZE,
+        )
+        current_span().add_bytes(result["bytes"])
+        if not result["ok"]:
+            current_span().retry()
+            print(f"Error uploading {result['file']} to the server.")
+        return result
+
+    def release_photos(self, spool, results):
+        # Borrar sólo las fotos que llegaron al servidor y ajustar el resto al presupuesto
+        released = sum(spool.release(results.get(stage) or []) for stage in ("backlog", "upload"))
+        print(f"{released} images deleted after upload.")
+        for action, filename, before, after in spool.enforce():
+            self.log_action(f"Spool: {filename} {action} ({before} -> {after} bytes).")
+
+    def send_monitoring_data(self, timestamp, photo=None, sensor=None, battery=None, infrared=None, count=None,
+                             tiempos=None):
+        """
+        Envía minutos y segundos de la foto (`timestamp`, el de su nombre) y lo
+        que hayan leído las etapas del nodo; las que fallaron llegan como None.
+        """
+        # Obtener minutos y segundos del 'HHMMSS' de la foto
+        time_part = timestamp.split('_')[1]
+        minutes = time_part[2:4]
+        seconds = time_part[4:6]
+
+        import pytz  # sólo hace falta aquí: no retrasa el arranque ni la foto
+
+        zona_horaria = pytz.timezone('Europe/Madrid')
+        now = datetime.now(zona_horaria)
+        # Hora del envío; `timestamp` sigue siendo la de la foto, que identifica la lectura en la cola
+        sent_at = now.strftime('%Y-%m-%d %H:%M:%S CEST%z')
+
+        data = {
+            "name": "irivera",
+            "password": self.api_password,
+            "device_id": self.device_id,
+            "timestamp": sent_at,
+            "segundos": int(minutes + seconds),
+        }
+        if sensor is not None:
+            data["temperatura"], data["humedad"] = sensor
+        if battery is not None:
+            data["bateriaArduino"], data["bateriaPi"] = battery
+        if "infrared" in self.stages:
+            # Sin lectura del Arduino se sigue mandando 1, como hasta ahora
+            data["infrarrojo"] = infrared[0] if infrared is not None and infrared[0] is not None else 1
+        if tiempos is not None:
+            # Tiempos por etapa del ciclo anterior: etapa -> [segundos, bytes, reintentos]
+            data["tiempos"] = tiempos
+        if count is not None:
+            # Insectos contados en el nodo y sus cajas en píxeles de la foto
+            data["conteo"] = count
+        if photo is not None and photo[2] is not None:
+            # Latido de la detección de cambios; sin foto nueva es lo único que llega de este ciclo
+            data["cambio"] = photo[2]
+        if infrared is not None and infrared[1]:
+            # Detecciones por minuto de cada sensor desde el último despertar, en un solo envío
+            data["histograma_ir"] = infrared[1]
+
+        # Encolar la lectura y enviar todo lo pendiente (también lo de ciclos anteriores); la
+        # lectura se identifica por la hora de la foto, no por la del envío
+        sent, pending, sender = enqueue_and_drain(self.outbox_file, self.monitoring_url, data, captured_at=timestamp)
+        # Fotos completas que pide el servidor: se suben en el ciclo siguiente
+        request_full_images(self.requests_file, sender.requested)
+        current_span().add_bytes(sender.bytes_sent)
+        if pending:
+            current_span().retry()
+
+        if infrared is not None:
+            # El conteo infrarrojo ya está a salvo en la cola: limpiar el archivo
+            open(self.infrared_file, "w").close()
+
+        if pending == 0:
+            print("Datos de monitorización enviados correctamente.")
+            self.log_action(f"Monitorización: datos enviados correctamente ({sent} lecturas).")
+        elif sender.last_error is not None:
+            print(f"Error de conexión: {sender.last_error}")
+            self.log_action(f"Error de conexión al enviar datos: {sender.last_error}. Pendientes: {pending}.")
+        else:
+            print(f"Error al enviar datos de monitorización. Código: {sender.last_status}")
+            self.log_action(
+                f"Monitorización: error al enviar datos. Código: {sender.last_status}. Pendientes: {pending}."
+            )
+
+    def build_cycle(self, record, session, backlog, upload_due, timestamp, previous_timing=None):
+        """
+        Etapas del ciclo según la configuración del nodo. La foto, los sensores
+        y la conexión SSH van en paralelo; la subida y la monitorización esperan
+        sólo a las etapas de las que dependen. Un sensor o una foto fallidos no
+        impiden guardar ni enviar lo demás: esas dependencias son opcionales.
+        Si lo único que subir es la foto del ciclo y la detección de cambios
+        está activada, la conexión espera a la foto y no se abre sin ella.
+        """
+        cycle = Cycle(record)
+        readings = [stage for stage in ("sensor", "battery", "infrared") if stage in self.stages]
+        cycle.stage("photo", lambda: self.capture(timestamp))
+        if "sensor" in self.stages:
+            cycle.stage("sensor", self.sense)
+        if "battery" in self.stages:
+            cycle.stage("battery", self.read_battery)
+        if "infrared" in self.stages:
+            # La espera del Arduino (hasta 10 s) no retrasa la foto ni la subida
+            cycle.stage("infrared", self.read_infrared)
+        # El infrarrojo escribe su histograma en la serie al leerlo; SHT20 y baterías, en un registro común
+        series_after = ["infrared"] if "infrared" in self.stages else []
+        climate = [stage for stage in ("sensor", "battery") if stage in self.stages]
+        if climate:
+            cycle.stage("record", self.log_record, after=climate, optional=climate)
+            series_after.append("record")
+        if upload_due:
+            # Sin atrasadas, serie ni datos_sensor.txt, una foto sin cambios deja el ciclo sin nada que subir
+            photo_only = not backlog and not series_after and not ("sensor" in self.stages and self.sensor_text_log)
+            if CHANGE_DETECTION and photo_only:
+                cycle.stage("connect", lambda photo: self.connect(session, photo), after=["photo"])
+            else:
+                cycle.stage("connect", lambda: self.connect(session))
+            cycle.stage(
+                "backlog",
+                lambda connect: self.upload_to_server(session, backlog, deadline=upload_deadline()),
+                after=["connect"],
+            )
+            # datos_sensor.txt sube con la foto, así que espera a la lectura del SHT20
+            sensor = ["sensor"] if "sensor" in self.stages else []
+            cycle.stage(
+                "upload",
+                lambda photo, backlog, **_: self.upload_to_server(
+                    session, [photo[0]], include_sensor_data="sensor" in self.stages
+                ),
+                after=["photo", "backlog"] + sensor,
+                optional=sensor,
+            )
+            if series_after:
+                cycle.stage(
+                    "series",
+                    lambda **_: self.upload_series(session),
+                    after=series_after + ["backlog"],
+                    optional=series_after,
+                )
+        if "count" in self.stages:
+            # Conteo de insectos en paralelo con la subida
+            cycle.stage("count", self.count, after=["photo"])
+        if "monitoring" in self.stages:
+            # Sólo necesita la hora de la foto, que ya se conoce: lo demás va si llegó
+            inputs = ["photo"] + readings + (["count"] if "count" in self.stages else [])
+            cycle.stage(
+                "monitoring",
+                lambda **inputs: self.send_monitoring_data(timestamp, tiempos=previous_timing, **inputs),
+                after=inputs,
+                optional=inputs,
+            )
+        return cycle
+
+    def main(self):
+        # Fotos completas pedidas por el servidor (o, en un ciclo ocioso, las más antiguas)
+        for name in release_full_images(
+            self.local_directory, self.requests_file, self.policy_file, battery_stage="battery" in self.stages
+        ):
+            self.log_action(f"Full image {name} queued for upload.")
+        # Fotos pendientes de ciclos anteriores, antes de que empiece la captura de éste; la
+        # cola de monitorización, datos_sensor.txt y la serie cuentan en el presupuesto del almacén
+        telemetry = [self.sensor_data_file, self.timeseries_file]
+        if "monitoring" in self.stages:
+            telemetry += [self.outbox_file, f"{self.outbox_file}-wal"]
+        spool = Spool(self.local_directory, telemetry=telemetry, held=[hold_directory(self.local_directory)])
+        backlog = spool.pending()
+        # ¿Se sube en este ciclo o se acumula para un lote mayor?
+        upload_due, reason = self.policy.decide(backlog)
+        self.log_action(f"Upload policy: {'upload' if upload_due else 'wait'} ({reason}).")
+        session = SSHSession(self.server_user, self.server_ip)
+
+        previous_timing = load_last(self.timing_file) if "monitoring" in self.stages else None
+        # Hora de la foto de este ciclo, también para la monitorización si la captura falla
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        record = CycleRecord(self.record_name)
+        cycle = self.build_cycle(record, session, backlog, upload_due, timestamp, previous_timing)
+        results, errors = cycle.run()
+        session.close()
+        self.devices.close()
+
+        for stage, error in errors.items():
+            self.log_action(f"Error en la etapa {stage}: {error}")
+        for stage, failed in cycle.skipped.items():
+            self.log_action(f"Etapa {stage} omitida: falló {failed}.")
+        record.save(self.timing_file)
+        self.log_action(cycle.summary())
+        print(cycle.summary())
+
+        self.release_photos(spool, results)
+
+        if self.shutdown:
+            # Apagar el sistema
+            self.log_action("Shutting down the system.")
+            self.devices.shutdown()
@@ -0,0 +1,126 @@
+"""
+Almacén local acotado para lo que aún no ha llegado al servidor.
+
+Las fotos se quedan en el directorio del nodo hasta que su subida se confirma
+(ya no se borran al final del ciclo aunque la subida haya fallado). Para que
+una caída de días no llene la tarjeta SD, todo el almacén (fotos más
+telemetría: la cola de monitorización, datos_sensor.txt y la serie binaria)
+tiene un presupuesto de SPOOL_BUDGET_MB.
+
+La telemetría tiene prioridad: ocupa lo que necesite y las fotos se ajustan
+al resto. Con el presupuesto superado:
+
+1. Se reducen a la mitad, de la más antigua a la más nueva y por pasadas,
+   las fotos que aún pasan de SPOOL_MIN_WIDTH píxeles de ancho (una foto
+   truncada o corrupta no se puede reducir y pasa directamente al paso 2).
+2. Si no basta, se eliminan las más antiguas.
+
+SPOOL_ORDER decide qué se sube primero al volver la conexión: "oldest"
+(orden de captura) o "newest" (lo más reciente primero, útil si el tiempo
+de subida por ciclo es limitado).
+
+Las fotos completas retenidas por la subida progresiva (`held`) también
+cuentan para el presupuesto, y se reducen y eliminan antes que las pendientes:
+de ellas el servidor ya tiene la miniatura.
+"""
+import io
+import os
+
+from nodo_comun.upload import IMAGE_EXTENSIONS, pending_images
+
+SPOOL_BUDGET_MB = float(os.getenv("SPOOL_BUDGET_MB", "256"))
+SPOOL_MIN_WIDTH = int(os.getenv("SPOOL_MIN_WIDTH", "320"))
+SPOOL_ORDER = os.getenv("SPOOL_ORDER", "oldest")
+SPOOL_QUALITY = int(os.getenv("SPOOL_QUALITY", "70"))
+
+# Formatos que se pueden reducir; los .tiles dependen de su referencia y sólo se eliminan
+RESIZABLE = {".jpg": "JPEG", ".webp": "WEBP"}
+
+
+def downsample(path, min_width=SPOOL_MIN_WIDTH, quality=SPOOL_QUALITY):
+    """Reduce la foto a la mitad en su sitio. Devuelve el nuevo tamaño, o None si no se puede."""
+    image_format = RESIZABLE.get(os.path.splitext(path)[1])
+    if image_format is None:
+        return None
+    try:
+        from PIL import Image
+    except ImportError:
+        return None
+
+    try:
+        with Image.open(path) as image:
+            width, height = image.size
+            if width // 2 < min_width:
+                return None
+            out = io.BytesIO()
+            image.convert("RGB").resize((width // 2, height // 2)).save(out, image_format, quality=quality)
+    except OSError:
+        # Foto truncada o corrupta: no se reduce, sólo se puede eliminar
+        return None
+    tmp_path = f"{path}.part"
+    with open(tmp_path, "wb") as f:
+        f.write(out.getvalue())
+    os.replace(tmp_path, path)
+    return len(out.getvalue())
+
+
+class Spool:
+    def __init__(self, directory, telemetry=(), budget_mb=SPOOL_BUDGET_MB, order=SPOOL_ORDER, held=()):
+        self.directory = directory
+        self.telemetry = telemetry
+        self.held = held
+        self.budget = int(budget_mb * 1024 * 1024)
+        self.order = order
+
+    def pending(self):
+        """Fotos pendientes en el orden de subida configurado."""
+        images = pending_images(self.directory)
+        return images[::-1] if self.order == "newest" else images
+
+    def release(self, results):
+        """Borra las fotos del almacén cuya subida se confirmó. Devuelve cuántas."""
+        released = 0
+        for r in results:
+            path = os.path.join(self.directory, r["file"])
+            if r["ok"] and r["file"].endswith(IMAGE_EXTENSIONS) and os.path.exists(path):
+                os.remove(path)
+                released += 1
+        return released
+
+    def telemetry_bytes(self):
+        return sum(os.path.getsize(p) for p in self.telemetry if os.path.exists(p))
+
+    def enforce(self):
+        """
+        Ajusta las fotos al presupuesto que deja la telemetría. Devuelve las
+        acciones tomadas: ("reducida" | "eliminada", fichero, bytes antes, bytes después).
+        """
+        limit = self.budget - self.telemetry_bytes()
+        images = [p for d in self.held if os.path.isdir(d) for p in pending_images(d)]
+        images += pending_images(self.directory)
+        sizes = {path: os.path.getsize(path) for path in images}
+        total = sum(sizes.values())
+        actions = []
+
+        # Primero reducir, de la más antigua a la más nueva, por pasadas hasta el ancho mínimo
+        reducible = list(images)
+        while total > limit and reducible:
+            for path in list(reducible):
+                if total <= limit:
+                    return actions
+                new_size = downsample(path)
+                if new_size is None:
+                    reducible.remove(path)
+                    continue
+                actions.append(("reducida", os.path.basename(path), sizes[path], new_size))
+                total -= sizes[path] - new_size
+                sizes[path] = new_size
+
+        # Después eliminar, también de la más antigua a la más nueva
+        for path in images:
+            if total <= limit:
+                break
+            os.remove(path)
+            actions.append(("eliminada", os.path.basename(path), sizes[path], 0))
+            total -= sizes[path]
+        return actions
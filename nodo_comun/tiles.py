@@ -0,0 +1,212 @@
+"""
+Subida por teselas: sólo las zonas de la foto que cambian respecto a la
+última foto completa confirmada por el servidor (la referencia).
+
+La foto se divide en teselas de TILE_SIZE píxeles y se compara con la
+referencia; las teselas con más de TILE_MIN_PIXELS píxeles que difieren en
+más de TILE_THRESHOLD (un insecto nuevo ocupa poco de la tesela, así que no
+sirve la diferencia media) se empaquetan en un mosaico JPEG dentro de un
+fichero .tiles:
+
+    MAGIC (8 bytes) | longitud de la cabecera (uint32 LE) | cabecera JSON | mosaico JPEG
+
+La cabecera indica la referencia ("base"), el tamaño de la foto, el tamaño
+de tesela, las columnas del mosaico y la posición de cada tesela. El servidor
+(servidor/reconstruir.py) pega las teselas sobre la referencia y rehace la
+foto completa.
+
+La referencia sólo avanza con fotos completas (claves): cuando cambia más de
+TILE_MAX_FRACTION de la foto, cuando no hay referencia o cuando la foto tiene
+otro tamaño. Una clave no pasa a ser la referencia hasta que su subida se
+confirma, así que los incrementos siempre se calculan contra algo que el
+servidor tiene. Se activa por nodo con TILE_DIFF=1.
+"""
+import io
+import json
+import os
+import struct
+import threading
+
+TILE_DIFF = os.getenv("TILE_DIFF", "0") == "1"
+TILE_SIZE = int(os.getenv("TILE_SIZE", "64"))  # múltiplo de 16 para alinear con los bloques JPEG
+TILE_THRESHOLD = int(os.getenv("TILE_THRESHOLD", "32"))  # diferencia por píxel 0-255, por encima del ruido JPEG
+TILE_MIN_PIXELS = int(os.getenv("TILE_MIN_PIXELS", "12"))  # píxeles cambiados para que cuente la tesela
+TILE_MAX_FRACTION = float(os.getenv("TILE_MAX_FRACTION", "0.5"))
+TILE_QUALITY = int(os.getenv("TILE_QUALITY", "85"))
+
+MAGIC = b"OLVTD1\x00\x00"
+HEADER_LEN = struct.Struct("<I")
+TILES_EXTENSION = ".tiles"
+
+# La foto prepara y la subida de atrasadas confirma desde etapas paralelas:
+# cada carga-modificación-guardado de teselas.npz va entera bajo este cerrojo
+_state_lock = threading.Lock()
+
+
+def decode(frame):
+    """Fotograma JPEG/WebP -> array RGB uint8."""
+    import numpy as np
+    from PIL import Image
+
+    return np.asarray(Image.open(io.BytesIO(frame)).convert("RGB"), dtype=np.uint8)
+
+
+def changed_tiles(pixels, reference, tile=TILE_SIZE, threshold=TILE_THRESHOLD, min_pixels=TILE_MIN_PIXELS):
+    """Máscara (filas x columnas de teselas) de las teselas que difieren de la referencia."""
+    import numpy as np
+
+    h, w = pixels.shape[:2]
+    rows, cols = -(-h // tile), -(-w // tile)
+    changed = (np.abs(pixels.astype(np.int16) - reference).max(axis=2) > threshold)
+    # Rellenar hasta un número entero de teselas; el relleno no cuenta como cambio
+    padded = np.zeros((rows * tile, cols * tile), dtype=np.uint16)
+    padded[:h, :w] = changed
+    return padded.reshape(rows, tile, cols, tile).sum(axis=(1, 3)) > min_pixels
+
+
+def encode_delta(pixels, mask, base_name, tile=TILE_SIZE, quality=TILE_QUALITY):
+    """Contenido del fichero .tiles con las teselas marcadas en `mask`."""
+    import numpy as np
+    from PIL import Image
+
+    h, w = pixels.shape[:2]
+    positions = [[int(c), int(r)] for r, c in zip(*np.nonzero(mask))]
+    columns = max(1, int(np.ceil(np.sqrt(len(positions)))))
+    mosaic_rows = max(1, -(-len(positions) // columns))
+    mosaic = np.zeros((mosaic_rows * tile, columns * tile, 3), dtype=np.uint8)
+    padded = np.pad(pixels, ((0, -h % tile), (0, -w % tile), (0, 0)), mode="edge")
+    for i, (c, r) in enumerate(positions):
+        my, mx = divmod(i, columns)
+        mosaic[my * tile:(my + 1) * tile, mx * tile:(mx + 1) * tile] = \
+            padded[r * tile:(r + 1) * tile, c * tile:(c + 1) * tile]
+
+    out = io.BytesIO()
+    Image.fromarray(mosaic).save(out, "JPEG", quality=quality)
+    header = json.dumps({
+        "base": base_name, "size": [w, h], "tile": tile, "cols": columns, "tiles": positions,
+    }).encode()
+    return MAGIC + HEADER_LEN.pack(len(header)) + header + out.getvalue()
+
+
+def read_delta_file(data):
+    """Separa un fichero .tiles en (cabecera, mosaico JPEG)."""
+    if data[:len(MAGIC)] != MAGIC:
+        raise ValueError("No es un fichero de teselas")
+    start = len(MAGIC) + HEADER_LEN.size
+    (length,) = HEADER_LEN.unpack_from(data, len(MAGIC))
+    return json.loads(data[start:start + length]), data[start + length:]
+
+
+def apply_delta(base_pixels, data):
+    """Pega las teselas de un fichero .tiles sobre la referencia y devuelve la foto completa."""
+    import numpy as np
+
+    header, mosaic_data = read_delta_file(data)
+    w, h = header["size"]
+    tile, columns = header["tile"], header["cols"]
+    if base_pixels.shape[:2] != (h, w):
+        raise ValueError(f"La referencia {header['base']} no tiene el tamaño {w}x{h}")
+    mosaic = decode(mosaic_data)
+    pixels = np.pad(base_pixels, ((0, -h % tile), (0, -w % tile), (0, 0)), mode="edge")
+    for i, (c, r) in enumerate(header["tiles"]):
+        my, mx = divmod(i, columns)
+        pixels[r * tile:(r + 1) * tile, c * tile:(c + 1) * tile] = \
+            mosaic[my * tile:(my + 1) * tile, mx * tile:(mx + 1) * tile]
+    return pixels[:h, :w]
+
+
+class TileState:
+    """Referencia confirmada y clave pendiente de confirmar, guardadas entre ciclos."""
+
+    def __init__(self, state_path):
+        self.state_path = state_path
+        self.reference = self.reference_name = None
+        self.pending = self.pending_name = None
+        self.pending_bytes = 0
+        self._load()
+
+    def _load(self):
+        import numpy as np
+
+        if not os.path.exists(self.state_path):
+            return
+        try:
+            with np.load(self.state_path) as state:
+                if "reference" in state:
+                    self.reference, self.reference_name = state["reference"], str(state["reference_name"])
+                if "pending" in state:
+                    self.pending, self.pending_name = state["pending"], str(state["pending_name"])
+                    self.pending_bytes = int(state["pending_bytes"])
+        except (OSError, ValueError, KeyError):
+            # Estado corrupto: la próxima foto se sube completa
+            self.reference = self.pending = None
+
+    def _save(self):
+        import numpy as np
+
+        arrays = {}
+        if self.reference is not None:
+            arrays.update(reference=self.reference, reference_name=self.reference_name)
+        if self.pending is not None:
+            arrays.update(pending=self.pending, pending_name=self.pending_name, pending_bytes=self.pending_bytes)
+        # Temporal propio de cada escritor, para no pisar el de otro proceso
+        tmp_path = f"{self.state_path}.{os.getpid()}.{threading.get_ident()}.tmp.npz"
+        np.savez(tmp_path, **arrays)
+        os.replace(tmp_path, self.state_path)
+
+    def prepare(self, frame, filepath):
+        """
+        Decide qué se sube de la foto guardada en `filepath`: ella misma (clave)
+        o un fichero .tiles a su lado. Devuelve (ruta_a_subir, info).
+        """
+        pixels = decode(frame)
+        filename = os.path.basename(filepath)
+        if self.reference is not None and self.reference.shape == pixels.shape:
+            mask = changed_tiles(pixels, self.reference)
+            if mask.mean() <= TILE_MAX_FRACTION:
+                delta_path = os.path.splitext(filepath)[0] + TILES_EXTENSION
+                tmp_path = f"{delta_path}.part"
+                with open(tmp_path, "wb") as f:
+                    f.write(encode_delta(pixels, mask, self.reference_name))
+                os.replace(tmp_path, delta_path)
+                os.remove(filepath)
+                return delta_path, {"clave": False, "teselas": int(mask.sum()), "total": int(mask.size)}
+        # Clave: se sube completa y pasa a referencia cuando el servidor la confirme
+        self.pending, self.pending_name = pixels, filename
+        self.pending_bytes = os.path.getsize(filepath)
+        self._save()
+        return filepath, {"clave": True}
+
+    def acknowledge(self, results):
+        """
+        Promueve la clave pendiente a referencia si está entre las subidas
+        correctas tal cual se preparó (no reducida después por el almacén).
+        """
+        if self.pending is None:
+            return False
+        if not any(
+            r["ok"] and r["file"] == self.pending_name and r.get("size") == self.pending_bytes for r in results
+        ):
+            return False
+        self.reference, self.reference_name = self.pending, self.pending_name
+        self.pending = self.pending_name = None
+        self._save()
+        return True
+
+
+def prepare_upload(frame, filepath, state_path):
+    """Ruta a subir para la foto: la propia foto, o su fichero .tiles con TILE_DIFF=1."""
+    if not TILE_DIFF or filepath is None:
+        return filepath
+    with _state_lock:
+        upload_path, info = TileState(state_path).prepare(frame, filepath)
+    if not info["clave"]:
+        print(f"{os.path.basename(upload_path)}: {info['teselas']}/{info['total']} tiles changed.")
+    return upload_path
+
+
+def acknowledge_uploads(results, state_path):
+    """Tras una tanda de subidas, confirma la clave pendiente si se subió bien."""
+    if TILE_DIFF:
+        with _state_lock:
+            TileState(state_path).acknowledge(results)
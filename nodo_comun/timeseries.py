@@ -0,0 +1,198 @@
+"""
+Formato binario de registros de tamaño fijo para los datos de los nodos.
+
+Cada registro ocupa RECORD_SIZE bytes (little-endian) con marca de tiempo,
+dispositivo, temperatura, humedad, voltajes de batería A0/A1 y los dos
+contadores infrarrojos. Los valores se guardan como enteros escalados
+(centésimas de grado y de %, milivoltios) y un valor ausente se marca con un
+centinela. El fichero empieza con una cabecera de HEADER_SIZE bytes, de modo
+que un lector puede mapearlo en memoria y operar con NumPy sobre la campaña
+entera:
+
+    series = load("datos_sensor.bin")
+    series["temp"].mean()
+
+Para escribir muchos registros de golpe (el histograma infrarrojo por
+minutos) pack_array empaqueta columnas NumPy sin pasar por pack_record.
+
+Convertir un datos_sensor.txt existente:
+
+    python nodo_comun/timeseries.py convert datos_sensor.txt datos_sensor.bin --device banda
+"""
+import argparse
+import os
+import re
+import struct
+from datetime import datetime
+
+MAGIC = b"OLVTS1\x00\x00"
+# ts (s desde epoch), device, temp (c°C), humid (c%), battery A0/A1 (mV), IR sensor 1/2
+RECORD = struct.Struct("<IHhhHHHH")
+RECORD_SIZE = RECORD.size
+HEADER = struct.Struct("<8sHH4x")
+HEADER_SIZE = HEADER.size
+
+INT16_MISSING = -32768
+UINT16_MISSING = 0xFFFF
+
+DEVICES = {"banda": 1, "amarillo": 2, "verde_1": 3, "verde_2": 4}
+
+NUMPY_DTYPE = [
+    ("ts", "<u4"),
+    ("device", "<u2"),
+    ("temp", "<i2"),
+    ("humid", "<i2"),
+    ("battery_a0", "<u2"),
+    ("battery_a1", "<u2"),
+    ("ir1", "<u2"),
+    ("ir2", "<u2"),
+]
+
+# Escala y centinela de cada campo numérico al pasar a float
+FIELDS = {
+    "temp": (100.0, INT16_MISSING),
+    "humid": (100.0, INT16_MISSING),
+    "battery_a0": (1000.0, UINT16_MISSING),
+    "battery_a1": (1000.0, UINT16_MISSING),
+    "ir1": (1.0, UINT16_MISSING),
+    "ir2": (1.0, UINT16_MISSING),
+}
+
+# Valores guardables de cada tipo sin llegar al centinela: lo que se sale satura (el
+# conteo infrarrojo llega como uint32 y no cabe en un uint16)
+INT16_RANGE = (-32767, 32767)
+UINT16_RANGE = (0, 0xFFFE)
+
+
+def _range(missing):
+    return INT16_RANGE if missing == INT16_MISSING else UINT16_RANGE
+
+
+def _scaled(value, scale, missing):
+    if value is None:
+        return missing
+    low, high = _range(missing)
+    return min(max(int(round(value * scale)), low), high)
+
+
+def pack_record(timestamp, device, temp=None, humid=None, battery_a0=None, battery_a1=None, ir1=None, ir2=None):
+    values = {"temp": temp, "humid": humid, "battery_a0": battery_a0, "battery_a1": battery_a1, "ir1": ir1, "ir2": ir2}
+    return RECORD.pack(
+        int(timestamp.timestamp()),
+        DEVICES[device],
+        *(_scaled(values[name], scale, missing) for name, (scale, missing) in FIELDS.items()),
+    )
+
+
+def pack_array(timestamps, device, **columns):
+    """
+    Empaqueta muchos registros a la vez con NumPy: `timestamps` en segundos
+    desde epoch y un array por campo (NaN o campo ausente = sin dato).
+    """
+    import numpy as np
+
+    records = np.zeros(len(timestamps), dtype=np.dtype(NUMPY_DTYPE))
+    records["ts"] = timestamps
+    records["device"] = DEVICES[device]
+    for name, (scale, missing) in FIELDS.items():
+        if name not in columns:
+            records[name] = missing
+            continue
+        values = np.asarray(columns[name], dtype=np.float64) * scale
+        records[name] = np.where(np.isnan(values), missing, np.clip(np.round(values), *_range(missing)))
+    return records.tobytes()
+
+
+def _ensure_header(f):
+    if f.tell() == 0:
+        f.write(HEADER.pack(MAGIC, RECORD_SIZE, len(NUMPY_DTYPE)))
+
+
+def append_record(path, timestamp, device, **values):
+    """Añade un registro al fichero, creando la cabecera si es nuevo."""
+    with open(path, "ab") as f:
+        _ensure_header(f)
+        f.write(pack_record(timestamp, device, **values))
+
+
+def append_records(path, records):
+    """Añade varios registros ya empaquetados con una sola escritura."""
+    with open(path, "ab") as f:
+        _ensure_header(f)
+        f.write(b"".join(records))
+
+
+def check_header(path):
+    with open(path, "rb") as f:
+        magic, record_size, _ = HEADER.unpack(f.read(HEADER_SIZE))
+    if magic != MAGIC or record_size != RECORD_SIZE:
+        raise ValueError(f"{path} no es un fichero de series de olivar compatible")
+
+
+def iter_records(path):
+    """Lectura sin NumPy, registro a registro (para la Pi)."""
+    check_header(path)
+    with open(path, "rb") as f:
+        f.seek(HEADER_SIZE)
+        while True:
+            raw = f.read(RECORD_SIZE)
+            if len(raw) < RECORD_SIZE:
+                break
+            yield RECORD.unpack(raw)
+
+
+def load(path):
+    """
+    Mapea el fichero en memoria y devuelve un dict de arrays NumPy: "time"
+    (datetime64[s]), "device" y los campos numéricos ya escalados a float, con
+    NaN donde falta el dato.
+    """
+    import numpy as np
+
+    check_header(path)
+    count = (os.path.getsize(path) - HEADER_SIZE) // RECORD_SIZE
+    raw = np.memmap(path, dtype=np.dtype(NUMPY_DTYPE), mode="r", offset=HEADER_SIZE, shape=(count,))
+    series = {"time": raw["ts"].astype("datetime64[s]"), "device": np.asarray(raw["device"])}
+    for name, (scale, missing) in FIELDS.items():
+        column = raw[name].astype(np.float64)
+        column[raw[name] == missing] = np.nan
+        series[name] = column / scale
+    return series
+
+
+# "2024-06-01 10:00:00, T: 21.3, H: 45.1"
+TEXT_LINE_RE = re.compile(r"^(\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2}), T: ([-\d.]+|None), H: ([-\d.]+|None)")
+
+
+def convert_text(text_path, binary_path, device):
+    """Convierte un datos_sensor.txt al formato binario. Devuelve los registros escritos."""
+    records = []
+    with open(text_path, "r") as f:
+        for line in f:
+            match = TEXT_LINE_RE.match(line)
+            if not match:
+                continue
+            temp = None if match.group(2) == "None" else float(match.group(2))
+            humid = None if match.group(3) == "None" else float(match.group(3))
+            timestamp = datetime.strptime(match.group(1), "%Y-%m-%d %H:%M:%S")
+            records.append(pack_record(timestamp, device, temp=temp, humid=humid))
+    append_records(binary_path, records)
+    return len(records)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Series binarias de los nodos de olivar.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    convert = sub.add_parser("convert", help="convertir un datos_sensor.txt")
+    convert.add_argument("text_path")
+    convert.add_argument("binary_path")
+    convert.add_argument("--device", choices=sorted(DEVICES), default="banda")
+    args = parser.parse_args()
+
+    if args.command == "convert":
+        count = convert_text(args.text_path, args.binary_path, args.device)
+        print(f"{count} registros escritos en {args.binary_path}.")
+
+
+if __name__ == "__main__":
+    main()
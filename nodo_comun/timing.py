@@ -0,0 +1,123 @@
+"""
+Medición por etapas del ciclo del nodo.
+
+Cada etapa se ejecuta dentro de un span que registra su tiempo de reloj, los
+bytes transferidos y los reintentos. El código de la etapa accede a su span con
+`current_span()` sin tener que recibirlo como argumento:
+
+    record = CycleRecord("banda")
+    with record.span("upload"):
+        ...
+        current_span().add_bytes(size)
+
+Al acabar el ciclo el registro se añade como una línea JSON al log de tiempos
+del nodo, y su forma compacta viaja en el JSON de monitorización del ciclo
+siguiente.
+"""
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+_local = threading.local()
+
+
+class Span:
+    __slots__ = ("name", "seconds", "bytes", "retries")
+
+    def __init__(self, name):
+        self.name = name
+        self.seconds = 0.0
+        self.bytes = 0
+        self.retries = 0
+
+    def add_bytes(self, count):
+        self.bytes += int(count)
+
+    def retry(self, count=1):
+        self.retries += int(count)
+
+
+def current_span():
+    """Span de la etapa en curso en este hilo (uno descartable fuera de un ciclo)."""
+    span = getattr(_local, "span", None)
+    return span if span is not None else Span("unbound")
+
+
+class CycleRecord:
+    def __init__(self, node):
+        self.node = node
+        self.started_at = datetime.now()
+        self._start = time.monotonic()
+        self.elapsed = 0.0
+        self.spans = {}
+
+    @contextmanager
+    def span(self, name):
+        span = Span(name)
+        previous = getattr(_local, "span", None)
+        _local.span = span
+        start = time.monotonic()
+        try:
+            yield span
+        finally:
+            span.seconds = time.monotonic() - start
+            self.spans[name] = span
+            _local.span = previous
+
+    def finish(self):
+        self.elapsed = time.monotonic() - self._start
+        return self
+
+    def to_dict(self):
+        return {
+            "node": self.node,
+            "start": self.started_at.isoformat(),
+            "total": round(self.elapsed, 3),
+            "stages": {
+                name: {"seconds": round(s.seconds, 3), "bytes": s.bytes, "retries": s.retries}
+                for name, s in self.spans.items()
+            },
+        }
+
+    def compact(self):
+        """Forma reducida para el JSON de monitorización: etapa -> [segundos, bytes, reintentos]."""
+        return {
+            "t": round(self.elapsed, 2),
+            "s": {name: [round(s.seconds, 2), s.bytes, s.retries] for name, s in self.spans.items()},
+        }
+
+    def save(self, path):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with open(path, "a") as f:
+            f.write(json.dumps(self.to_dict()) + "\n")
+
+
+def compact_record(record):
+    """Convierte un registro guardado (to_dict) a la forma compacta."""
+    return {
+        "t": round(record["total"], 2),
+        "s": {
+            name: [round(stage["seconds"], 2), stage["bytes"], stage["retries"]]
+            for name, stage in record["stages"].items()
+        },
+    }
+
+
+def load_last(path):
+    """Último registro del log de tiempos en forma compacta, o None si no hay."""
+    if not os.path.exists(path):
+        return None
+    with open(path, "rb") as f:
+        # Leer sólo el final del fichero: el log crece durante toda la campaña
+        f.seek(0, os.SEEK_END)
+        f.seek(max(0, f.tell() - 8192))
+        lines = f.read().splitlines()
+    for line in reversed(lines):
+        try:
+            return compact_record(json.loads(line))
+        except (ValueError, KeyError):
+            continue
+    return None
@@ -0,0 +1,177 @@
+"""
+Subida de ficheros al servidor a través de una única sesión SSH por ciclo.
+
+En lugar de lanzar un `scp` independiente por foto (un handshake y un
+intercambio de claves por fichero), se abre una conexión maestra de OpenSSH
+(ControlMaster) y todas las transferencias del ciclo viajan multiplexadas por
+ella.
+
+Con fotos atrasadas (tras una caída) se suben varias a la vez por la misma
+conexión maestra, hasta UPLOAD_CONCURRENCY canales (el servidor admite 10 por
+defecto, MaxSessions), y dentro de un presupuesto de UPLOAD_BUDGET segundos
+por ciclo: lo que no quepa se aplaza al siguiente despertar.
+"""
+import os
+import subprocess
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from nodo_comun.readiness import wait_for_network
+
+SSH_CONTROL_DIR = os.getenv("SSH_CONTROL_DIR", tempfile.gettempdir())
+SSH_CONNECT_TIMEOUT = int(os.getenv("SSH_CONNECT_TIMEOUT", "15"))
+SSH_PORT = int(os.getenv("SSH_PORT", "22"))
+# Segundos que la conexión maestra sigue viva si el script muere sin cerrarla
+SSH_CONTROL_PERSIST = int(os.getenv("SSH_CONTROL_PERSIST", "60"))
+# Extensiones de las fotos que se suben (WebP si el nodo recodifica así sus fotos,
+# .tiles si sólo sube las teselas que cambiaron)
+IMAGE_EXTENSIONS = (".jpg", ".webp", ".tiles")
+UPLOAD_CONCURRENCY = int(os.getenv("UPLOAD_CONCURRENCY", "3"))
+UPLOAD_BUDGET = float(os.getenv("UPLOAD_BUDGET", "120"))  # segundos por ciclo; 0 = sin límite
+
+
+class SSHSession:
+    """Conexión SSH maestra compartida por todas las transferencias de un ciclo."""
+
+    def __init__(self, user, host, ssh_cmd="ssh", scp_cmd="scp"):
+        self.user = user
+        self.host = host
+        self.ssh_cmd = ssh_cmd
+        self.scp_cmd = scp_cmd
+        self.control_path = os.path.join(SSH_CONTROL_DIR, f"olivar-{user}@{host}.sock")
+        self.is_open = False
+
+    @property
+    def target(self):
+        return f"{self.user}@{self.host}"
+
+    def _options(self):
+        return [
+            "-o", f"ControlPath={self.control_path}",
+            "-o", "BatchMode=yes",
+            "-o", f"ConnectTimeout={SSH_CONNECT_TIMEOUT}",
+            "-o", f"Port={SSH_PORT}",
+        ]
+
+    def open(self, wait=0):
+        """
+        Abre la conexión maestra, esperando antes hasta `wait` segundos a que
+        el servidor responda (la red tarda en subir tras el arranque).
+        Devuelve True si quedó establecida.
+        """
+        if wait:
+            wait_for_network(self.host, SSH_PORT, timeout=wait)
+        result = subprocess.run(
+            [self.ssh_cmd, "-f", "-N",
+             "-o", "ControlMaster=yes",
+             "-o", f"ControlPersist={SSH_CONTROL_PERSIST}",
+             *self._options(), self.target]
+        )
+        self.is_open = result.returncode == 0
+        return self.is_open
+
+    def put(self, local_path, remote_path):
+        """Copia un fichero por la conexión maestra y devuelve su resultado."""
+        size = os.path.getsize(local_path) if os.path.exists(local_path) else 0
+        start = time.monotonic()
+        result = subprocess.run(
+            [self.scp_cmd, "-q", *self._options(), local_path, f"{self.target}:{remote_path}"]
+        )
+        return {
+            "file": os.path.basename(local_path),
+            "bytes": size,
+            "size": size,
+            "seconds": round(time.monotonic() - start, 3),
+            "ok": result.returncode == 0,
+        }
+
+    def run(self, command, input=None):
+        """Ejecuta un comando remoto por la conexión maestra (stdin opcional en bytes)."""
+        # Sin datos, stdin vacío: que ssh no se quede leyendo el stdin del script
+        stdin = {"input": input} if input is not None else {"stdin": subprocess.DEVNULL}
+        return subprocess.run(
+            [self.ssh_cmd, *self._options(), self.target, command],
+            stdout=subprocess.PIPE,
+            **stdin,
+        )
+
+    def put_all(self, transfers, concurrency=1, deadline=None):
+        """
+        Sube una lista de pares (ruta_local, ruta_remota), hasta `concurrency`
+        a la vez. Las que no han empezado al llegar `deadline` (time.monotonic)
+        se devuelven sin intentar, marcadas como "deferred".
+        Si la conexión maestra no se pudo abrir no se intenta ningún fichero,
+        para no pagar un timeout de conexión por cada uno.
+        """
+        if not self.is_open:
+            return [
+                {"file": os.path.basename(local), "bytes": 0, "size": 0, "seconds": 0.0, "ok": False}
+                for local, _ in transfers
+            ]
+
+        def send(transfer):
+            local, remote = transfer
+            if deadline is not None and time.monotonic() >= deadline:
+                return {"file": os.path.basename(local), "bytes": 0, "size": 0, "seconds": 0.0,
+                        "ok": False, "deferred": True}
+            return self.put(local, remote)
+
+        if concurrency <= 1 or len(transfers) <= 1:
+            return [send(transfer) for transfer in transfers]
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            return list(pool.map(send, transfers))
+
+    def close(self):
+        if self.is_open:
+            subprocess.run(
+                [self.ssh_cmd, "-O", "exit", *self._options(), self.target],
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.DEVNULL,
+            )
+            self.is_open = False
+
+    def __enter__(self):
+        self.open()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+def pending_images(directory):
+    """Rutas de las fotos pendientes en el directorio, en orden de captura."""
+    if not os.path.isdir(directory):
+        return []
+    return [
+        os.path.join(directory, filename)
+        for filename in sorted(os.listdir(directory))
+        if filename.endswith(IMAGE_EXTENSIONS)
+    ]
+
+
+def upload_deadline(budget=UPLOAD_BUDGET):
+    """Instante (time.monotonic) en que se acaba el presupuesto de subida, o None sin límite."""
+    return time.monotonic() + budget if budget > 0 else None
+
+
+def summarize(results, elapsed=None):
+    """
+    Resumen de una tanda de subidas: ficheros, bytes, segundos, fallos,
+    aplazadas y rendimiento (bytes/s). Con subidas en paralelo, `elapsed` es
+    el tiempo real de la tanda; si no se da, se suman los de cada fichero.
+    El rendimiento se mide sólo sobre el tiempo de copia, sin la consulta de
+    huellas ni la espera a la conexión que `elapsed` también incluye.
+    """
+    sent = sum(r["bytes"] for r in results if r["ok"])
+    copying = sum(r["seconds"] for r in results if r["ok"])
+    seconds = elapsed if elapsed is not None else sum(r["seconds"] for r in results)
+    transfer = min(seconds, copying) if copying else seconds
+    return {
+        "files": len(results),
+        "bytes": sent,
+        "seconds": round(seconds, 3),
+        "failed": sum(1 for r in results if not r["ok"] and not r.get("deferred")),
+        "deferred": sum(1 for r in results if r.get("deferred")),
+        "throughput": round(sent / transfer) if transfer > 0 else 0,
+    }
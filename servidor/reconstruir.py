@@ -0,0 +1,83 @@
+"""
+Reconstrucción en el servidor de las fotos subidas por teselas.
+
+Los nodos con TILE_DIFF=1 suben, en lugar de la foto completa, un fichero
+.tiles con las teselas que cambiaron respecto a la última foto completa
+(ver nodo_comun/tiles.py). Este script pega esas teselas sobre la foto de
+referencia, que está en el mismo directorio, y guarda la foto completa como
+JPEG con el mismo nombre que tendría la original.
+
+Uso:
+    python reconstruir.py /dataimages_olivar/trampa_amarilla            # una pasada (para cron)
+    python reconstruir.py /dataimages_olivar/trampa_amarilla --follow   # se queda vigilando
+    python reconstruir.py DIR --keep                                     # no borra los .tiles
+"""
+import argparse
+import glob
+import io
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from nodo_comun.tiles import TILES_EXTENSION, apply_delta, decode, read_delta_file
+
+OUTPUT_QUALITY = int(os.getenv("OUTPUT_QUALITY", "90"))
+POLL_INTERVAL = 30  # segundos entre pasadas en modo --follow
+
+
+def reconstruct(delta_path, quality=OUTPUT_QUALITY):
+    """Rehace la foto completa de un fichero .tiles. Devuelve la ruta del JPEG."""
+    from PIL import Image
+
+    with open(delta_path, "rb") as f:
+        data = f.read()
+    header, _ = read_delta_file(data)
+    base_path = os.path.join(os.path.dirname(delta_path), header["base"])
+    with open(base_path, "rb") as f:
+        base_pixels = decode(f.read())
+
+    pixels = apply_delta(base_pixels, data)
+    output_path = os.path.splitext(delta_path)[0] + ".jpg"
+    out = io.BytesIO()
+    Image.fromarray(pixels).save(out, "JPEG", quality=quality)
+    tmp_path = f"{output_path}.part"
+    with open(tmp_path, "wb") as f:
+        f.write(out.getvalue())
+    os.replace(tmp_path, output_path)
+    return output_path
+
+
+def process_directory(directory, keep=False):
+    """Reconstruye todos los .tiles pendientes del directorio, en orden de captura."""
+    rebuilt = 0
+    for delta_path in sorted(glob.glob(os.path.join(directory, "*" + TILES_EXTENSION))):
+        try:
+            output_path = reconstruct(delta_path)
+        except (OSError, ValueError) as e:
+            # Falta la referencia o el fichero está incompleto: se reintenta en la próxima pasada
+            print(f"No se pudo reconstruir {os.path.basename(delta_path)}: {e}")
+            continue
+        if not keep:
+            os.remove(delta_path)
+        print(f"{os.path.basename(output_path)} reconstruida.")
+        rebuilt += 1
+    return rebuilt
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Reconstrucción de las fotos subidas por teselas.")
+    parser.add_argument("directory", help="directorio de fotos del nodo en el servidor")
+    parser.add_argument("--keep", action="store_true", help="no borrar los .tiles reconstruidos")
+    parser.add_argument("--follow", action="store_true", help="seguir vigilando el directorio")
+    args = parser.parse_args()
+
+    while True:
+        process_directory(args.directory, args.keep)
+        if not args.follow:
+            break
+        time.sleep(POLL_INTERVAL)
+
+
+if __name__ == "__main__":
+    main()
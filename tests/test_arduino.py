@@ -0,0 +1,133 @@
+"""Tramas del Arduino: nodo_comun.arduino.FrameParser y read_fields contra FakeArduino."""
+import time
+
+import pytest
+
+from nodo_comun import arduino
+from nodo_comun.arduino import FakeArduino, FrameParser, encode_field, encode_frame, encode_histogram, read_fields
+
+BATTERY = encode_field("bateria_arduino", 3.71)
+COUNT = encode_field("conteo_ir", 42)
+
+
+def test_fields_round_trip():
+    parser = FrameParser()
+    assert parser.feed(BATTERY + encode_field("bateria_pi", 5.02) + COUNT) == {
+        "bateria_arduino": 3.71, "bateria_pi": 5.02, "conteo_ir": 42,
+    }
+    assert parser.errors == 0
+
+
+def test_bad_crc_is_rejected_and_next_frame_kept():
+    corrupt = bytearray(BATTERY)
+    corrupt[-1] ^= 0xFF
+    parser = FrameParser()
+    assert parser.feed(bytes(corrupt) + COUNT) == {"conteo_ir": 42}
+    assert parser.errors == 1
+
+
+def test_frames_split_byte_by_byte():
+    parser = FrameParser()
+    fields = {}
+    for byte in b"debug\r\n" + BATTERY + COUNT:
+        fields.update(parser.feed(bytes([byte])))
+    assert fields == {"bateria_arduino": 3.71, "conteo_ir": 42}
+    assert parser.errors == 0
+    assert not parser.partial
+
+
+def test_legacy_lines_mixed_with_frames():
+    parser = FrameParser()
+    fields = parser.feed(b"Arduino listo para comunicacion.\r\nVoltage A0: 5.01V\r\n" + BATTERY + b"17\r\n")
+    assert fields == {"bateria_pi": 5.01, "bateria_arduino": 3.71, "conteo_ir": 17}
+
+
+def test_line_of_the_battery_sketch():
+    # arduino_pi_communication.ino antes de las tramas: print("Voltage:") + println(voltage, 2)
+    assert FrameParser().feed(b"Voltage:5.02\r\n") == {"bateria_pi": 5.02}
+
+
+@pytest.mark.parametrize("header", [
+    bytes([arduino.SYNC, 0x7F, 200]),  # tipo desconocido
+    bytes([arduino.SYNC, 0x20, 200]),  # longitud imposible para conteo_ir
+])
+def test_impossible_header_resyncs_without_waiting(header):
+    parser = FrameParser()
+    assert parser.feed(header + COUNT) == {"conteo_ir": 42}
+    assert parser.errors == 1
+    assert not parser.partial
+
+
+def test_truncated_frame_resyncs_on_gap():
+    parser = FrameParser()
+    assert parser.feed(BATTERY[:-2]) == {}
+    assert parser.partial
+    # Lo que sigue en el búfer tras la trama perdida se vuelve a analizar
+    parser.buffer += COUNT
+    assert parser.resync() == {"conteo_ir": 42}
+    assert parser.errors == 1
+
+
+def test_histogram_chunks():
+    counts = [list(range(200)), [1] * 200]
+    parser = FrameParser()
+    parser.feed(encode_histogram(1700000000, 60, counts))
+    assert len(parser.histogram) == 2
+    first, second = parser.histogram
+    assert (first["inicio"], first["segundos"], first["sensores"]) == (1700000000, 60, 2)
+    assert second["inicio"] == 1700000000 + arduino.HISTOGRAM_MAX_BINS * 60
+    assert list(first["conteos"][:arduino.HISTOGRAM_MAX_BINS]) == counts[0][:arduino.HISTOGRAM_MAX_BINS]
+
+
+def test_histogram_with_bad_sensor_count_is_rejected():
+    payload = arduino.HISTOGRAM_HEADER.pack(1700000000, 60, 2) + bytes(3)
+    parser = FrameParser()
+    parser.feed(encode_frame(arduino.HISTOGRAM_TYPE, payload) + COUNT)
+    assert parser.histogram == []
+    assert parser.errors == 1
+
+
+@pytest.fixture
+def open_port():
+    serial = pytest.importorskip("serial")
+    ports = []
+
+    def open_port(port):
+        ser = serial.Serial(port, 9600, timeout=1)
+        ports.append(ser)
+        return ser
+
+    yield open_port
+    for ser in ports:
+        ser.close()
+
+
+@pytest.mark.parametrize("legacy", [False, True])
+def test_read_fields_from_fake_arduino(open_port, legacy):
+    with FakeArduino({"bateria_arduino": 3.71, "bateria_pi": 5.02}, legacy=legacy) as fake:
+        fields, errors = read_fields(open_port(fake.port), ["bateria_arduino", "bateria_pi"], timeout=5)
+    assert fields == {"bateria_arduino": 3.71, "bateria_pi": 5.02}
+    assert errors == 0
+
+
+def test_read_fields_from_battery_sketch_text(open_port):
+    fake = FakeArduino({}, interval=0.05)
+    fake._messages = lambda: iter([b"Voltage:4.87\r\n"])
+    with fake:
+        fields, errors = read_fields(open_port(fake.port), ["bateria_pi"], timeout=5)
+    assert fields == {"bateria_pi": 4.87}
+    assert errors == 0
+
+
+def test_read_fields_resyncs_when_a_long_frame_stalls(open_port, monkeypatch):
+    # Cabecera de histograma de 255 B que no llega entera: tras el hueco se descarta y
+    # aparece el conteo que iba detrás, sin esperar al timeout
+    monkeypatch.setattr(arduino, "ARDUINO_FRAME_GAP", 0.05)
+    fake = FakeArduino({}, interval=5)
+    fake._messages = lambda: iter([bytes([arduino.SYNC, arduino.HISTOGRAM_TYPE, 255]) + COUNT])
+    with fake:
+        start = time.monotonic()
+        fields, errors = read_fields(open_port(fake.port), ["conteo_ir"], timeout=3)
+    assert fields == {"conteo_ir": 42}
+    assert errors == 1
+    assert time.monotonic() - start < 2
@@ -0,0 +1,42 @@
+"""Vuelta a fswebcam cuando V4L2 falla a mitad de captura (nodo_comun.camera)."""
+import pytest
+
+from nodo_comun import camera
+from nodo_comun.camera import V4L2Camera
+
+
+@pytest.fixture
+def fswebcam(monkeypatch):
+    captured = []
+
+    def capture(self):
+        captured.append((self.device, self.width, self.height))
+        return b"\\xff\\xd8fswebcam\\xff\\xd9"
+
+    monkeypatch.setattr(camera.FswebcamCamera, "capture", capture)
+    return captured
+
+
+@pytest.mark.parametrize("error", [TimeoutError("sin fotogramas"), OSError(22, "Invalid argument")])
+def test_capture_falls_back_to_fswebcam(fswebcam, monkeypatch, error):
+    def fail(self):
+        raise error
+
+    monkeypatch.setattr(V4L2Camera, "_read_frame", fail)
+    cam = V4L2Camera(device="/dev/video9", width=640, height=360)
+    assert cam.capture() == b"\\xff\\xd8fswebcam\\xff\\xd9"
+    # Las siguientes ya no vuelven a intentar V4L2
+    assert cam.burst(2) == [b"\\xff\\xd8fswebcam\\xff\\xd9"] * 2
+    assert fswebcam == [("/dev/video9", 640, 360)] * 3
+
+
+def test_mismatched_buffer_layout_is_rejected():
+    cam = V4L2Camera(device="/dev/video9")
+    buf = cam._new_buffer(1)
+    buf.length = 0
+    with pytest.raises(OSError):
+        cam._check_buffer(buf, 1)
+    buf.length = 614400
+    cam._check_buffer(buf, 1)
+    with pytest.raises(OSError):
+        cam._check_buffer(buf, 0)
@@ -0,0 +1,121 @@
+"""delta_sync.sync_appended contra el servidor SSH sustituto de benchmarks/standin.py."""
+import os
+
+import pytest
+
+import standin
+from nodo_comun.delta_sync import read_offset, sync_appended
+from nodo_comun.upload import SSHSession
+
+LINE = b"2024-06-01 10:00:00, T: 21.3, H: 45.1\n"
+HEADER_SIZE = 8
+RECORD_SIZE = 16
+
+
+@pytest.fixture
+def server(tmp_path):
+    ssh, scp, root = standin.install(str(tmp_path), handshake=0)
+    session = SSHSession("pi", "stand-in", ssh_cmd=ssh, scp_cmd=scp)
+    assert session.open()
+    yield session, root
+    session.close()
+
+
+def append(path, data):
+    with open(path, "ab") as f:
+        f.write(data)
+
+
+def read(path):
+    with open(path, "rb") as f:
+        return f.read()
+
+
+def test_server_copy_is_identical(server, tmp_path):
+    session, root = server
+    local, offset_file = tmp_path / "datos_sensor.txt", tmp_path / "datos_sensor.offset"
+    for _ in range(5):
+        append(local, LINE)
+        result = sync_appended(session, str(local), "datos/datos_sensor.txt", str(offset_file))
+        assert result["ok"]
+        assert result["bytes"] == len(LINE)
+    assert read(os.path.join(root, "datos", "datos_sensor.txt")) == read(local)
+    assert read_offset(str(offset_file)) == 5 * len(LINE)
+
+
+def test_nothing_resent_without_changes(server, tmp_path):
+    session, root = server
+    local, offset_file = tmp_path / "datos_sensor.txt", tmp_path / "datos_sensor.offset"
+    append(local, LINE * 3)
+    sync_appended(session, str(local), "datos_sensor.txt", str(offset_file))
+    before = standin.sent_bytes(root)
+
+    result = sync_appended(session, str(local), "datos_sensor.txt", str(offset_file))
+
+    assert result["ok"]
+    assert result["bytes"] == 0
+    assert standin.sent_bytes(root) == before
+
+
+def test_incomplete_line_waits(server, tmp_path):
+    session, root = server
+    local, offset_file = tmp_path / "datos_sensor.txt", tmp_path / "datos_sensor.offset"
+    append(local, LINE + LINE[:10])
+    sync_appended(session, str(local), "datos_sensor.txt", str(offset_file))
+    assert read(os.path.join(root, "datos_sensor.txt")) == LINE
+
+    append(local, LINE[10:])
+    sync_appended(session, str(local), "datos_sensor.txt", str(offset_file))
+    assert read(os.path.join(root, "datos_sensor.txt")) == LINE * 2
+
+
+@pytest.mark.parametrize("loss", ["deleted", "truncated"])
+def test_recovers_when_server_is_behind(server, tmp_path, loss):
+    session, root = server
+    local, offset_file = tmp_path / "datos_sensor.txt", tmp_path / "datos_sensor.offset"
+    remote = os.path.join(root, "datos_sensor.txt")
+    append(local, LINE * 4)
+    sync_appended(session, str(local), "datos_sensor.txt", str(offset_file))
+    if loss == "deleted":
+        os.remove(remote)
+    else:
+        os.truncate(remote, len(LINE))
+
+    append(local, LINE)
+    result = sync_appended(session, str(local), "datos_sensor.txt", str(offset_file))
+
+    assert result["ok"]
+    assert read(remote) == read(local)
+    assert read_offset(str(offset_file)) == 5 * len(LINE)
+
+
+def test_fixed_size_records(server, tmp_path):
+    session, root = server
+    local, offset_file = tmp_path / "serie.bin", tmp_path / "serie.bin.offset"
+    remote = os.path.join(root, "serie.bin")
+    header, records = b"H" * HEADER_SIZE, [bytes([i]) * RECORD_SIZE for i in range(4)]
+
+    def sync():
+        return sync_appended(
+            session, str(local), "serie.bin", str(offset_file), record_size=RECORD_SIZE, header_size=HEADER_SIZE
+        )
+
+    # Sólo la cabecera a medias: no se envía nada
+    append(local, header[:5])
+    assert sync()["bytes"] == 0
+    assert not os.path.exists(remote)
+
+    # Registros completos sí; el que está a medias espera al siguiente ciclo
+    append(local, header[5:] + records[0] + records[1] + records[2][:7])
+    assert sync()["ok"]
+    assert read(remote) == header + records[0] + records[1]
+
+    append(local, records[2][7:] + records[3])
+    assert sync()["bytes"] == 2 * RECORD_SIZE
+    assert read(remote) == read(local)
+
+    # Servidor por detrás también con registros
+    os.truncate(remote, HEADER_SIZE + RECORD_SIZE)
+    append(local, records[0])
+    assert sync()["ok"]
+    assert read(remote) == read(local)
@@ -0,0 +1,59 @@
+"""Un despertar de nodo_banda con DEVICE_BACKEND=sim contra el servidor SSH sustituto y un HTTP local."""
+import json
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+import standin
+from nodo_comun import runtime
+from nodo_comun.devices import Devices
+from nodo_comun.runtime import Node
+
+
+@pytest.fixture
+def monitoring():
+    received = []
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            received.append(json.loads(self.rfile.read(int(self.headers["Content-Length"]))))
+            self.send_response(200)
+            self.send_header("Content-Length", "2")
+            self.end_headers()
+            self.wfile.write(b"{}")
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_address[1]}/monitorizacion", received
+    server.shutdown()
+
+
+def test_banda_cycle_with_simulated_devices(tmp_path, monkeypatch, monitoring):
+    url, received = monitoring
+    ssh, _, root = standin.install(str(tmp_path), handshake=0)
+    for name, value in {
+        "PATH": os.path.dirname(ssh) + os.pathsep + os.environ["PATH"],
+        "NODE_DIRECTORY": str(tmp_path / "nodo"), "METRICS_DIRECTORY": str(tmp_path),
+        "SERVER_USER": "pi", "SERVER_IP": "127.0.0.1", "SERVER_DIR": "banda",
+        "MONITORING_URL": url, "DEVICE_ID": "banda",
+    }.items():
+        monkeypatch.setenv(name, value)
+    # Sin esperar a la red: el sustituto no escucha en el puerto SSH
+    monkeypatch.setattr(runtime, "READY_TIMEOUT", 0)
+    node = Node("banda")
+    # SHT20, Arduino y cámara simulados, como fuera de la Pi
+    node.devices = Devices("sim")
+    node.main()
+
+    uploaded = os.listdir(os.path.join(root, "banda"))
+    assert any(name.endswith("_banda_RP06.jpg") for name in uploaded)
+    assert "datos_sensor.txt" in uploaded
+    assert len(received) == 1
+    reading = received[0]
+    assert {"temperatura", "humedad", "bateriaArduino", "bateriaPi"} <= reading.keys()
+    assert os.listdir(node.local_directory) == []
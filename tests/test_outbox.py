@@ -0,0 +1,41 @@
+"""Cola de monitorización: una lectura por captura aunque se prepare o se envíe varias veces."""
+import sqlite3
+
+from nodo_comun.outbox import Outbox
+from nodo_comun.runtime import Node
+
+PHOTO = "20240601_101530"
+
+
+def rows(path):
+    conn = sqlite3.connect(path)
+    try:
+        return conn.execute("SELECT captured_at FROM outbox").fetchall()
+    finally:
+        conn.close()
+
+
+def test_same_capture_is_queued_once(tmp_path):
+    path = str(tmp_path / "outbox.db")
+    outbox = Outbox(path)
+    try:
+        assert outbox.enqueue({"device_id": "x", "timestamp": "2024-06-01 10:16:00 CEST+0200"}, captured_at=PHOTO)
+        assert not outbox.enqueue({"device_id": "x", "timestamp": "2024-06-01 11:16:00 CEST+0200"}, captured_at=PHOTO)
+        assert outbox.pending() == 1
+    finally:
+        outbox.close()
+
+
+def test_monitoring_is_keyed_on_photo_time(tmp_path, monkeypatch):
+    for name, value in {
+        "NODE_DIRECTORY": str(tmp_path), "METRICS_DIRECTORY": str(tmp_path), "DEVICE_ID": "amarillo",
+        "SERVER_USER": "pi", "SERVER_IP": "127.0.0.1", "SERVER_DIR": "/fotos",
+        # Nadie escucha: la lectura se queda en la cola
+        "MONITORING_URL": "http://127.0.0.1:9/monitorizacion",
+    }.items():
+        monkeypatch.setenv(name, value)
+    node = Node("amarillo")
+    # El mismo ciclo reintentado más tarde: otra hora de envío, misma foto
+    node.send_monitoring_data(PHOTO)
+    node.send_monitoring_data(PHOTO)
+    assert rows(node.outbox_file) == [(PHOTO,)]
@@ -0,0 +1,57 @@
+"""Fotos completas retenidas por la subida progresiva que vuelven a la cola en un ciclo ocioso."""
+import json
+import os
+
+import pytest
+
+from nodo_comun.progressive import hold_directory, release_full_images
+
+SIZE = 100000
+
+
+@pytest.fixture
+def node(tmp_path):
+    directory = tmp_path / "fotos"
+    held = hold_directory(str(directory))
+    os.makedirs(held)
+    for i in range(3):
+        with open(os.path.join(held, f"2024060{i}_100000_verde_RP07.jpg"), "wb") as f:
+            f.write(b"x" * SIZE)
+    return str(directory), str(tmp_path / "solicitudes.json"), str(tmp_path / "politica.json")
+
+
+def release(node, state, **kwargs):
+    directory, requests_file, state_path = node
+    with open(state_path, "w") as f:
+        json.dump(state, f)
+    return release_full_images(directory, requests_file, state_path, **kwargs)
+
+
+# A 10 kB/s cada foto tarda 10 s
+LINK = {"rendimiento": 10000, "segundos_subida": 5}
+
+
+def test_without_battery_stage_idle_cycle_is_enough(node):
+    assert release(node, LINK, battery_stage=False) == [
+        "20240600_100000_verde_RP07.jpg", "20240601_100000_verde_RP07.jpg",
+    ]
+
+
+def test_with_battery_stage_a_reading_is_required(node):
+    assert release(node, LINK, battery_stage=True) == []
+    assert len(release(node, {**LINK, "bateria": 12.4}, battery_stage=True)) == 2
+
+
+def test_release_waits_for_link_headroom(node):
+    # Sin medida del enlace, o con el presupuesto casi gastado en la última subida
+    assert release(node, {"segundos_subida": 5}, battery_stage=False) == []
+    assert release(node, {**LINK, "segundos_subida": 115}, battery_stage=False) == []
+
+
+def test_busy_cycle_releases_only_requested(node):
+    directory, requests_file, _ = node
+    with open(os.path.join(directory, "20240610_100000_verde_RP07.jpg"), "wb") as f:
+        f.write(b"x")
+    with open(requests_file, "w") as f:
+        json.dump(["20240602_100000_verde_RP07.jpg"], f)
+    assert release(node, LINK, battery_stage=False) == ["20240602_100000_verde_RP07.jpg"]
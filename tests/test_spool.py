@@ -0,0 +1,52 @@
+"""Presupuesto del almacén local (nodo_comun.spool)."""
+import io
+import os
+
+from PIL import Image
+
+from nodo_comun.spool import Spool, downsample
+
+
+def photo(path, width=1280, height=720):
+    out = io.BytesIO()
+    Image.effect_noise((width, height), 64).convert("RGB").save(out, "JPEG", quality=90)
+    with open(path, "wb") as f:
+        f.write(out.getvalue())
+    return len(out.getvalue())
+
+
+def test_corrupt_photo_is_not_reducible(tmp_path):
+    path = tmp_path / "20240601_100000_banda_RP06.jpg"
+    size = photo(path)
+    with open(path, "r+b") as f:
+        f.truncate(size // 3)
+    assert downsample(str(path)) is None
+
+
+def test_corrupt_photo_goes_straight_to_eviction(tmp_path):
+    corrupt = tmp_path / "20240601_100000_banda_RP06.jpg"
+    photo(corrupt)
+    with open(corrupt, "r+b") as f:
+        f.truncate(100)
+    # Ya en el ancho mínimo: tampoco se reduce
+    newer = tmp_path / "20240601_110000_banda_RP06.jpg"
+    size = photo(newer, width=320, height=180)
+    spool = Spool(str(tmp_path), budget_mb=(size + 50) / 1024 / 1024)
+    actions = spool.enforce()
+    assert actions == [("eliminada", corrupt.name, 100, 0)]
+    assert os.path.exists(newer)
+
+
+def test_sensor_logs_count_against_budget(tmp_path):
+    fotos = tmp_path / "fotos"
+    fotos.mkdir()
+    size = photo(fotos / "20240601_100000_banda_RP06.jpg", width=320, height=180)
+    series = tmp_path / "datos_sensor.bin"
+    series.write_bytes(b"\0" * 4096)
+    text = tmp_path / "datos_sensor.txt"
+    text.write_bytes(b"\0" * 4096)
+    budget_mb = (size + 6000) / 1024 / 1024
+    # Sin contar los registros la foto cabe; contándolos ya no
+    assert Spool(str(fotos), budget_mb=budget_mb).enforce() == []
+    spool = Spool(str(fotos), telemetry=[str(series), str(text), str(tmp_path / "outbox.db")], budget_mb=budget_mb)
+    assert spool.enforce() == [("eliminada", "20240601_100000_banda_RP06.jpg", size, 0)]
@@ -0,0 +1,34 @@
+"""Registros de tamaño fijo de nodo_comun.timeseries: los valores fuera de rango saturan."""
+from datetime import datetime
+
+import numpy as np
+import pytest
+
+from nodo_comun import timeseries
+
+WHEN = datetime(2024, 6, 1, 10, 15, 30)
+
+
+def unpack(record):
+    return dict(zip([name for name, _ in timeseries.NUMPY_DTYPE], timeseries.RECORD.unpack(record)))
+
+
+@pytest.mark.parametrize("count, stored", [(0, 0), (65534, 65534), (65535, 65534), (70000, 65534), (2**32 - 1, 65534)])
+def test_ir_count_saturates_below_missing(count, stored):
+    record = unpack(timeseries.pack_record(WHEN, "verde_1", ir1=count))
+    assert record["ir1"] == stored
+    assert record["ir2"] == timeseries.UINT16_MISSING
+
+
+def test_out_of_range_climate_saturates():
+    record = unpack(timeseries.pack_record(WHEN, "banda", temp=-400.0, humid=400.0, battery_a0=70.0))
+    assert (record["temp"], record["humid"], record["battery_a0"]) == (-32767, 32767, 65534)
+
+
+def test_pack_array_saturates_like_pack_record():
+    counts = np.array([3, 70000, np.nan])
+    records = np.frombuffer(
+        timeseries.pack_array(np.arange(3) + 1717236930, "verde_1", ir1=counts), dtype=timeseries.NUMPY_DTYPE
+    )
+    assert list(records["ir1"]) == [3, 65534, timeseries.UINT16_MISSING]
+    assert bytes(records[1]) == timeseries.pack_record(datetime.fromtimestamp(1717236931), "verde_1", ir1=70000)